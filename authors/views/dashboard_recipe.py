@@ -13,6 +13,7 @@ from authors.forms.recipe_form import AuthorsRecipeForm
 from recipes.models import Recipe
 
 from utils.i18n import set_language
+from utils.routers import use_primary_database
 from django.utils.translation import gettext_lazy as _
 
 
@@ -21,6 +22,7 @@ from django.utils.translation import gettext_lazy as _
         login_url='authors:login',
         redirect_field_name='next'),
     name='dispatch')
+@method_decorator(use_primary_database, name='dispatch')
 class DashboardRecipe(View):
 
     def get_recipe(self, id=None):
@@ -91,6 +93,7 @@ class DashboardRecipeDelete(DashboardRecipe):
         login_url='authors:login',
         redirect_field_name='next'),
     name='dispatch')
+@method_decorator(use_primary_database, name='dispatch')
 class DashboardList(ListView):
     model = Recipe
     paginate_by = None
@@ -100,10 +103,11 @@ class DashboardList(ListView):
     def get_queryset(self, *args, **kwargs):
         qs = super().get_queryset(*args, **kwargs)
 
+        # The dashboard only displays the id and the title
         qs = qs.filter(
             is_published=False,
             author=self.request.user
-        )
+        ).only('id', 'title')
 
         return qs
 
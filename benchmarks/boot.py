@@ -0,0 +1,117 @@
+# Worker boot time, imports and memory.
+#
+# Each run boots the project in a new process, as a gunicorn worker does
+# (django.setup() and the WSGI handler; --urls also loads the URLconf,
+# which happens on the first request), with python -X importtime.
+# Reported: boot wall time (median of --runs), the number of imported
+# modules, the max RSS and the top level imports that cost the most
+# (cumulative time of the -X importtime tree).
+#
+# Usage:
+#     python benchmarks/boot.py --runs 5 --urls --top 15
+#     python benchmarks/boot.py --json boot.json  # report to track
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in the child process. Prints a JSON line with the measures
+CHILD_CODE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+
+import django
+django.setup()
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+
+if sys.argv[1] == '1':
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+print(json.dumps({
+    'boot_ms': (time.perf_counter() - start) * 1000,
+    'modules': len(sys.modules),
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+IMPORTTIME_RE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    # Returns {module: cumulative microseconds} of the top level imports
+    # (the ones not imported by another module)
+    imports = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match and len(match.group(3)) == 1:
+            imports[match.group(4)] = int(match.group(2))
+    return imports
+
+
+def run_boot(load_urls):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'project.settings'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE,
+         '1' if load_urls else '0'],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    measures = json.loads(result.stdout.strip().splitlines()[-1])
+    measures['imports'] = parse_importtime(result.stderr)
+    return measures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker boot benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--urls', action='store_true',
+                        help='also load the URLconf (first request)')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    runs = [run_boot(args.urls) for _ in range(args.runs)]
+
+    # Median of each top level import over the runs
+    names = set().union(*(run['imports'] for run in runs))
+    imports = {
+        name: statistics.median(run['imports'].get(name, 0) for run in runs)
+        for name in names
+    }
+    top = sorted(imports.items(), key=lambda item: -item[1])[:args.top]
+
+    report = {
+        'urls': args.urls,
+        'runs': args.runs,
+        'boot_ms': round(statistics.median(r['boot_ms'] for r in runs), 1),
+        'modules': runs[-1]['modules'],
+        'rss_mb': round(statistics.median(r['rss_mb'] for r in runs), 1),
+        'top_imports_ms': {
+            name: round(microseconds / 1000, 1)
+            for name, microseconds in top
+        },
+    }
+
+    print(f"boot={report['boot_ms']}ms modules={report['modules']} "
+          f"rss={report['rss_mb']}MB (urls={args.urls}, {args.runs} runs)")
+    for name, milliseconds in report['top_imports_ms'].items():
+        print(f'  {milliseconds:8.1f}ms  {name}')
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Per-request latency of a page with and without persistent database
+# connections (see utils/databases.py).
+#
+# Every request runs like in a real server: the connections are checked
+# (and closed when obsolete) before and after it. With CONN_MAX_AGE=0
+# each request opens a new connection; with CONN_MAX_AGE>0 the
+# connection of the previous request is reused.
+#
+# Usage (uses the database configured in the .env file):
+#     python benchmarks/db_connections.py --requests 200 --url /
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import close_old_connections, connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+
+def measure(client, url, requests, conn_max_age):
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    timings = []
+
+    for _ in range(requests):
+        start = time.perf_counter()
+
+        close_old_connections()
+        response = client.get(url)
+        close_old_connections()
+
+        timings.append((time.perf_counter() - start) * 1000)
+
+        if response.status_code != 200:
+            raise SystemExit(f'{url} returned {response.status_code}')
+
+    connection.close()
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f'{label:<24} mean={statistics.mean(timings):7.2f}ms '
+        f'p50={statistics.median(timings):7.2f}ms p95={p95:7.2f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Latency with and without persistent connections')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--url', default='/')
+    parser.add_argument('--conn-max-age', type=int, default=60)
+    args = parser.parse_args()
+
+    # The page cache would hide the database work
+    from utils.cache import page_cache
+    page_cache.timeout = 0
+
+    # Client requests use the 'testserver' host
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    client = Client()
+    configured = connection.settings_dict['CONN_MAX_AGE']
+
+    # Warm up (imports, templates)
+    measure(client, args.url, 5, args.conn_max_age)
+
+    print(f'{connection.vendor} {args.url} x{args.requests}')
+    report('new connection', measure(client, args.url, args.requests, 0))
+    report(f'persistent ({args.conn_max_age}s)', measure(
+        client, args.url, args.requests, args.conn_max_age))
+
+    connection.settings_dict['CONN_MAX_AGE'] = configured
+
+
+if __name__ == '__main__':
+    main()
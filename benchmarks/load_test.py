@@ -0,0 +1,144 @@
+# Load test with a realistic traffic mix (see utils/loadtest.py).
+#
+# Targets:
+#     wsgi -> project.wsgi.application, in-process
+#     asgi -> project.asgi.application, in-process
+#     http://127.0.0.1:8000 -> a running server
+#
+# In-process runs use a throwaway test database seeded by
+# utils/recipes/factory.py, unless --configured-db is passed (the data
+# of the configured database is used; nothing is seeded). The runs
+# against a server read the dataset from the configured database, so it
+# must be the database used by the server.
+# The login and dashboard scenarios need credentials: the seeded authors
+# are used, otherwise pass --login username:password.
+#
+# Usage:
+#     python benchmarks/load_test.py wsgi --users 8 --iterations 500
+#     python benchmarks/load_test.py asgi --mix home=10,detail=5
+#     python benchmarks/load_test.py http://127.0.0.1:8000 --login a:b
+#     ... --output report.json
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (setup_test_environment,  # noqa: E402
+                               teardown_test_environment)
+
+from utils import loadtest  # noqa: E402
+from utils.recipes.factory import seed_recipes  # noqa: E402
+
+
+def get_transport(target):
+    if target == 'wsgi':
+        from project.wsgi import application
+        return loadtest.WSGITransport(application)
+    if target == 'asgi':
+        from project.asgi import application
+        return loadtest.ASGITransport(application)
+    return loadtest.HTTPTransport(target)
+
+
+def parse_logins(values):
+    return [tuple(value.split(':', 1)) for value in values]
+
+
+def print_report(report):
+    print(f"{report['target']}: {report['users']} users, "
+          f"{report['elapsed_s']}s")
+    header = (f"{'scenario':<16}{'requests':>9}{'errors':>8}{'rps':>9}"
+              f"{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    print(header)
+    rows = [*report['scenarios'].items(), ('TOTAL', report['total'])]
+    for name, summary in rows:
+        queries = summary['queries_per_request']
+        print(f"{name:<16}{summary['requests']:>9}{summary['errors']:>8}"
+              f"{summary.get('rps', ''):>9}{summary['p50_ms']:>9}"
+              f"{summary['p95_ms']:>9}{summary['p99_ms']:>9}"
+              f"{'-' if queries is None else queries:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test with a realistic traffic mix')
+    parser.add_argument('target', help='wsgi, asgi or a server URL')
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--mix', default='')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--recipes', type=int, default=300)
+    parser.add_argument('--configured-db', action='store_true')
+    parser.add_argument('--login', action='append', default=[])
+    parser.add_argument('--output', default='')
+    args = parser.parse_args()
+
+    mix = loadtest.parse_mix(args.mix) if args.mix else loadtest.DEFAULT_MIX
+    in_process = args.target in ('wsgi', 'asgi')
+    use_test_db = in_process and not args.configured_db
+    logins = parse_logins(args.login)
+
+    if use_test_db:
+        setup_test_environment()
+        if connection.vendor == 'sqlite':
+            # The in-memory test database locks whole tables: concurrent
+            # writes (sessions, dashboard saves) would fail
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.mkdtemp(), 'load_test.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, loadtest.HOST]
+
+    try:
+        if use_test_db:
+            seeded = seed_recipes(qty=args.recipes, seed=args.seed)
+            logins += [
+                (author.username, 'P@ssw0rd')
+                for author in seeded['authors']
+            ]
+
+        dataset = loadtest.get_dataset(logins)
+        mix = loadtest.get_runnable_mix(mix, dataset)
+        transport = get_transport(args.target)
+
+        if in_process:
+            loadtest.install_query_counter()
+
+        if args.target == 'asgi':
+            samples, elapsed = loadtest.run_async(
+                transport, dataset, mix, users=args.users,
+                iterations=args.iterations, seed=args.seed)
+        else:
+            samples, elapsed = loadtest.run_sync(
+                transport, dataset, mix, users=args.users,
+                iterations=args.iterations, seed=args.seed,
+                count_queries=in_process)
+    finally:
+        if use_test_db:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    report = loadtest.make_report(
+        samples, elapsed, target=args.target, users=args.users,
+        iterations=args.iterations, mix=mix)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Merges the profiles written by every process of ProfilingMiddleware
+# (PROFILING_DIR/parts/, see utils/profiling.py) into the files of each
+# URL name: <url name>.collapsed, .speedscope.json and .stats.json.
+#
+# Run it after (or during) a profiling session. It can be run again: the
+# merged files are rebuilt from the files of the processes.
+#
+# Usage (uses PROFILING_DIR and PROFILING_INTERVAL_MS of the settings):
+#     python benchmarks/merge_profiles.py
+#     python benchmarks/merge_profiles.py --directory /tmp/profiles
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from utils.profiling import merge_profiles  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Merge the profiles of every process')
+    parser.add_argument(
+        '--directory', default=str(settings.PROFILING_DIR),
+        help='PROFILING_DIR of the profiled servers')
+    parser.add_argument(
+        '--interval-ms', type=float,
+        default=settings.PROFILING_INTERVAL_MS,
+        help='PROFILING_INTERVAL_MS of the profiled servers')
+    args = parser.parse_args()
+
+    names = merge_profiles(args.directory, args.interval_ms)
+
+    for name in names:
+        print(os.path.join(args.directory, name) + '.*')
+    print(f'{len(names)} URL name(s) merged.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# EXPLAIN plans and latency of the hot recipes queries, without and with
+# the indexes of Recipe.Meta.indexes and RecipeCard.Meta.indexes.
+#
+# A test database (test_<NAME>, or memory to sqlite) is created, migrated
+# and seeded with --rows recipes and their cards (bulk inserts: no
+# signals), --published of them published, spread over categories and
+# authors.
+# The HTML home and category pages read RecipeCard (page and
+# count/max(update_at) validators); the JSON views,
+# RecipeManager.get_published() and the dashboard read Recipe. Each
+# query runs --repeat times (median latency) with the indexes dropped
+# (before) and created again (after). The plans are printed with
+# --explain.
+#
+# Usage (uses the database engine configured in the .env file):
+#     python benchmarks/recipe_indexes.py --rows 1000000 --explain
+#     python benchmarks/recipe_indexes.py --keepdb  # reuse the seeded db
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from recipes.models import Category, Recipe, RecipeCard  # noqa: E402
+from utils.conditional import get_queryset_stats  # noqa: E402
+
+# Models whose Meta.indexes are measured
+INDEXED_MODELS = (Recipe, RecipeCard)
+
+CATEGORIES = 50
+AUTHORS = 2000
+PER_PAGE = 6
+
+
+def seed(rows, published, batch_size):
+    rng = random.Random(0)
+
+    category_ids = [category.pk for category in Category.objects.bulk_create(
+        Category(name=f'Category {i}') for i in range(CATEGORIES))]
+    author_ids = [author.pk for author in User.objects.bulk_create(
+        User(username=f'author{i}') for i in range(AUTHORS))]
+
+    for start in range(0, rows, batch_size):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                title=f'Recipe {i}', slug=f'recipe-{i}',
+                description='Recipe description', preparation_time=10,
+                preparation_time_unit='minutes', servings=4,
+                servings_unit='portions', preparation_steps='Steps',
+                is_published=rng.random() < published,
+                category_id=rng.choice(category_ids),
+                author_id=rng.choice(author_ids),
+            )
+            for i in range(start, min(start + batch_size, rows))
+        )
+        # Same data the signals would copy (recipes/cards.py)
+        RecipeCard.objects.bulk_create(
+            RecipeCard(
+                id=recipe.pk, is_published=recipe.is_published,
+                title=recipe.title, slug=recipe.slug,
+                description=recipe.description,
+                preparation_time=recipe.preparation_time,
+                preparation_time_unit=recipe.preparation_time_unit,
+                servings=recipe.servings,
+                servings_unit=recipe.servings_unit,
+                created_at=recipe.created_at, update_at=recipe.update_at,
+                author_id=recipe.author_id,
+                author_display_name=f'author{recipe.author_id}',
+                category_id=recipe.category_id,
+                category_name=f'Category {recipe.category_id}',
+            )
+            for recipe in recipes
+        )
+        print(f'\rseeded {min(start + batch_size, rows)}/{rows}', end='',
+              flush=True)
+    print()
+
+
+def get_queries():
+    # The hot queries, with the filters of the views
+    category_id = Category.objects.order_by('pk').values_list(
+        'pk', flat=True).first()
+    author_id = User.objects.order_by('pk').values_list(
+        'pk', flat=True).first()
+
+    # HTML pages (RecipeListViewBase.get_queryset, use_recipe_cards)
+    cards = RecipeCard.objects.filter(is_published=True).order_by('-id')
+    category_cards = cards.filter(category_id=category_id)
+
+    # JSON views, get_published() and the dashboard
+    published = Recipe.objects.filter(is_published=True).order_by('-id')
+    category = published.filter(category_id=category_id)
+    drafts = Recipe.objects.filter(
+        is_published=False, author_id=author_id).only('id', 'title')
+
+    return {
+        'home page 1': lambda: list(cards[:PER_PAGE]),
+        'home page 1000': lambda: list(
+            cards[PER_PAGE * 999:PER_PAGE * 1000]),
+        'home validators': lambda: get_queryset_stats(cards),
+        'category page 1': lambda: list(category_cards[:PER_PAGE]),
+        'category validators': lambda: get_queryset_stats(
+            category_cards),
+        'api list page 1': lambda: list(published[:PER_PAGE]),
+        'api list validators': lambda: get_queryset_stats(published),
+        'get_published': lambda: list(
+            Recipe.objects.get_published()[:7]),
+        'api category page 1': lambda: list(category[:PER_PAGE]),
+        'api category validators': lambda: get_queryset_stats(category),
+        'dashboard drafts': lambda: list(drafts.all()),
+    }
+
+
+def explain(run):
+    # Plan of the first query run by run() (the next ones are prefetches)
+    with CaptureQueriesContext(connection) as context:
+        run()
+    sql = context.captured_queries[0]['sql']
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def measure(queries, repeat, show_plans):
+    results = {}
+
+    for label, run in queries.items():
+        run()  # warm up (page cache of the database)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        results[label] = {
+            'ms': round(statistics.median(timings), 3),
+            'plan': explain(run),
+        }
+
+        if show_plans:
+            print(f'  {label}:')
+            for line in results[label]['plan']:
+                print(f'      {line}')
+
+    return results
+
+
+def set_indexes(enabled):
+    with connection.schema_editor() as editor:
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='EXPLAIN and latency of the recipes indexes')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--published', type=float, default=0.9,
+                        help='fraction of published recipes')
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--explain', action='store_true',
+                        help='print the query plans')
+    parser.add_argument('--keepdb', action='store_true',
+                        help='keep (and reuse) the seeded test database')
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=args.keepdb)
+
+    try:
+        if Recipe.objects.count() != args.rows:
+            RecipeCard.objects.all().delete()
+            Recipe.objects.all().delete()
+            seed(args.rows, args.published, args.batch_size)
+
+        queries = get_queries()
+
+        print(f'{connection.vendor}, {args.rows} recipes')
+        print('without the indexes')
+        set_indexes(False)
+        before = measure(queries, args.repeat, args.explain)
+
+        print('with the indexes')
+        set_indexes(True)
+        after = measure(queries, args.repeat, args.explain)
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=args.keepdb)
+
+    print(f"\n{'query':<26}{'before':>12}{'after':>12}{'speedup':>10}")
+    for label in queries:
+        before_ms, after_ms = before[label]['ms'], after[label]['ms']
+        print(f'{label:<26}{before_ms:>10.2f}ms{after_ms:>10.2f}ms'
+              f'{before_ms / max(after_ms, 0.001):>9.1f}x')
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({
+                'vendor': connection.vendor, 'rows': args.rows,
+                'before': before, 'after': after,
+            }, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Query count and latency of every named route of recipes.urls and
+# authors.urls (see utils/budgets.py), as a JSON report.
+#
+# A test database is created (the configured one is not touched), seeded
+# by utils/recipes/factory.py and destroyed at the end. The exit code is
+# 1 when a route is over its budget.
+#
+# Usage:
+#     python benchmarks/route_budgets.py --recipes 500 --output report.json
+#     diff old-report.json report.json
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (setup_test_environment,  # noqa: E402
+                               teardown_test_environment)
+
+from utils.budgets import dump_report, run_route_budgets  # noqa: E402
+from utils.recipes.factory import seed_recipes  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Query count and latency budgets of every route')
+    parser.add_argument('--recipes', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='-')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+    try:
+        dataset = seed_recipes(qty=args.recipes, seed=args.seed)
+        report = run_route_budgets(
+            Client(), dataset, repeats=args.repeats)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    if args.output == '-':
+        dump_report(report, sys.stdout)
+    else:
+        with open(args.output, 'w') as fp:
+            dump_report(report, fp)
+
+    for route, result in report['routes'].items():
+        if not result['ok']:
+            print(f'OVER BUDGET {route}: {result}', file=sys.stderr)
+
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
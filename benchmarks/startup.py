@@ -0,0 +1,109 @@
+# Startup time and per-request middleware cost of each settings profile
+# (project/settings/profiles.py).
+#
+# Each profile runs in new processes (--runs): the time to set django up,
+# build the WSGI handler (middleware chain) and import the URLconf, the
+# number of imported modules and the mean time of --requests requests to
+# a page without queries.
+#
+# Usage:
+#     python benchmarks/startup.py --runs 5 --requests 200
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = ('dev', 'test', 'prod')
+
+# Runs in the child process. Prints a JSON line with the measures
+CHILD_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+
+application = get_wsgi_application()
+get_resolver().url_patterns
+startup_ms = (time.perf_counter() - start) * 1000
+modules = len(sys.modules)
+
+from django.test import Client
+
+settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+client = Client()
+url, requests = sys.argv[1], int(sys.argv[2])
+client.get(url)
+
+start = time.perf_counter()
+for _ in range(requests):
+    response = client.get(url)
+request_ms = (time.perf_counter() - start) * 1000 / requests
+
+print(json.dumps({
+    'startup_ms': startup_ms,
+    'modules': modules,
+    'middleware': len(settings.MIDDLEWARE),
+    'request_ms': request_ms,
+    'status': response.status_code,
+}))
+'''
+
+
+def run_profile(profile, url, requests):
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'project.settings',
+        'SETTINGS_PROFILE': profile,
+        # The toolbar is only rendered with DEBUG=1. Its middleware
+        # still runs, as in a dev server
+        'DEBUG': '0',
+    }
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE, url, str(requests)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Startup and request time of the settings profiles')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--url', default='/authors/login/')
+    args = parser.parse_args()
+
+    print(f'{args.url} x{args.requests}, {args.runs} runs per profile')
+
+    for profile in PROFILES:
+        results = [
+            run_profile(profile, args.url, args.requests)
+            for _ in range(args.runs)
+        ]
+        status = results[-1]['status']
+        if status != 200:
+            raise SystemExit(f'{profile}: {args.url} returned {status}')
+
+        startup_ms = statistics.median(r['startup_ms'] for r in results)
+        request_ms = statistics.median(r['request_ms'] for r in results)
+        print(
+            f'{profile:<6} startup={startup_ms:7.1f}ms '
+            f"modules={results[-1]['modules']:5d} "
+            f"middleware={results[-1]['middleware']:2d} "
+            f'request={request_ms:6.3f}ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import pytest
 import dotenv
 import django
 
@@ -5,3 +6,20 @@ import django
 def pytest_sessionstart(session):
     dotenv.load_dotenv()
     django.setup()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # The cache lives in memory and survives the database rollback between
+    # tests. Clearing it avoids one test reading pages cached by another.
+    from django.core.cache import cache
+    from utils.cache import page_cache
+    cache.clear()
+    page_cache.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # The uploaded covers (and their variants) are written to a temporary
+    # directory, not to the MEDIA_ROOT of the project
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
@@ -15,4 +15,12 @@ from dotenv import load_dotenv
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 load_dotenv()
 
+# Persistent database connections are disabled by default under ASGI
+# (utils/databases.py). DATABASE_CONN_MAX_AGE still overrides it.
+os.environ['DJANGO_ASGI'] = '1'
+
+# The read only recipes views are served by their native async versions
+# (recipes/urls.py). ASYNC_VIEWS=0 in the environment keeps the sync ones.
+os.environ.setdefault('ASYNC_VIEWS', '1')
+
 application = get_asgi_application()
@@ -1,11 +1,15 @@
 from .environment import *
 from .installed_apps import *
 from .middlewares import *
+from .profiles import *
 
 from .assets import *
+from .caches import *
 from .databases import *
 from .debug_toolbar import *
 from .i18n import *
 from .messages import *
+from .profiling import *
+from .search import *
 from .security import *
 from .templates import *
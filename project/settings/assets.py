@@ -15,3 +15,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
+
+# Cover processing (recipes/covers.py)
+# COVER_PROCESSING -> 'thread' (background thread pool) or 'sync'
+# COVER_WORKERS -> number of threads in the pool
+# COVER_JOB_TIMEOUT -> seconds after which a job left processing (its
+#     process died) is pending again in 'manage.py process_cover_jobs'
+COVER_PROCESSING = os.environ.get('COVER_PROCESSING', 'thread')
+COVER_WORKERS = int(os.environ.get('COVER_WORKERS', 2))
+COVER_JOB_TIMEOUT = int(os.environ.get('COVER_JOB_TIMEOUT', 600))
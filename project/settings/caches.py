@@ -0,0 +1,26 @@
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+import os
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Page cache used by the recipes list views.
+# PAGE_CACHE_TIMEOUT -> seconds a rendered page lives in the shared cache.
+#     0 disables the page cache.
+# PAGE_CACHE_LOCAL_SIZE -> number of pages kept in the in-process tier
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 300))
+PAGE_CACHE_LOCAL_SIZE = int(os.environ.get('PAGE_CACHE_LOCAL_SIZE', 256))
+
+# LISTING_STATS_TIMEOUT -> seconds the stats (total and last update) of a
+#     recipes listing live in the cache (recipes/listings.py). They are
+#     dropped by the signals when the listing changes. 0 disables it.
+LISTING_STATS_TIMEOUT = int(os.environ.get('LISTING_STATS_TIMEOUT', 600))
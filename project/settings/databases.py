@@ -1,17 +1,19 @@
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Connection management (persistent connections, health checks, pool and
+# read replicas) is configured by env vars. See utils/databases.py
 
-import os
-
+from utils.databases import get_database_settings, get_replicas_settings
 
 DATABASES = {
-    'default': {
-        'ENGINE': os.environ.get('DATABASE_ENGINE'),
-        'NAME': os.environ.get('DATABASE_NAME'),
-        'USER': os.environ.get('DATABASE_USER'),
-        'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
-        'HOST': os.environ.get('DATABASE_HOST'),
-        'PORT': os.environ.get('DATABASE_PORT'),
-    }
+    'default': get_database_settings('DATABASE'),
 }
+
+# Read only copies of the default database (DATABASE_REPLICA_HOST,
+# DATABASE_REPLICA_2_HOST...)
+DATABASES.update(get_replicas_settings(DATABASES['default']))
+
+# The published content is read from the replicas (utils/routers.py).
+# Without replicas everything uses the default database.
+DATABASE_ROUTERS = ['utils.routers.ReplicaRouter']
@@ -0,0 +1,71 @@
+import os
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .environment import DEBUG
+from .installed_apps import INSTALLED_APPS
+from .middlewares import MIDDLEWARE
+
+# SETTINGS PROFILES
+# SETTINGS_PROFILE = dev, test or prod. Defaults to test under the test
+# runners (pytest, manage.py test), dev with DEBUG=1 and prod otherwise.
+# Each profile adds its apps, its middleware (before the others: they
+# wrap the whole request) and its URL includes (project/urls.py).
+# prod adds nothing: the debug toolbar is not even imported.
+
+PROFILES = {
+    'dev': {
+        'apps': ['debug_toolbar'],
+        'middleware': ['debug_toolbar.middleware.DebugToolbarMiddleware'],
+        'urls': [('__debug__/', 'debug_toolbar.urls')],
+    },
+    'test': {
+        'apps': [],
+        'middleware': [],
+        'urls': [],
+    },
+    'prod': {
+        'apps': [],
+        'middleware': [],
+        'urls': [],
+    },
+}
+
+
+def get_settings_profile():
+    profile = os.environ.get('SETTINGS_PROFILE', '')
+
+    if not profile:
+        if 'pytest' in sys.modules or sys.argv[1:2] == ['test']:
+            profile = 'test'
+        else:
+            profile = 'dev' if DEBUG else 'prod'
+
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(
+            f'SETTINGS_PROFILE must be one of {", ".join(PROFILES)}, '
+            f'not {profile!r}')
+
+    return profile
+
+
+SETTINGS_PROFILE = get_settings_profile()
+
+INSTALLED_APPS = [
+    *INSTALLED_APPS,
+    *PROFILES[SETTINGS_PROFILE]['apps'],
+]
+
+MIDDLEWARE = [
+    *PROFILES[SETTINGS_PROFILE]['middleware'],
+    *MIDDLEWARE,
+]
+
+# (prefix, urlconf) included by project/urls.py
+PROFILE_URLS = PROFILES[SETTINGS_PROFILE]['urls']
+
+if SETTINGS_PROFILE == 'test':
+    # Hashing the passwords of the test users is the slowest part of many
+    # tests. The real hashers are kept in dev and prod.
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
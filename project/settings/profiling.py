@@ -0,0 +1,23 @@
+import os
+
+from .environment import BASE_DIR
+
+# Request profiling (utils/profiling.py)
+# PROFILING_ENABLED -> without it the middleware is not used (the
+#     queries and the templates are not instrumented)
+# PROFILING_SAMPLE_RATE -> fraction of the requests profiled (0 to 1)
+# PROFILING_HEADER -> requests with this header carrying a valid token
+#     (utils.profiling.make_profiling_token()) are always profiled.
+#     Empty disables it. Without header and sample rate the middleware
+#     is not used.
+# PROFILING_INTERVAL_MS -> interval between two stack samples (WSGI
+#     only: the async requests are not sampled)
+# PROFILING_DIR -> where the profiles are written, one set of files per
+#     process, merged per URL name by benchmarks/merge_profiles.py
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_HEADER = os.environ.get('PROFILING_HEADER', 'X-Profile')
+PROFILING_TOKEN_MAX_AGE = int(
+    os.environ.get('PROFILING_TOKEN_MAX_AGE', 3600))
+PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', 1))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles')
@@ -0,0 +1,7 @@
+import os
+
+# Backend used by the recipes search (recipes/search.py)
+#     recipes.search.InvertedIndexSearchBackend -> ranked inverted index
+#     recipes.search.SimpleSearchBackend -> LIKE in title and description
+SEARCH_BACKEND = os.environ.get(
+    'SEARCH_BACKEND', 'recipes.search.InvertedIndexSearchBackend')
@@ -24,7 +24,13 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('recipes.urls')),
     path('authors/', include('authors.urls')),
-    path("__debug__/", include("debug_toolbar.urls")),
+]
+
+# URL includes of the settings profile (project/settings/profiles.py),
+# like the debug toolbar in dev
+urlpatterns += [
+    path(prefix, include(urlconf))
+    for prefix, urlconf in settings.PROFILE_URLS
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
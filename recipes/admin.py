@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Category, Recipe
+from .models import Category, CoverImageJob, Recipe
 # Register your models here.
 # Two ways to register a model. Using the admin.site.register
 # (ClassImported, ClassAdminCreatedHere) and
@@ -9,7 +9,8 @@ from .models import Category, Recipe
 
 
 class CategoryAdmin(admin.ModelAdmin):
-    ...
+    list_display = ('id', 'name', 'published_recipe_count')
+    list_display_links = ('id', 'name')
 
 
 @admin.register(Recipe)
@@ -33,6 +34,19 @@ class RecipeAdmin(admin.ModelAdmin):
     }
 
     autocomplete_fields = ('tags',)
+    readonly_fields = ('cover_variants',)
 
 
 admin.site.register(Category, CategoryAdmin)
+
+
+@admin.register(CoverImageJob)
+class CoverImageJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'recipe', 'cover_name', 'status', 'attempts', 'update_at')
+    list_display_links = ('id', 'recipe')
+    list_filter = ('status',)
+    readonly_fields = ('content_hash', 'error', 'created_at', 'update_at')
+
+    list_per_page = 10
+    ordering = ('-id',)
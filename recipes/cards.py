@@ -0,0 +1,85 @@
+from recipes.models import Recipe, RecipeCard
+from utils.streaming import STREAM_CHUNK_SIZE, batched
+
+# RECIPE CARDS (denormalized read model)
+# RecipeCard has one row per recipe with everything the list pages
+# render. The rows are rebuilt from Recipe here, every time a recipe,
+# its tags, its category or its author change (recipes/signals.py).
+
+# Fields copied as they are from Recipe to RecipeCard
+CARD_RECIPE_FIELDS = (
+    'is_published', 'title', 'slug', 'description', 'preparation_time',
+    'preparation_time_unit', 'servings', 'servings_unit', 'created_at',
+    'update_at', 'author_id', 'category_id', 'cover', 'cover_variants',
+)
+
+CARD_UPDATE_FIELDS = [
+    *CARD_RECIPE_FIELDS,
+    'author_display_name', 'author_profile_id', 'category_name',
+    'tag_names',
+]
+
+
+def get_card_source_queryset(queryset=None):
+    # Recipes with everything needed to build their cards
+    if queryset is None:
+        queryset = Recipe.objects.all()
+
+    return queryset.select_related(
+        'author', 'author__profile', 'category'
+    ).prefetch_related('tags')
+
+
+def build_recipe_card(recipe):
+    card = RecipeCard(
+        id=recipe.id,
+        author_display_name=recipe.author_display_name,
+        author_profile_id=recipe.author_profile_id,
+        category_name=recipe.category_name,
+        tag_names=sorted(tag.name for tag in recipe.tags.all()),
+    )
+    for field in CARD_RECIPE_FIELDS:
+        setattr(card, field, getattr(recipe, field))
+    return card
+
+
+def save_recipe_cards(recipes):
+    # Insert or update (one query) the cards of the recipes
+    cards = [build_recipe_card(recipe) for recipe in recipes]
+    if not cards:
+        return 0
+
+    RecipeCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=CARD_UPDATE_FIELDS,
+    )
+    return len(cards)
+
+
+def sync_recipe_cards(queryset):
+    # Rebuild the cards of the recipes in the queryset
+    return save_recipe_cards(get_card_source_queryset(queryset))
+
+
+def sync_recipe_card(recipe_id):
+    recipes = get_card_source_queryset().filter(pk=recipe_id)
+
+    if not save_recipe_cards(recipes):
+        # The recipe does not exist anymore
+        RecipeCard.objects.filter(pk=recipe_id).delete()
+
+
+def rebuild_recipe_cards():
+    # Rebuild every card, in chunks, and drop the cards without recipe
+    total = 0
+    queryset = get_card_source_queryset().order_by('pk')
+
+    for recipes in batched(queryset.iterator(
+            chunk_size=STREAM_CHUNK_SIZE), STREAM_CHUNK_SIZE):
+        total += save_recipe_cards(recipes)
+
+    RecipeCard.objects.exclude(
+        pk__in=Recipe.objects.values('pk')).delete()
+    return total
@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Category, Recipe
+from tag.models import Tag
+
+# PUBLISHED RECIPE COUNTERS
+# Category.published_recipe_count and Tag.published_recipe_count are
+# incremented/decremented here by recipes/signals.py every time a recipe
+# is published/unpublished/deleted, changes its category or its tags.
+# The updates are relative (count = count + n, in the database), so
+# concurrent changes do not overwrite each other. Changes made without
+# signals (queryset.update(), raw SQL) are fixed by
+# 'manage.py rebuild_recipe_counters'.
+
+
+def _add_to_counters(queryset, amount):
+    if amount:
+        queryset.update(
+            published_recipe_count=F('published_recipe_count') + amount)
+
+
+def add_to_category_counter(category_id, amount):
+    if category_id is not None:
+        _add_to_counters(Category.objects.filter(pk=category_id), amount)
+
+
+def add_to_tag_counters(tag_ids, amount):
+    # tag_ids -> ids or a queryset of ids (one UPDATE to all tags)
+    _add_to_counters(Tag.objects.filter(pk__in=tag_ids), amount)
+
+
+def add_published_recipe_counts(category_counts, tag_counts):
+    # Adds (or removes) many recipes at once (bulk imports, removed
+    # tag links).
+    # *_counts -> {category/tag id: number of published recipes}
+    # One UPDATE per distinct number, not per row
+    for model, counts in ((Category, category_counts), (Tag, tag_counts)):
+        ids_by_amount = defaultdict(list)
+        for pk, amount in counts.items():
+            if pk is not None:
+                ids_by_amount[amount].append(pk)
+
+        for amount, ids in ids_by_amount.items():
+            _add_to_counters(model.objects.filter(pk__in=ids), amount)
+
+
+def get_recipe_tag_ids(recipe_id):
+    return Recipe.tags.through.objects.filter(
+        recipe_id=recipe_id).values('tag_id')
+
+
+def update_recipe_counters(recipe_id, old_state, new_state):
+    # Moves a recipe between counters.
+    # *_state -> (is_published, category_id) before and after the change.
+    # None when the recipe did not exist (created) or does not exist
+    # anymore (deleted)
+    was_published, old_category_id = old_state or (False, None)
+    is_published, category_id = new_state or (False, None)
+
+    if not was_published and not is_published:
+        return
+    if (was_published, old_category_id) == (is_published, category_id):
+        return
+
+    with transaction.atomic():
+        if was_published and is_published:
+            # Only the category changed
+            add_to_category_counter(old_category_id, -1)
+            add_to_category_counter(category_id, 1)
+            return
+
+        amount = 1 if is_published else -1
+        add_to_category_counter(
+            category_id if is_published else old_category_id, amount)
+        add_to_tag_counters(get_recipe_tag_ids(recipe_id), amount)
+
+
+def get_category_counts_subquery():
+    return Recipe.objects.filter(
+        category=OuterRef('pk'), is_published=True
+    ).order_by().values('category').annotate(total=Count('pk')).values(
+        'total')
+
+
+def get_tag_counts_subquery():
+    return Recipe.tags.through.objects.filter(
+        tag=OuterRef('pk'), recipe__is_published=True
+    ).order_by().values('tag').annotate(total=Count('pk')).values('total')
+
+
+def rebuild_recipe_counters():
+    # Recomputes every counter from the recipes. One UPDATE per table
+    # (correlated subquery), without loading the rows.
+    # Returns (number of categories, number of tags)
+    with transaction.atomic():
+        categories = Category.objects.update(
+            published_recipe_count=Coalesce(
+                Subquery(get_category_counts_subquery()), 0))
+        tags = Tag.objects.update(
+            published_recipe_count=Coalesce(
+                Subquery(get_tag_counts_subquery()), 0))
+
+    return categories, tags
@@ -0,0 +1,268 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils.cache import page_cache
+from utils.routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+# Widths of the cover variants (srcset). Only the widths smaller than the
+# original image are created.
+COVER_VARIANT_WIDTHS = (320, 480, 840, 1280)
+
+# extension -> (Pillow format, quality)
+COVER_VARIANT_FORMATS = {
+    'webp': ('WEBP', 80),
+    'jpg': ('JPEG', 82),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# COVER PROCESSING PIPELINE
+# Recipe.save() calls enqueue_cover_processing(), which records a
+# CoverImageJob and, after the commit, hands it to a local thread pool.
+# The job table is the queue: jobs left pending (ex: the process was
+# restarted) are processed by 'manage.py process_cover_jobs', and so are
+# the jobs left processing for more than COVER_JOB_TIMEOUT seconds (the
+# process died in the middle of the job).
+#
+# settings.COVER_PROCESSING:
+#     'thread' -> jobs run in a thread pool (COVER_WORKERS threads)
+#     'sync' -> jobs run right after the commit, in the request thread
+#
+# A job creates the responsive variants of the cover (COVER_VARIANT_WIDTHS
+# in each COVER_VARIANT_FORMATS), records them in Recipe.cover_variants
+# and then resizes the original to 840px (Recipe.resize_image).
+
+
+def get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'COVER_WORKERS', 2),
+                thread_name_prefix='cover-worker')
+
+    return _executor
+
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+
+    with open(path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(64 * 1024), b''):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def generate_cover_variants(cover_name):
+    # Create the variants of a cover next to it and return the manifest
+    # to be saved in Recipe.cover_variants
+    from PIL import Image
+
+    from recipes.models import Recipe
+
+    image_path = os.path.join(settings.MEDIA_ROOT, cover_name)
+
+    with Image.open(image_path) as image_pillow:
+        image_pillow = image_pillow.convert('RGB')
+        original_width, original_height = image_pillow.size
+        widths = [
+            width for width in COVER_VARIANT_WIDTHS
+            if width < original_width
+        ]
+
+        for width in widths:
+            height = round((original_height * width) / original_width)
+            variant = image_pillow.resize((width, height), Image.LANCZOS)
+
+            for extension, (image_format, quality) in \
+                    COVER_VARIANT_FORMATS.items():
+                variant.save(
+                    os.path.join(
+                        settings.MEDIA_ROOT,
+                        Recipe.get_cover_variant_name(
+                            cover_name, width, extension)),
+                    format=image_format,
+                    quality=quality,
+                    optimize=True,
+                )
+
+    if not widths:
+        return {}
+
+    return {'w': widths, 'f': list(COVER_VARIANT_FORMATS)}
+
+
+def enqueue_cover_processing(recipe):
+    from recipes.models import CoverImageJob, Recipe, RecipeCard
+
+    cover_name = recipe.cover.name
+    job = CoverImageJob.objects.filter(recipe=recipe).first()
+
+    # Same cover as the last job: nothing to do. Failed jobs are
+    # enqueued again.
+    if (job is not None and job.cover_name == cover_name and
+            job.status != CoverImageJob.STATUS_FAILED):
+        return job
+
+    # New cover: the variants of the old one are not valid anymore
+    if recipe.cover_variants:
+        recipe.cover_variants = {}
+        Recipe.objects.filter(pk=recipe.pk).update(cover_variants={})
+        RecipeCard.objects.filter(pk=recipe.pk).update(cover_variants={})
+
+    job, _ = CoverImageJob.objects.update_or_create(
+        recipe=recipe,
+        defaults={
+            'cover_name': cover_name,
+            'status': CoverImageJob.STATUS_PENDING,
+            'error': '',
+        }
+    )
+
+    job_id = job.pk
+    transaction.on_commit(lambda: dispatch_cover_job(job_id))
+
+    return job
+
+
+def dispatch_cover_job(job_id):
+    if getattr(settings, 'COVER_PROCESSING', 'thread') == 'sync':
+        process_cover_job(job_id)
+    else:
+        get_executor().submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    # Worker threads have their own database connections. They read the
+    # job from the primary: it was committed just before the dispatch.
+    close_old_connections()
+    try:
+        with use_primary():
+            process_cover_job(job_id)
+    except Exception:
+        logger.exception('Cover job %s crashed', job_id)
+    finally:
+        close_old_connections()
+
+
+def process_cover_job(job_id):
+    # Resize the cover of a job. Idempotent: only a pending job is
+    # claimed. content_hash (hash of the resized file) is saved with the
+    # variants, so a job run again after they were saved (ex: reset by
+    # reset_stale_cover_jobs) does not resize the cover again. A new
+    # upload is always processed (new name, variants cleared).
+    from recipes.listings import get_recipes_listings, invalidate_listings
+    from recipes.models import CoverImageJob, Recipe, RecipeCard
+
+    # update() does not set update_at (auto_now): it is the claim time
+    # used by reset_stale_cover_jobs()
+    claimed = CoverImageJob.objects.filter(
+        pk=job_id, status=CoverImageJob.STATUS_PENDING
+    ).update(
+        status=CoverImageJob.STATUS_PROCESSING,
+        attempts=F('attempts') + 1,
+        update_at=timezone.now(),
+    )
+
+    if not claimed:
+        return
+
+    current_job = CoverImageJob.objects.filter(
+        pk=job_id, status=CoverImageJob.STATUS_PROCESSING)
+
+    try:
+        job = CoverImageJob.objects.select_related('recipe').get(pk=job_id)
+
+        # Only the job for the current cover can finish it. If the cover
+        # was changed meanwhile, a new job is pending with the new name.
+        current_job = current_job.filter(cover_name=job.cover_name)
+
+        if job.recipe.cover.name != job.cover_name:
+            current_job.update(status=CoverImageJob.STATUS_DONE)
+            return
+
+        image_path = os.path.join(settings.MEDIA_ROOT, job.cover_name)
+
+        if (file_hash(image_path) != job.content_hash or
+                not job.recipe.cover_variants):
+            cover_variants = generate_cover_variants(job.cover_name)
+            Recipe.resize_image(job.recipe.cover)
+
+            # update() does not send signals, so update_at (HTTP
+            # validators), the listing stats and the cached pages are
+            # updated here to show the new srcset
+            now = timezone.now()
+            with transaction.atomic():
+                Recipe.objects.filter(
+                    pk=job.recipe.pk, cover=job.cover_name
+                ).update(cover_variants=cover_variants, update_at=now)
+                RecipeCard.objects.filter(
+                    pk=job.recipe.pk, cover=job.cover_name
+                ).update(cover_variants=cover_variants, update_at=now)
+                current_job.update(content_hash=file_hash(image_path))
+            if job.recipe.is_published:
+                invalidate_listings(get_recipes_listings(
+                    Recipe.objects.filter(pk=job.recipe.pk)))
+                page_cache.invalidate()
+
+        current_job.update(status=CoverImageJob.STATUS_DONE, error='')
+
+    except Exception as error:
+        logger.exception('Cover job %s failed', job_id)
+        current_job.update(
+            status=CoverImageJob.STATUS_FAILED,
+            error=str(error),
+        )
+
+
+def reset_stale_cover_jobs(timeout=None):
+    # Jobs processing for more than timeout seconds (default:
+    # COVER_JOB_TIMEOUT) are pending again. Returns the number of jobs.
+    from recipes.models import CoverImageJob
+
+    if timeout is None:
+        timeout = getattr(settings, 'COVER_JOB_TIMEOUT', 600)
+
+    return CoverImageJob.objects.filter(
+        status=CoverImageJob.STATUS_PROCESSING,
+        update_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=CoverImageJob.STATUS_PENDING)
+
+
+def process_pending_cover_jobs(retry_failed=False, stale_timeout=None):
+    # Process (in the current thread) every job left in the table,
+    # with the stale ones (reset_stale_cover_jobs).
+    # Returns the number of jobs processed.
+    from recipes.models import CoverImageJob
+
+    reset_stale_cover_jobs(stale_timeout)
+
+    if retry_failed:
+        CoverImageJob.objects.filter(
+            status=CoverImageJob.STATUS_FAILED
+        ).update(status=CoverImageJob.STATUS_PENDING)
+
+    job_ids = list(
+        CoverImageJob.objects.filter(status=CoverImageJob.STATUS_PENDING)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+
+    for job_id in job_ids:
+        process_cover_job(job_id)
+
+    return len(job_ids)
@@ -0,0 +1,239 @@
+import csv
+import json
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.db import connections
+from django.db.models import Max, Min
+
+from recipes.models import Recipe
+from utils.streaming import STREAM_CHUNK_SIZE, batched
+
+# RECIPE CATALOG EXPORT
+# 'manage.py export_recipes' writes the published recipes, with the
+# author, category and tag names, to NDJSON, CSV or a columnar format.
+# The recipes are read with iterator() (server-side cursor on
+# PostgreSQL) in chunks of chunk_size, with one query to the tags of
+# each chunk: the memory used does not depend on the number of recipes.
+#
+# With partitions > 1 the id range of the published recipes is split
+# into equal ranges, each one written to its own file
+# (recipes.ndjson -> recipes.part000.ndjson, ...), by up to workers
+# threads (each thread has its own database connection).
+#
+# Columnar format ('columns', .columns.jsonl): one JSON header line,
+# then one line per chunk with the values of each field in a list.
+# The repeated strings (names, units) are dictionary encoded:
+#     {"format": "recipes-columns", "version": 1, "fields": [...]}
+#     {"count": 2, "columns": {"id": [1, 2], ...,
+#         "category_name": {"values": ["Cakes"], "indexes": [0, 0]}}}
+
+EXPORT_FIELDS = (
+    'id', 'title', 'slug', 'description', 'preparation_time',
+    'preparation_time_unit', 'servings', 'servings_unit',
+    'preparation_steps', 'preparation_steps_is_html', 'cover',
+    'created_at', 'update_at', 'author_username', 'author_name',
+    'category_name', 'tags',
+)
+
+# Columns dictionary encoded by the columnar format
+DICTIONARY_FIELDS = (
+    'preparation_time_unit', 'servings_unit', 'author_username',
+    'author_name', 'category_name',
+)
+
+COLUMNS_FORMAT_VERSION = 1
+
+QUERY_FIELDS = (
+    'id', 'title', 'slug', 'description', 'preparation_time',
+    'preparation_time_unit', 'servings', 'servings_unit',
+    'preparation_steps', 'preparation_steps_is_html', 'cover',
+    'created_at', 'update_at', 'author__username', 'author__first_name',
+    'author__last_name', 'category__name',
+)
+
+
+def get_export_queryset(id_range=None):
+    # id_range -> (first id, last id + 1) of a partition
+    queryset = Recipe.objects.filter(is_published=True)
+    if id_range is not None:
+        queryset = queryset.filter(
+            pk__gte=id_range[0], pk__lt=id_range[1])
+    return queryset.order_by('pk')
+
+
+def get_id_ranges(partitions):
+    # Splits the ids of the published recipes in equal ranges
+    # [first, last + 1). Returns [] when there is no recipe
+    bounds = get_export_queryset().aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return []
+
+    first, end = bounds['first'], bounds['last'] + 1
+    size = -(-(end - first) // max(partitions, 1))  # ceil
+
+    return [
+        (start, min(start + size, end))
+        for start in range(first, end, size)
+    ]
+
+
+def get_tag_names(recipe_ids):
+    # {recipe_id: ['tag1', 'tag2']} of a chunk, in one query
+    tag_names = defaultdict(list)
+
+    for recipe_id, tag_name in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list('recipe_id', 'tag__name'):
+        tag_names[recipe_id].append(tag_name)
+
+    return tag_names
+
+
+def to_export_row(row, tag_names):
+    first_name = row.pop('author__first_name') or ''
+    last_name = row.pop('author__last_name') or ''
+
+    row.update({
+        'created_at': row['created_at'].isoformat(),
+        'update_at': row['update_at'].isoformat(),
+        'author_username': row.pop('author__username'),
+        'author_name': f'{first_name} {last_name}'.strip(),
+        'category_name': row.pop('category__name') or '',
+        'tags': tag_names.get(row['id'], []),
+    })
+    return row
+
+
+def iter_export_chunks(id_range=None, chunk_size=STREAM_CHUNK_SIZE):
+    # Lists of at most chunk_size export rows (dicts of EXPORT_FIELDS)
+    rows = get_export_queryset(id_range).values(
+        *QUERY_FIELDS).iterator(chunk_size=chunk_size)
+
+    for chunk in batched(rows, chunk_size):
+        tag_names = get_tag_names([row['id'] for row in chunk])
+        yield [to_export_row(row, tag_names) for row in chunk]
+
+
+def write_ndjson(chunks, stream):
+    total = 0
+    for chunk in chunks:
+        stream.writelines(
+            json.dumps(row, ensure_ascii=False) + '\n' for row in chunk)
+        total += len(chunk)
+    return total
+
+
+def write_csv(chunks, stream):
+    # Tags separated by comma, as in the JSON list views
+    writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+
+    total = 0
+    for chunk in chunks:
+        for row in chunk:
+            row['tags'] = ', '.join(row['tags'])
+        writer.writerows(chunk)
+        total += len(chunk)
+    return total
+
+
+def encode_dictionary(values):
+    # ['a', 'b', 'a'] -> {'values': ['a', 'b'], 'indexes': [0, 1, 0]}
+    dictionary = {}
+    indexes = [dictionary.setdefault(value, len(dictionary))
+               for value in values]
+    return {'values': list(dictionary), 'indexes': indexes}
+
+
+def write_columns(chunks, stream):
+    stream.write(json.dumps({
+        'format': 'recipes-columns',
+        'version': COLUMNS_FORMAT_VERSION,
+        'fields': EXPORT_FIELDS,
+    }) + '\n')
+
+    total = 0
+    for chunk in chunks:
+        columns = {}
+        for field in EXPORT_FIELDS:
+            values = [row[field] for row in chunk]
+            if field in DICTIONARY_FIELDS:
+                values = encode_dictionary(values)
+            columns[field] = values
+
+        stream.write(json.dumps(
+            {'count': len(chunk), 'columns': columns},
+            ensure_ascii=False, separators=(',', ':')) + '\n')
+        total += len(chunk)
+    return total
+
+
+WRITERS = {
+    'ndjson': write_ndjson,
+    'csv': write_csv,
+    'columns': write_columns,
+}
+
+
+def get_format(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith('.columns.jsonl'):
+        return 'columns'
+    return 'ndjson'
+
+
+def get_partition_path(path, number):
+    # recipes.ndjson -> recipes.part000.ndjson
+    path = Path(path)
+    suffixes = ''.join(path.suffixes)
+    name = path.name[:len(path.name) - len(suffixes)]
+    return str(path.with_name(f'{name}.part{number:03d}{suffixes}'))
+
+
+def export_to_stream(stream, file_format='ndjson', id_range=None,
+                     chunk_size=STREAM_CHUNK_SIZE):
+    # Returns the number of recipes written
+    return WRITERS[file_format](
+        iter_export_chunks(id_range, chunk_size), stream)
+
+
+def export_to_path(path, file_format='ndjson', id_range=None,
+                   chunk_size=STREAM_CHUNK_SIZE):
+    if path == '-':
+        return export_to_stream(
+            sys.stdout, file_format, id_range, chunk_size)
+
+    with open(path, 'w', newline='', encoding='utf-8') as stream:
+        return export_to_stream(stream, file_format, id_range, chunk_size)
+
+
+def export_partition(path, file_format, id_range, chunk_size):
+    # Runs in a worker thread: its connection is closed at the end
+    try:
+        return export_to_path(path, file_format, id_range, chunk_size)
+    finally:
+        connections.close_all()
+
+
+def export_recipes(path, file_format='ndjson', partitions=1, workers=1,
+                   chunk_size=STREAM_CHUNK_SIZE):
+    # Returns [(path, number of recipes)] of the files written
+    if partitions <= 1:
+        return [(path, export_to_path(path, file_format, None, chunk_size))]
+
+    jobs = [
+        (get_partition_path(path, number), file_format, id_range, chunk_size)
+        for number, id_range in enumerate(get_id_ranges(partitions))
+    ]
+
+    if workers <= 1:
+        return [(job[0], export_to_path(*job)) for job in jobs]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        totals = list(executor.map(lambda job: export_partition(*job), jobs))
+
+    return [(job[0], total) for job, total in zip(jobs, totals)]
@@ -0,0 +1,347 @@
+import csv
+import json
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.text import slugify
+
+from recipes.cards import get_card_source_queryset, save_recipe_cards
+from recipes.counters import add_published_recipe_counts
+from recipes.listings import (
+    HOME_LISTING, category_listing, invalidate_listings, tag_listing)
+from recipes.models import Category, CoverImageJob, Recipe
+from recipes.search import get_search_backend
+from tag.models import Tag, make_tag_slug
+from utils.cache import page_cache
+from utils.streaming import batched
+
+# BULK RECIPE IMPORT
+# 'manage.py import_recipes' reads JSONL or CSV rows and inserts them in
+# batches: one bulk_create of recipes and one of m2m rows per batch,
+# instead of one Recipe.save() (and its signals) per recipe.
+# Categories, authors and tags are resolved by name through in memory
+# maps (the missing categories and tags are created in bulk).
+# What the signals would do is done here once per batch: cards, search
+# index and counters. The covers are not processed: a pending
+# CoverImageJob is recorded to each one ('manage.py process_cover_jobs').
+#
+# Row fields (JSON keys or CSV columns):
+#     title, description, preparation_time, servings and
+#         preparation_steps -> required
+#     slug -> slugify(title) when missing
+#     preparation_time_unit, servings_unit -> 'minutes', 'portions'
+#     preparation_steps_is_html, is_published -> booleans
+#     category -> category name
+#     author -> author username (the default author when missing)
+#     tags -> list of names (JSON) or names separated by comma
+#     cover -> path of the image, relative to MEDIA_ROOT
+
+REQUIRED_FIELDS = (
+    'title', 'description', 'preparation_time', 'servings',
+    'preparation_steps',
+)
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+
+# Keys of a parsed row that are not Recipe fields
+ROW_NAME_KEYS = ('line', 'category', 'author', 'tags')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield line_number, ImportRowError(f'invalid JSON: {error}')
+
+
+def read_csv(stream):
+    # Line 1 is the header
+    for line_number, row in enumerate(csv.DictReader(stream), start=2):
+        yield line_number, row
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def get_format(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def parse_tags(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return list(dict.fromkeys(
+        str(name).strip() for name in value if str(name).strip()))
+
+
+def get_choice(row, field, default):
+    value = str(row.get(field) or default).strip().lower()
+    choices = dict(Recipe._meta.get_field(field).choices)
+    if value not in choices:
+        raise ImportRowError(f'{field}: invalid value {value!r}')
+    return value
+
+
+def parse_row(line_number, row):
+    # Returns the recipe fields (and the names to resolve) of a row
+    if isinstance(row, ImportRowError):
+        raise row
+    if not isinstance(row, dict):
+        raise ImportRowError('the row is not an object')
+
+    missing = [field for field in REQUIRED_FIELDS
+               if row.get(field) in (None, '')]
+    if missing:
+        raise ImportRowError(f"missing {', '.join(missing)}")
+
+    title = str(row['title']).strip()
+    try:
+        preparation_time = int(row['preparation_time'])
+        servings = int(row['servings'])
+    except (TypeError, ValueError):
+        raise ImportRowError('preparation_time and servings must be integers')
+
+    slug = str(row.get('slug') or '').strip() or slugify(title)[
+        :Recipe._meta.get_field('slug').max_length]
+    description = str(row['description'])
+
+    for field, value in (
+            ('title', title), ('slug', slug), ('description', description)):
+        max_length = Recipe._meta.get_field(field).max_length
+        if len(value) > max_length:
+            raise ImportRowError(
+                f'{field}: more than {max_length} characters')
+
+    return {
+        'line': line_number,
+        'title': title,
+        'slug': slug,
+        'description': description,
+        'preparation_time': preparation_time,
+        'preparation_time_unit': get_choice(
+            row, 'preparation_time_unit', 'minutes'),
+        'servings': servings,
+        'servings_unit': get_choice(row, 'servings_unit', 'portions'),
+        'preparation_steps': str(row['preparation_steps']),
+        'preparation_steps_is_html': parse_bool(
+            row.get('preparation_steps_is_html')),
+        'is_published': parse_bool(row.get('is_published')),
+        'cover': str(row.get('cover') or '').strip(),
+        'category': str(row.get('category') or '').strip(),
+        'author': str(row.get('author') or '').strip(),
+        'tags': parse_tags(row.get('tags')),
+    }
+
+
+class RecipeImporter:
+
+    # Imports rows in batches of batch_size.
+    # default_author -> username of the recipes without author
+    # The results are in created, skipped (duplicated titles/slugs),
+    # errors [(line number, message)] and cover_jobs
+
+    def __init__(self, batch_size=1000, default_author=None):
+        self.batch_size = batch_size
+        self.default_author = default_author
+
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.cover_jobs = 0
+
+        # name -> pk. Duplicated names resolve to the oldest row
+        self.categories = dict(
+            Category.objects.order_by('-pk').values_list('name', 'pk'))
+        self.authors = {}
+        self.tags = {}
+
+        self.seen_titles = set()
+        self.seen_slugs = set()
+        self.listings = set()
+        self.random = random.Random()
+
+    def import_stream(self, stream, file_format='jsonl'):
+        rows = READERS[file_format](stream)
+
+        try:
+            for batch in batched(rows, self.batch_size):
+                self.import_batch(batch)
+        finally:
+            self.finish()
+
+    def import_batch(self, batch):
+        rows = []
+
+        for line_number, row in batch:
+            try:
+                rows.append(parse_row(line_number, row))
+            except ImportRowError as error:
+                self.errors.append((line_number, str(error)))
+
+        # Rows of unknown authors are dropped before drop_duplicates: their
+        # titles and slugs must stay free to the next rows
+        self.resolve_authors(rows)
+        rows = [row for row in rows if row['author_id'] is not None]
+
+        rows = self.drop_duplicates(rows)
+        if not rows:
+            return
+
+        with transaction.atomic():
+            self.resolve_categories(rows)
+            self.resolve_tags(rows)
+            self.insert(rows)
+
+    def drop_duplicates(self, rows):
+        # Title and slug are unique: rows already imported (in this file
+        # or before) are skipped
+        existing_titles = set(Recipe.objects.filter(
+            title__in=[row['title'] for row in rows]
+        ).values_list('title', flat=True))
+        existing_slugs = set(Recipe.objects.filter(
+            slug__in=[row['slug'] for row in rows]
+        ).values_list('slug', flat=True))
+
+        unique_rows = []
+        for row in rows:
+            if (row['title'] in existing_titles or
+                    row['slug'] in existing_slugs or
+                    row['title'] in self.seen_titles or
+                    row['slug'] in self.seen_slugs):
+                self.skipped += 1
+                continue
+
+            self.seen_titles.add(row['title'])
+            self.seen_slugs.add(row['slug'])
+            unique_rows.append(row)
+
+        return unique_rows
+
+    def resolve_authors(self, rows):
+        for row in rows:
+            row['author'] = row['author'] or self.default_author or ''
+
+        missing = {row['author'] for row in rows} - self.authors.keys()
+        if missing:
+            self.authors.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+
+        for row in rows:
+            row['author_id'] = self.authors.get(row['author'])
+            if row['author_id'] is None:
+                self.errors.append((
+                    row['line'], f"unknown author {row['author']!r}"))
+
+    def resolve_categories(self, rows):
+        missing = {
+            row['category'] for row in rows if row['category']
+        } - self.categories.keys()
+
+        if missing:
+            created = Category.objects.bulk_create(
+                Category(name=name) for name in sorted(missing))
+            self.categories.update(
+                (category.name, category.pk) for category in created)
+
+        for row in rows:
+            row['category_id'] = self.categories.get(row['category'])
+
+    def resolve_tags(self, rows):
+        missing = {
+            name for row in rows for name in row['tags']
+        } - self.tags.keys()
+
+        if missing:
+            # Tag.name is indexed
+            self.tags.update(Tag.objects.filter(
+                name__in=missing).order_by('-pk').values_list('name', 'pk'))
+            missing -= self.tags.keys()
+
+        if missing:
+            created = Tag.objects.bulk_create(
+                Tag(name=name, slug=make_tag_slug(name, self.random))
+                for name in sorted(missing))
+            self.tags.update((tag.name, tag.pk) for tag in created)
+
+    def insert(self, rows):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(**{
+                field: value for field, value in row.items()
+                if field not in ROW_NAME_KEYS
+            })
+            for row in rows
+        )
+
+        TagLink = Recipe.tags.through
+        TagLink.objects.bulk_create(
+            (
+                TagLink(recipe_id=recipe.pk, tag_id=self.tags[name])
+                for recipe, row in zip(recipes, rows)
+                for name in row['tags']
+            ),
+            batch_size=self.batch_size,
+        )
+
+        # Deferred cover processing
+        cover_jobs = CoverImageJob.objects.bulk_create(
+            CoverImageJob(recipe_id=recipe.pk, cover_name=recipe.cover.name)
+            for recipe in recipes if recipe.cover
+        )
+        self.cover_jobs += len(cover_jobs)
+
+        # What the signals do to each saved recipe
+        imported = list(get_card_source_queryset(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])))
+        save_recipe_cards(imported)
+        get_search_backend().index_recipes(imported)
+        self.update_counters(rows)
+
+        self.created += len(recipes)
+
+    def update_counters(self, rows):
+        category_counts = {}
+        tag_counts = {}
+
+        for row in rows:
+            if not row['is_published']:
+                continue
+
+            category_id = row['category_id']
+            category_counts[category_id] = (
+                category_counts.get(category_id, 0) + 1)
+            self.listings.add(HOME_LISTING)
+            if category_id is not None:
+                self.listings.add(category_listing(category_id))
+
+            for name in row['tags']:
+                tag_id = self.tags[name]
+                tag_counts[tag_id] = tag_counts.get(tag_id, 0) + 1
+                self.listings.add(tag_listing(name))
+
+        add_published_recipe_counts(category_counts, tag_counts)
+
+    def finish(self):
+        # The cached pages and listings are dropped once, at the end
+        if self.listings:
+            invalidate_listings(self.listings)
+            page_cache.invalidate()
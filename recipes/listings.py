@@ -0,0 +1,121 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Recipe, RecipeCard
+from utils.conditional import aget_queryset_stats, get_queryset_stats
+
+# LISTING STATS CACHE
+# The list pages (home, category, tag) need {'total', 'last_modified'}
+# of their recipes: the total is the pagination count and the existence
+# probe, both are the HTTP validators (utils/conditional.py). They are
+# computed with one aggregate query and kept here, one cache entry per
+# listing, so a listing request does not run the aggregate at all.
+#
+# The entries are dropped by recipes/signals.py only to the listings
+# touched by a change: publishing/unpublishing/saving/deleting a
+# published recipe (home, its categories and tags), changing its tags,
+# renaming/deleting a category, tag or author (their recipes' update_at
+# is touched) and saving the cover variants (recipes/covers.py).
+# LISTING_STATS_TIMEOUT limits how long a change made without signals
+# (queryset.update()) stays unseen.
+
+HOME_LISTING = 'home'
+
+# The list views read RecipeCard (HTML) or Recipe (JSON, search, tags).
+# Both have an entry per listing
+LISTING_MODELS = (Recipe, RecipeCard)
+
+
+def category_listing(category_id):
+    return f'category:{category_id}'
+
+
+def tag_listing(tag_name):
+    return f'tag:{tag_name}'
+
+
+def get_listing_stats_timeout():
+    return getattr(settings, 'LISTING_STATS_TIMEOUT', 600)
+
+
+def make_listing_key(model, listing):
+    # Tag names may have spaces: the listing is hashed to keep the key
+    # valid to memcached
+    digest = hashlib.md5(listing.encode('utf-8')).hexdigest()
+    return f'recipes:listing:{model._meta.label_lower}:{digest}'
+
+
+def get_listing_stats(listing, queryset):
+    # Returns the cached stats of a listing, computing them from the
+    # queryset when missing.
+    # listing -> None when the queryset is not a listing (not cached)
+    timeout = get_listing_stats_timeout()
+    if listing is None or timeout <= 0:
+        return get_queryset_stats(queryset)
+
+    key = make_listing_key(queryset.model, listing)
+    stats = cache.get(key)
+
+    if stats is None:
+        stats = get_queryset_stats(queryset)
+        cache.set(key, stats, timeout=timeout)
+
+    return stats
+
+
+async def aget_listing_stats(listing, queryset):
+    # Async version of get_listing_stats() (async views)
+    timeout = get_listing_stats_timeout()
+    if listing is None or timeout <= 0:
+        return await aget_queryset_stats(queryset)
+
+    key = make_listing_key(queryset.model, listing)
+    stats = await cache.aget(key)
+
+    if stats is None:
+        stats = await aget_queryset_stats(queryset)
+        await cache.aset(key, stats, timeout=timeout)
+
+    return stats
+
+
+def get_recipes_listings(recipes):
+    # Listings displaying any of the recipes (a Recipe queryset).
+    # Only the published ones are displayed
+    recipes = recipes.filter(is_published=True)
+
+    category_ids = set(recipes.values_list('category_id', flat=True))
+    if not category_ids:
+        return set()
+
+    tag_names = Recipe.tags.through.objects.filter(
+        recipe__in=recipes).values_list('tag__name', flat=True)
+
+    return {
+        HOME_LISTING,
+        *(category_listing(category_id)
+          for category_id in category_ids if category_id is not None),
+        *(tag_listing(tag_name) for tag_name in tag_names),
+    }
+
+
+def _delete_listings_stats(keys):
+    cache.delete_many(keys)
+
+
+def invalidate_listings(listings):
+    # Dropping right now and again after the commit, as the page cache
+    # (recipes/signals.py): a concurrent request could cache the old
+    # stats between the signal and the commit
+    keys = [
+        make_listing_key(model, listing)
+        for listing in listings for model in LISTING_MODELS
+    ]
+    if not keys:
+        return
+
+    _delete_listings_stats(keys)
+    transaction.on_commit(lambda: _delete_listings_stats(keys))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.exporter import WRITERS, export_recipes, get_format
+from utils.streaming import STREAM_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Export the published recipes to NDJSON, CSV or a columnar '
+            'format (see recipes/exporter.py)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help="output file. '-' writes to the standard output")
+        parser.add_argument(
+            '--format', choices=sorted(WRITERS),
+            help='format of the output (default: by the extension, .csv, '
+                 '.columns.jsonl or ndjson)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=STREAM_CHUNK_SIZE,
+            help='recipes read from the database at a time')
+        parser.add_argument(
+            '--partitions', type=int, default=1,
+            help='split the recipes by id range, one file per partition')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='partitions written at the same time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-' and options['partitions'] > 1:
+            raise CommandError(
+                'partitions are written to files, not the standard output')
+
+        try:
+            files = export_recipes(
+                path,
+                file_format=options['format'] or get_format(path),
+                partitions=options['partitions'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+            )
+        except OSError as error:
+            raise CommandError(str(error))
+
+        if path == '-':
+            return
+
+        for file_path, total in files:
+            self.stdout.write(f'{file_path}: {total} recipe(s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(total for _, total in files)} recipe(s) exported.'))
@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importer import READERS, RecipeImporter, get_format
+from utils.routers import use_primary
+
+# Errors written to stderr (the others are only counted)
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from JSONL or CSV files (see recipes/importer.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+',
+            help="JSONL (.jsonl, .ndjson) or CSV (.csv) files. '-' reads "
+                 "the standard input")
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='format of the files (default: by the extension; jsonl '
+                 'to the standard input)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--author',
+            help='username of the author of the rows without author')
+
+    # Reads the rows it writes: primary only (utils/routers.py)
+    @use_primary()
+    def handle(self, *args, **options):
+        importer = RecipeImporter(
+            batch_size=options['batch_size'],
+            default_author=options['author'])
+
+        for path in options['paths']:
+            file_format = options['format'] or get_format(path)
+
+            if path == '-':
+                importer.import_stream(sys.stdin, file_format)
+                continue
+
+            try:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    importer.import_stream(stream, file_format)
+            except OSError as error:
+                raise CommandError(f'{path}: {error}')
+
+        for line_number, message in importer.errors[:MAX_ERRORS_SHOWN]:
+            self.stderr.write(f'line {line_number}: {message}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{importer.created} recipe(s) imported, {importer.skipped} '
+            f'duplicated, {len(importer.errors)} error(s). '
+            f'{importer.cover_jobs} cover job(s) pending '
+            "('manage.py process_cover_jobs')."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.covers import process_pending_cover_jobs
+from utils.routers import use_primary
+
+
+class Command(BaseCommand):
+    help = 'Process the pending cover image jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Process the failed jobs again')
+        parser.add_argument(
+            '--stale-timeout', type=int, default=None,
+            help='seconds after which a job left processing is processed '
+                 'again (default: settings.COVER_JOB_TIMEOUT)')
+
+    # Reads the rows it writes: primary only (utils/routers.py)
+    @use_primary()
+    def handle(self, *args, **options):
+        total = process_pending_cover_jobs(
+            retry_failed=options['retry_failed'],
+            stale_timeout=options['stale_timeout'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} cover job(s) processed.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cards import rebuild_recipe_cards
+from utils.routers import use_primary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized recipe cards used by the list pages'
+
+    # Reads the rows it writes: primary only (utils/routers.py)
+    @use_primary()
+    def handle(self, *args, **options):
+        total = rebuild_recipe_cards()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipe cards rebuilt ({total} recipes).'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import rebuild_recipe_counters
+from utils.routers import use_primary
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the published recipe counters of the categories '
+        'and tags')
+
+    # Reads the rows it writes: primary only (utils/routers.py)
+    @use_primary()
+    def handle(self, *args, **options):
+        categories, tags = rebuild_recipe_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipe counters rebuilt ({categories} categories, '
+            f'{tags} tags).'))
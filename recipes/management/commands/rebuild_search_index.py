@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+from utils.routers import use_primary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the recipes search index from scratch'
+
+    # Reads the rows it writes: primary only (utils/routers.py)
+    @use_primary()
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        queryset = Recipe.objects.order_by('pk')
+
+        backend.rebuild(queryset)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt ({queryset.count()} recipes).'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_coverimagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.13 on 2026-10-18 11:26
+
+from django.db import migrations, models
+import recipes.models
+
+
+def fill_recipe_cards(apps, schema_editor):
+    # Cards of the recipes created before this migration. Same data as
+    # recipes/cards.py (historical models do not have its helpers).
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeCard = apps.get_model('recipes', 'RecipeCard')
+    Profile = apps.get_model('authors', 'Profile')
+
+    profile_ids = dict(Profile.objects.values_list('author_id', 'id'))
+    cards = []
+
+    for recipe in Recipe.objects.select_related(
+            'author', 'category').prefetch_related('tags').iterator(
+                chunk_size=500):
+        author = recipe.author
+        if author is None:
+            author_display_name = None
+        elif author.first_name:
+            author_display_name = f'{author.first_name} {author.last_name}'
+        else:
+            author_display_name = author.username
+
+        cards.append(RecipeCard(
+            id=recipe.id,
+            is_published=recipe.is_published,
+            title=recipe.title,
+            slug=recipe.slug,
+            description=recipe.description,
+            preparation_time=recipe.preparation_time,
+            preparation_time_unit=recipe.preparation_time_unit,
+            servings=recipe.servings,
+            servings_unit=recipe.servings_unit,
+            created_at=recipe.created_at,
+            update_at=recipe.update_at,
+            author_id=recipe.author_id,
+            author_display_name=author_display_name,
+            author_profile_id=profile_ids.get(recipe.author_id),
+            category_id=recipe.category_id,
+            category_name=recipe.category.name if recipe.category else None,
+            cover=recipe.cover,
+            cover_variants=recipe.cover_variants,
+            tag_names=sorted(tag.name for tag in recipe.tags.all()),
+        ))
+
+    RecipeCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authors', '0001_initial'),
+        ('recipes', '0009_recipe_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('is_published', models.BooleanField(default=False)),
+                ('title', models.CharField(max_length=65)),
+                ('slug', models.SlugField()),
+                ('description', models.CharField(max_length=165)),
+                ('preparation_time', models.IntegerField()),
+                ('preparation_time_unit', models.CharField(choices=[('days', 'Days'), ('minutes', 'Minutes'), ('hours', 'Hours')], max_length=65)),
+                ('servings', models.IntegerField()),
+                ('servings_unit', models.CharField(choices=[('portions', 'Portions'), ('pieces', 'Pieces'), ('units', 'Units'), ('people', 'People')], max_length=65)),
+                ('created_at', models.DateTimeField()),
+                ('update_at', models.DateTimeField()),
+                ('author_id', models.BigIntegerField(null=True)),
+                ('author_display_name', models.CharField(blank=True, max_length=320, null=True)),
+                ('author_profile_id', models.BigIntegerField(null=True)),
+                ('category_id', models.BigIntegerField(null=True)),
+                ('category_name', models.CharField(blank=True, max_length=65, null=True)),
+                ('cover', models.ImageField(blank=True, default='', upload_to='')),
+                ('cover_variants', models.JSONField(blank=True, default=dict)),
+                ('tag_names', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_published', '-id'], name='recipes_card_published_idx'), models.Index(fields=['is_published', 'category_id', '-id'], name='recipes_card_category_idx')],
+            },
+            bases=(recipes.models.CoverVariantsMixin, models.Model),
+        ),
+        migrations.RunPython(fill_recipe_cards, migrations.RunPython.noop),
+    ]
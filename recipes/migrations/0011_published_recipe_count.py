@@ -0,0 +1,45 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_published_recipe_counts(apps, schema_editor):
+    # Counters of the recipes created before this migration. Same
+    # queries as recipes/counters.py (historical models do not have its
+    # helpers).
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Category = apps.get_model('recipes', 'Category')
+    Tag = apps.get_model('tag', 'Tag')
+
+    category_counts = Recipe.objects.filter(
+        category=OuterRef('pk'), is_published=True
+    ).order_by().values('category').annotate(total=Count('pk')).values(
+        'total')
+    Category.objects.update(published_recipe_count=Coalesce(
+        Subquery(category_counts), 0))
+
+    tag_counts = Recipe.tags.through.objects.filter(
+        tag=OuterRef('pk'), recipe__is_published=True
+    ).order_by().values('tag').annotate(total=Count('pk')).values('total')
+    Tag.objects.update(published_recipe_count=Coalesce(
+        Subquery(tag_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipecard'),
+        ('tag', '0003_published_recipe_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            fill_published_recipe_counts, migrations.RunPython.noop),
+    ]
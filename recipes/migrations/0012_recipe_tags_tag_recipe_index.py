@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:20
+
+from django.db import migrations
+
+# The m2m table is created by django (Recipe.tags has no through model),
+# so its indexes can not be declared in a Meta. The unique index of the
+# table is (recipe_id, tag_id): this one is its mirror, used by the tag
+# pages (tag_id = ... -> recipe_id, read from the index only).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_published_recipe_count'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX recipes_recipe_tags_tag_recipe_idx;',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+def fill_search_stats(apps, schema_editor):
+    # Stats of the recipes indexed before this migration
+    RecipeSearchTerm = apps.get_model('recipes', 'RecipeSearchTerm')
+    RecipeSearchStats = apps.get_model('recipes', 'RecipeSearchStats')
+
+    # {recipe_id: document_length}, the same in every row of a recipe
+    lengths = dict(RecipeSearchTerm.objects.order_by().values_list(
+        'recipe_id', 'document_length').distinct())
+    RecipeSearchStats.objects.create(
+        pk=1, documents=len(lengths), total_length=sum(lengths.values()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('total_length', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_search_stats, migrations.RunPython.noop),
+    ]
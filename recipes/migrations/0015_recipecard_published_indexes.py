@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipesearchstats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipecard',
+            name='recipes_card_published_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipecard',
+            name='recipes_card_category_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-id', 'update_at'], name='recipes_card_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['category_id', '-id', 'update_at'], name='recipes_card_category_idx'),
+        ),
+    ]
@@ -1,6 +1,5 @@
 from django.db.models import F, Value
 from django.db.models.functions import Concat
-from PIL import Image
 from collections import defaultdict
 import os
 
@@ -18,6 +17,11 @@ from tag.models import Tag
 class Category(models.Model):
     name = models.CharField(max_length=65)
 
+    # Number of published recipes of the category. Kept by
+    # recipes/counters.py (signals) and 'manage.py rebuild_recipe_counters'
+    published_recipe_count = models.PositiveIntegerField(
+        default=0, editable=False)
+
     def __str__(self):
         return self.name
 
@@ -42,7 +46,51 @@ class RecipeManager(models.Manager):
             .prefetch_related('tags')
 
 
-class Recipe(models.Model):
+class CoverVariantsMixin:
+    # Responsive variants of the cover (created by recipes/covers.py).
+    # Used by the models with the fields cover and cover_variants.
+
+    @staticmethod
+    def get_cover_variant_name(cover_name, width, extension):
+        # Variants are saved next to the original:
+        # recipes/cover/2024/07/03/cake.jpg -> .../cake_320w.webp
+        root, _ = os.path.splitext(cover_name)
+        return f'{root}_{width}w.{extension}'
+
+    def get_cover_variant_names(self):
+        if not self.cover or not self.cover_variants:
+            return []
+
+        return [
+            self.get_cover_variant_name(self.cover.name, width, extension)
+            for extension in self.cover_variants.get('f', [])
+            for width in self.cover_variants.get('w', [])
+        ]
+
+    def get_cover_srcset(self, extension):
+        # Value of the srcset attribute to one format
+        if not self.cover or extension not in self.cover_variants.get(
+                'f', []):
+            return ''
+
+        return ', '.join(
+            '{} {}w'.format(
+                self.cover.storage.url(self.get_cover_variant_name(
+                    self.cover.name, width, extension)),
+                width)
+            for width in self.cover_variants.get('w', [])
+        )
+
+    @property
+    def cover_srcset_webp(self):
+        return self.get_cover_srcset('webp')
+
+    @property
+    def cover_srcset_jpg(self):
+        return self.get_cover_srcset('jpg')
+
+
+class Recipe(CoverVariantsMixin, models.Model):
     objects = RecipeManager()
     title = models.CharField(
         max_length=65, unique=True, verbose_name=_('Title'))
@@ -92,6 +140,10 @@ class Recipe(models.Model):
         upload_to='recipes/cover/%Y/%m/%d/', blank=True, default='',
         verbose_name=_('Cover Image'))
 
+    # Manifest of the resized copies of the cover, created by
+    # recipes/covers.py: {'w': [320, 480], 'f': ['webp', 'jpg']}
+    cover_variants = models.JSONField(default=dict, blank=True)
+
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True,
         default=None, verbose_name=_('Category'))
@@ -108,8 +160,29 @@ class Recipe(models.Model):
     def get_absolute_url(self):
         return reverse("recipes:recipe", kwargs={"pk": self.id})
 
+    # Same interface as RecipeCard, used by recipes/partials/recipe.html
+    @property
+    def author_display_name(self):
+        if self.author is None:
+            return None
+        if self.author.first_name:
+            return f'{self.author.first_name} {self.author.last_name}'
+        return self.author.username
+
+    @property
+    def author_profile_id(self):
+        profile = getattr(self.author, 'profile', None)
+        return profile.id if profile else None
+
+    @property
+    def category_name(self):
+        return self.category.name if self.category else None
+
     @ staticmethod
     def resize_image(image, new_width=840):
+        # Pillow is imported only by the processes that resize images
+        from PIL import Image
+
         image_full_path = os.path.join(settings.MEDIA_ROOT, image.name)
         image_pillow = Image.open(image_full_path)
         original_width, original_height = image_pillow.size
@@ -138,11 +211,183 @@ class Recipe(models.Model):
 
         super_save = super().save(*args, **kwargs)
 
+        # The cover is resized by a background worker (recipes/covers.py)
+        # after the transaction is committed, not in the request thread
         if self.cover:
-            self.resize_image(self.cover)
+            from recipes.covers import enqueue_cover_processing
+            enqueue_cover_processing(self)
 
         return super_save
 
+    @property
+    def cover_status(self):
+        # Status of the cover processing job ('' when there is no job)
+        job = CoverImageJob.objects.filter(recipe=self).first()
+        return job.status if job else ''
+
     class Meta:
         verbose_name = _('Recipe')
         verbose_name_plural = _('Recipes')
+        # Indexes of the hot queries (benchmarks/recipe_indexes.py).
+        # Partial: each one holds only the rows its queries read. The last
+        # column only covers the query (index only scans), it is a key
+        # column because INCLUDE is PostgreSQL only
+        indexes = [
+            # Public lists (RecipeListViewBase JSON/tag views,
+            # RecipeManager.get_published): is_published=True
+            # ORDER BY -id, and their validators (count, max update_at)
+            models.Index(
+                fields=['-id', 'update_at'],
+                condition=models.Q(is_published=True),
+                name='recipes_published_idx'),
+            # RecipeListViewCategory(API): + category_id
+            models.Index(
+                fields=['category', '-id', 'update_at'],
+                condition=models.Q(is_published=True),
+                name='recipes_published_cat_idx'),
+            # DashboardList: is_published=False, author, (id, title)
+            models.Index(
+                fields=['author', '-id', 'title'],
+                condition=models.Q(is_published=False),
+                name='recipes_author_drafts_idx'),
+        ]
+
+
+class RecipeSearchTerm(models.Model):
+    # Inverted index used by recipes.search.InvertedIndexSearchBackend.
+    # One row per (term, recipe):
+    #     weight -> term frequency weighted by the field where it was found
+    #     document_length -> number of terms of the recipe (used in BM25)
+    term = models.CharField(max_length=64)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.FloatField(default=0)
+    document_length = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'recipe'],
+                name='recipes_search_term_recipe_unique'),
+        ]
+        indexes = [
+            # Prefix lookups (term LIKE 'abc%') on PostgreSQL
+            models.Index(
+                fields=['term'], name='recipes_search_term_like',
+                opclasses=['varchar_pattern_ops']),
+        ]
+
+
+class RecipeSearchStats(models.Model):
+    # Statistics of the RecipeSearchTerm index used by BM25 (one row,
+    # pk=1). Updated with relative increments by index_recipes() and
+    # remove_recipe(), so the searches do not scan the index:
+    #     documents -> number of indexed recipes
+    #     total_length -> sum of the document_length of the recipes
+    documents = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.documents} documents'
+
+
+class CoverImageJob(models.Model):
+    # Cover processing job (one per recipe), executed by the workers
+    # in recipes/covers.py
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_PROCESSING, _('Processing')),
+        (STATUS_DONE, _('Done')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, related_name='cover_job')
+    cover_name = models.CharField(max_length=255)
+    # sha256 of the processed (resized) cover. A job run again on the
+    # file it already processed does not resize it again
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING,
+        db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    update_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.cover_name} ({self.status})'
+
+    class Meta:
+        verbose_name = _('Cover image job')
+        verbose_name_plural = _('Cover image jobs')
+
+
+class RecipeCard(CoverVariantsMixin, models.Model):
+    # Denormalized read model of a recipe, with exactly the fields used by
+    # recipes/partials/recipe.html in the list pages. Kept in sync by
+    # recipes/cards.py (signals) and 'manage.py rebuild_recipe_cards'.
+    # A list page is a single indexed read of this table (no joins and
+    # no prefetches).
+    #
+    # id is the recipe id (no foreign key: it is a copy of the data)
+    id = models.BigIntegerField(primary_key=True)
+    is_published = models.BooleanField(default=False)
+
+    title = models.CharField(max_length=65)
+    slug = models.SlugField(max_length=50)
+    description = models.CharField(max_length=165)
+
+    preparation_time = models.IntegerField()
+    preparation_time_unit = models.CharField(
+        max_length=65,
+        choices=Recipe._meta.get_field('preparation_time_unit').choices)
+    servings = models.IntegerField()
+    servings_unit = models.CharField(
+        max_length=65,
+        choices=Recipe._meta.get_field('servings_unit').choices)
+
+    created_at = models.DateTimeField()
+    update_at = models.DateTimeField()
+
+    author_id = models.BigIntegerField(null=True)
+    author_display_name = models.CharField(
+        max_length=320, null=True, blank=True)
+    author_profile_id = models.BigIntegerField(null=True)
+
+    category_id = models.BigIntegerField(null=True)
+    category_name = models.CharField(max_length=65, null=True, blank=True)
+
+    cover = models.ImageField(max_length=100, blank=True, default='')
+    cover_variants = models.JSONField(default=dict, blank=True)
+    tag_names = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse("recipes:recipe", kwargs={"pk": self.id})
+
+    class Meta:
+        # Same partial, covering indexes as Recipe.Meta.indexes, to the
+        # HTML home and category pages (RecipeListViewBase with
+        # use_recipe_cards) and their validators (count, max update_at)
+        indexes = [
+            models.Index(
+                fields=['-id', 'update_at'],
+                condition=models.Q(is_published=True),
+                name='recipes_card_published_idx'),
+            models.Index(
+                fields=['category_id', '-id', 'update_at'],
+                condition=models.Q(is_published=True),
+                name='recipes_card_category_idx'),
+        ]
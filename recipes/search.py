@@ -0,0 +1,425 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, FloatField, IntegerField, Max, Q, Sum,
+    Value, When)
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from utils.streaming import batched
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Max length of an indexed term (RecipeSearchTerm.term max_length)
+MAX_TERM_LENGTH = 64
+
+# Weight of each recipe field in the index. A term found in the title
+# counts more than the same term found in the preparation steps.
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'tags': 2.0,
+    'category': 2.0,
+    'description': 1.5,
+    'preparation_steps': 1.0,
+}
+
+# Query tokens with at least this length also match the terms starting
+# with them ('bolo' finds 'bolos'). Shorter tokens only match the whole
+# term, avoiding huge prefix scans.
+PREFIX_MIN_LENGTH = 3
+
+# A prefix match counts less than an exact match
+PREFIX_MATCH_FACTOR = 0.5
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Max number of ranked results returned by a search (the ranked ids are
+# ordered with a CASE). The search page tells the user when the results
+# reached it
+MAX_RESULTS = 500
+
+# Seconds the index statistics (number of documents and average length)
+# are kept in cache
+STATS_TIMEOUT = 60
+STATS_CACHE_KEY = 'recipes:search:stats'
+
+
+def fold_accents(text):
+    # 'Feijão à moda' -> 'feijao a moda'
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(
+        char for char in normalized if not unicodedata.combining(char)
+    ).casefold()
+
+
+def tokenize(text):
+    # Split a text into folded terms
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold_accents(text or ''))
+    ]
+
+
+def get_recipe_fields(recipe):
+    # Returns the text of each indexed field of a recipe
+    preparation_steps = recipe.preparation_steps or ''
+    if recipe.preparation_steps_is_html:
+        preparation_steps = strip_tags(preparation_steps)
+
+    return {
+        'title': recipe.title,
+        'description': recipe.description,
+        'preparation_steps': preparation_steps,
+        'tags': ' '.join(tag.name for tag in recipe.tags.all()),
+        'category': recipe.category.name if recipe.category else '',
+    }
+
+
+class BaseSearchBackend:
+
+    # Interface of the search backends.
+    #     search() -> filter (and order) a Recipe queryset by a search term
+    #     asearch() -> async version of search() (async views). The
+    #         default runs search() in a thread
+    #     index_recipe() / remove_recipe() -> keep the backend data up to
+    #         date. Called by recipes/signals.py
+    #     index_recipes() -> index_recipe() to many recipes (the recipes
+    #         must have category and tags prefetched)
+    #     max_results -> max number of results of a search (None = all)
+
+    max_results = None
+
+    def search(self, queryset, search_term):
+        raise NotImplementedError
+
+    async def asearch(self, queryset, search_term):
+        return await sync_to_async(self.search)(queryset, search_term)
+
+    def index_recipe(self, recipe):
+        ...
+
+    def index_recipes(self, recipes):
+        # Many recipes at once (bulk imports)
+        for recipe in recipes:
+            self.index_recipe(recipe)
+
+    def remove_recipe(self, recipe_id):
+        ...
+
+    def rebuild(self, queryset):
+        for recipe in queryset.iterator():
+            self.index_recipe(recipe)
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+
+    # The old search: LIKE '%term%' in title and description.
+    # It does not need an index.
+
+    def search(self, queryset, search_term):
+        return queryset.filter(
+            Q(title__icontains=search_term) |
+            Q(description__icontains=search_term)
+        )
+
+    async def asearch(self, queryset, search_term):
+        # Only builds the (lazy) queryset
+        return self.search(queryset, search_term)
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+
+    # Search using the RecipeSearchTerm inverted index.
+    # Title, description, preparation steps, tag names and category name
+    # are indexed with accent folding. Every token of the search term must
+    # be found in the recipe (exactly or as prefix) and the results are
+    # ranked by BM25. Unlike SimpleSearchBackend, a token does not match
+    # the middle of a word ('colate' does not find 'chocolate').
+
+    max_results = MAX_RESULTS
+
+    def get_recipe_terms(self, recipe):
+        from recipes.models import RecipeSearchTerm
+
+        weights = Counter()
+        document_length = 0
+
+        for field, text in get_recipe_fields(recipe).items():
+            tokens = tokenize(text)
+            document_length += len(tokens)
+            for token in tokens:
+                weights[token] += FIELD_WEIGHTS[field]
+
+        return [
+            RecipeSearchTerm(
+                term=term,
+                recipe_id=recipe.pk,
+                weight=weight,
+                document_length=document_length,
+            )
+            for term, weight in weights.items()
+        ]
+
+    def index_recipe(self, recipe):
+        self.index_recipes([recipe])
+
+    def index_recipes(self, recipes):
+        # One delete and one insert to all the recipes
+        from recipes.models import RecipeSearchTerm
+
+        recipes = list(recipes)
+        recipe_ids = [recipe.pk for recipe in recipes]
+        terms = []
+        lengths = {}
+        for recipe in recipes:
+            recipe_terms = self.get_recipe_terms(recipe)
+            terms.extend(recipe_terms)
+            if recipe_terms:
+                lengths[recipe.pk] = recipe_terms[0].document_length
+
+        old_lengths = self._get_document_lengths(recipe_ids)
+        RecipeSearchTerm.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+        self._add_to_stats(
+            len(lengths) - len(old_lengths),
+            sum(lengths.values()) - sum(old_lengths.values()))
+
+    def remove_recipe(self, recipe_id):
+        from recipes.models import RecipeSearchTerm
+
+        old_lengths = self._get_document_lengths([recipe_id])
+        RecipeSearchTerm.objects.filter(recipe_id=recipe_id).delete()
+        self._add_to_stats(-len(old_lengths), -sum(old_lengths.values()))
+
+    def rebuild(self, queryset):
+        queryset = queryset.select_related('category').prefetch_related(
+            'tags')
+        for recipes in batched(queryset.iterator(chunk_size=500), 500):
+            self.index_recipes(recipes)
+        self.rebuild_stats()
+
+    def _get_document_lengths(self, recipe_ids):
+        # {recipe_id: document_length} of the indexed recipes
+        from recipes.models import RecipeSearchTerm
+
+        return dict(RecipeSearchTerm.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('recipe_id', 'document_length').distinct())
+
+    def _add_to_stats(self, documents, total_length):
+        # Relative update of the stats row (concurrent indexing does not
+        # overwrite it)
+        from recipes.models import RecipeSearchStats
+
+        if not documents and not total_length:
+            return
+
+        updated = RecipeSearchStats.objects.filter(pk=1).update(
+            documents=F('documents') + documents,
+            total_length=F('total_length') + total_length)
+        if not updated:
+            self.rebuild_stats()
+
+    def rebuild_stats(self):
+        # Recomputes the stats row from the whole index (one scan). Used
+        # by rebuild() and when the row is missing
+        from recipes.models import RecipeSearchStats, RecipeSearchTerm
+
+        lengths = RecipeSearchTerm.objects.order_by().values(
+            'recipe_id').annotate(length=Max('document_length'))
+        stats = {
+            'documents': lengths.count(),
+            'total_length': sum(lengths.values_list(
+                'length', flat=True).iterator()),
+        }
+        RecipeSearchStats.objects.update_or_create(pk=1, defaults=stats)
+        cache.delete(STATS_CACHE_KEY)
+
+    def _make_stats(self, row):
+        # row -> (documents, total_length) of RecipeSearchStats
+        total, total_length = row or (0, 0)
+        average_length = total_length / total if total else 0
+        return (total, average_length or 1)
+
+    def _get_stats_queryset(self):
+        from recipes.models import RecipeSearchStats
+
+        return RecipeSearchStats.objects.filter(pk=1).values_list(
+            'documents', 'total_length')
+
+    def get_stats(self):
+        # Number of indexed recipes and their average length, read from
+        # the stats row (no index scan). BM25 only needs approximate
+        # values, so they are cached for STATS_TIMEOUT seconds.
+        stats = cache.get(STATS_CACHE_KEY)
+
+        if stats is None:
+            stats = self._make_stats(self._get_stats_queryset().first())
+            cache.set(STATS_CACHE_KEY, stats, timeout=STATS_TIMEOUT)
+
+        return stats
+
+    async def aget_stats(self):
+        # Async version of get_stats()
+        stats = await cache.aget(STATS_CACHE_KEY)
+
+        if stats is None:
+            stats = self._make_stats(
+                await self._get_stats_queryset().afirst())
+            await cache.aset(STATS_CACHE_KEY, stats, timeout=STATS_TIMEOUT)
+
+        return stats
+
+    def get_token_lookup(self, token):
+        # Terms matched by a token (exactly or as prefix)
+        if len(token) >= PREFIX_MIN_LENGTH:
+            return Q(term__startswith=token)
+        return Q(term=token)
+
+    def get_postings(self, queryset, tokens):
+        # Rows of the index that match any token, restricted to the
+        # queryset recipes (not evaluated: aggregated by the callers)
+        from recipes.models import RecipeSearchTerm
+
+        lookup = Q()
+        for token in tokens:
+            lookup |= self.get_token_lookup(token)
+
+        return RecipeSearchTerm.objects.filter(
+            lookup,
+            recipe__in=queryset.order_by().values('pk'),
+        ).order_by()
+
+    def get_frequency_aggregates(self, tokens):
+        # df<i> -> number of recipes matched by tokens[i] (one row,
+        # counted by the database)
+        return {
+            f'df{position}': Count(
+                'recipe_id', distinct=True,
+                filter=self.get_token_lookup(token))
+            for position, token in enumerate(tokens)
+        }
+
+    def get_ranked_query(self, postings, tokens, frequencies, stats):
+        # Recipe ids ordered by BM25 score, computed by the database:
+        # one row per recipe matching every token, at most max_results.
+        # The idf of each token is a constant (from frequencies)
+        total_documents, average_length = stats
+        annotations = {'length': Max('document_length')}
+        score = Value(0.0)
+
+        for position, token in enumerate(tokens):
+            document_frequency = frequencies[f'df{position}']
+            # The stats may be a little old (cached)
+            total_documents = max(total_documents, document_frequency)
+            idf = math.log(
+                1 + (total_documents - document_frequency + 0.5) /
+                (document_frequency + 0.5)
+            )
+
+            whens = [When(term=token, then=F('weight'))]
+            if len(token) >= PREFIX_MIN_LENGTH:
+                whens.append(When(
+                    term__startswith=token,
+                    then=F('weight') * PREFIX_MATCH_FACTOR))
+            frequency = f'frequency{position}'
+            annotations[frequency] = Sum(Case(
+                *whens, default=Value(0.0), output_field=FloatField()))
+
+            length_norm = (
+                BM25_K1 * (1 - BM25_B) +
+                F('length') * (BM25_K1 * BM25_B / average_length))
+            score = score + Value(idf) * (
+                F(frequency) * (BM25_K1 + 1) / (F(frequency) + length_norm))
+
+        # Same score -> newest recipe first (same order as the listings)
+        return postings.values('recipe_id').annotate(
+            **annotations
+        ).filter(**{
+            f'frequency{position}__gt': 0 for position in range(len(tokens))
+        }).annotate(
+            score=ExpressionWrapper(score, output_field=FloatField())
+        ).order_by('-score', '-recipe_id').values_list(
+            'recipe_id', flat=True)[:self.max_results]
+
+    def rank(self, queryset, tokens, stats=None):
+        # Returns the recipe ids ordered by BM25 score (the ids that do not
+        # match every token are discarded). Two queries, whatever the
+        # number of matching recipes.
+        # stats -> get_stats() result, when the caller already has it
+        postings = self.get_postings(queryset, tokens)
+        frequencies = postings.aggregate(
+            **self.get_frequency_aggregates(tokens))
+        if not all(frequencies.values()):
+            return []
+
+        return list(self.get_ranked_query(
+            postings, tokens, frequencies, stats or self.get_stats()))
+
+    async def arank(self, queryset, tokens, stats):
+        # Async version of rank()
+        postings = self.get_postings(queryset, tokens)
+        frequencies = await postings.aaggregate(
+            **self.get_frequency_aggregates(tokens))
+        if not all(frequencies.values()):
+            return []
+
+        return [
+            recipe_id async for recipe_id in self.get_ranked_query(
+                postings, tokens, frequencies, stats)
+        ]
+
+    def get_tokens(self, search_term):
+        return list(dict.fromkeys(tokenize(search_term)))
+
+    def order_by_rank(self, queryset, ranked_ids):
+        if not ranked_ids:
+            return queryset.none()
+
+        return queryset.filter(pk__in=ranked_ids).order_by(
+            Case(
+                *[When(pk=recipe_id, then=position)
+                  for position, recipe_id in enumerate(ranked_ids)],
+                output_field=IntegerField(),
+            )
+        )
+
+    def search(self, queryset, search_term):
+        tokens = self.get_tokens(search_term)
+
+        if not tokens:
+            return queryset.none()
+
+        ranked_ids = self.rank(queryset, tokens)
+
+        return self.order_by_rank(queryset, ranked_ids)
+
+    async def asearch(self, queryset, search_term):
+        # The index statistics and the postings are read with the async
+        # ORM and the async cache. Returns a lazy queryset, as search()
+        tokens = self.get_tokens(search_term)
+
+        if not tokens:
+            return queryset.none()
+
+        stats = await self.aget_stats()
+        ranked_ids = await self.arank(queryset, tokens, stats)
+
+        return self.order_by_rank(queryset, ranked_ids)
+
+
+def get_search_backend():
+    # Backend configured in settings.SEARCH_BACKEND (dotted path)
+    backend_path = getattr(
+        settings, 'SEARCH_BACKEND',
+        'recipes.search.InvertedIndexSearchBackend')
+    return import_string(backend_path)()
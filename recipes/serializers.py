@@ -8,6 +8,19 @@ from tag.serializers import TagSerializer
 
 
 class RecipeSerializer(serializers.ModelSerializer):
+
+    # fields -> names of the fields to serialize (sparse fieldsets,
+    #     ?fields=id,title). The other fields are removed, so their
+    #     work (nested tags, reverse() of the links) is not done.
+    #     None serializes every field
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Recipe
         fields = [
@@ -1,9 +1,25 @@
 import os
+from collections import Counter
 
-from django.db.models.signals import pre_delete, pre_save, post_save
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import (
+    m2m_changed, post_delete, pre_delete, pre_save, post_save)
 from django.dispatch import receiver
 
-from recipes.models import Recipe
+from recipes.cards import sync_recipe_card, sync_recipe_cards
+from recipes.counters import (
+    add_published_recipe_counts, add_to_tag_counters, get_recipe_tag_ids,
+    update_recipe_counters)
+from recipes.listings import (
+    category_listing, get_recipes_listings, invalidate_listings,
+    tag_listing)
+from recipes.models import Category, Recipe, RecipeCard
+from recipes.search import get_search_backend
+from tag.models import Tag
+from utils.cache import page_cache
+from utils.streaming import STREAM_CHUNK_SIZE, batched
 
 
 def delete_cover(instance):
@@ -13,6 +29,20 @@ def delete_cover(instance):
         except (ValueError, FileNotFoundError):
             ...
 
+        for variant_name in instance.get_cover_variant_names():
+            try:
+                instance.cover.storage.delete(variant_name)
+            except (ValueError, FileNotFoundError):
+                ...
+
+
+def invalidate_page_cache():
+    # Invalidating right now drops the pages to this request. Invalidating
+    # again after the commit avoids a concurrent request caching the old
+    # data between the signal and the commit.
+    page_cache.invalidate()
+    transaction.on_commit(page_cache.invalidate)
+
 
 @receiver(pre_delete, sender=Recipe)
 def recipe_cover_delete(sender, instance, *args, **kwargs):
@@ -24,6 +54,11 @@ def recipe_cover_delete(sender, instance, *args, **kwargs):
 @receiver(pre_save, sender=Recipe)
 def recipe_cover_update_pre_save(sender, instance, *args, **kwargs):
     old_instance = Recipe.objects.filter(pk=instance.pk).first()
+    instance._was_published = bool(old_instance and old_instance.is_published)
+    # (is_published, category_id) before the save, used by the counters
+    instance._old_counter_state = (
+        (old_instance.is_published, old_instance.category_id)
+        if old_instance else None)
     if old_instance:
         is_new_cover = old_instance.cover != instance.cover
         if is_new_cover:
@@ -34,3 +69,433 @@ def recipe_cover_update_pre_save(sender, instance, *args, **kwargs):
 def recipe_cover_update_post_save(sender, instance, *args, **kwargs):
     if hasattr(instance, 'old_instance'):
         delete_cover(instance.old_instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_page_cache_post_save(sender, instance, *args, **kwargs):
+    # Unpublished recipes are not displayed in the cached pages, so
+    # only the saves that touch a published recipe (or publish/unpublish
+    # it) drop the cache
+    if instance.is_published or getattr(instance, '_was_published', False):
+        invalidate_page_cache()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_page_cache_post_delete(sender, instance, *args, **kwargs):
+    if instance.is_published:
+        invalidate_page_cache()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_touch_update_at_tags_changed(sender, instance, action, reverse,
+                                        pk_set, *args, **kwargs):
+    # Changing the tags does not save the recipe. update_at is touched
+    # here because the HTTP validators (ETag/Last-Modified) use it.
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        recipes = Recipe.objects.filter(pk__in=pk_set or [])
+    else:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+
+    recipes.update(update_at=timezone.now())
+
+
+def touch_recipes(recipes):
+    # The renames and deletes of a category, tag or author change what
+    # their recipes display without saving them (and SET_NULL is an
+    # update, without signals). update_at of the recipes and their cards
+    # is touched (HTTP validators) and their listings are dropped.
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    if not recipe_ids:
+        return
+
+    recipes = Recipe.objects.filter(pk__in=recipe_ids)
+    listings = get_recipes_listings(recipes)
+    now = timezone.now()
+    recipes.update(update_at=now)
+    RecipeCard.objects.filter(pk__in=recipe_ids).update(update_at=now)
+    invalidate_listings(listings)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def name_touch_recipes_post_save(sender, instance, created,
+                                 *args, **kwargs):
+    if is_renamed(instance):
+        touch_recipes(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def name_touch_recipes_pre_delete(sender, instance, *args, **kwargs):
+    touch_recipes(instance.recipe_set.all())
+
+
+@receiver(post_save, sender=User)
+def author_touch_recipes_post_save(sender, instance, created,
+                                   update_fields=None, *args, **kwargs):
+    if is_author_renamed(instance, created, update_fields):
+        touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(pre_delete, sender=User)
+def author_touch_recipes_pre_delete(sender, instance, *args, **kwargs):
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_page_cache_tags_changed(sender, instance, action, reverse,
+                                   *args, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    # reverse = True when the change was made from the tag side
+    # (tag.recipe_set.add(...)). In that case any recipe may be affected.
+    if reverse or instance.is_published:
+        invalidate_page_cache()
+
+
+# LISTING STATS
+# The cached stats (recipes/listings.py) of the listings displaying a
+# recipe are dropped when it changes. The listings before the change
+# (old category, removed tags...) are read in the pre_* signals.
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_listings_pre_save(sender, instance, *args, **kwargs):
+    instance._old_listings = get_recipes_listings(
+        Recipe.objects.filter(pk=instance.pk)) if instance.pk else set()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_listings_post_save(sender, instance, *args, **kwargs):
+    old_listings = getattr(instance, '_old_listings', set())
+    if instance.is_published or old_listings:
+        invalidate_listings(old_listings | get_recipes_listings(
+            Recipe.objects.filter(pk=instance.pk)))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_listings_pre_delete(sender, instance, *args, **kwargs):
+    # The tags are deleted before post_delete
+    instance._old_listings = get_recipes_listings(
+        Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_listings_post_delete(sender, instance, *args, **kwargs):
+    invalidate_listings(getattr(instance, '_old_listings', set()))
+
+
+def get_tags_changed_recipes(instance, action, reverse, pk_set):
+    # Recipes whose tags are being changed
+    if not reverse:
+        return Recipe.objects.filter(pk=instance.pk)
+    if action.endswith('_clear'):
+        return Recipe.objects.filter(
+            pk__in=list(instance.recipe_set.values_list('pk', flat=True)))
+    return Recipe.objects.filter(pk__in=pk_set or [])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_listings_tags_changed(sender, instance, action, reverse, pk_set,
+                                 *args, **kwargs):
+    # update_at is touched too, so every listing of the recipes
+    # (before and after the change) is dropped
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        recipes = get_tags_changed_recipes(instance, action, reverse, pk_set)
+        instance._listings_recipes = recipes
+        instance._old_listings = get_recipes_listings(recipes)
+        return
+
+    recipes = getattr(instance, '_listings_recipes', None)
+    if recipes is None:
+        return
+
+    invalidate_listings(
+        instance._old_listings | get_recipes_listings(recipes))
+    del instance._listings_recipes, instance._old_listings
+
+
+@receiver(post_delete, sender=Category)
+def category_listings_post_delete(sender, instance, *args, **kwargs):
+    invalidate_listings({category_listing(instance.pk)})
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Tag)
+def name_pre_save(sender, instance, *args, **kwargs):
+    # The name before the save: the index, the cards and the listings
+    # are only updated when a category/tag is renamed
+    instance._old_name = sender.objects.filter(
+        pk=instance.pk).values_list('name', flat=True).first(
+    ) if instance.pk else None
+
+
+def is_renamed(instance):
+    old_name = getattr(instance, '_old_name', None)
+    return old_name is not None and old_name != instance.name
+
+
+@receiver(post_save, sender=Tag)
+def tag_listings_post_save(sender, instance, created, *args, **kwargs):
+    # A renamed tag moves its recipes to another listing
+    if is_renamed(instance):
+        invalidate_listings(
+            {tag_listing(instance._old_name), tag_listing(instance.name)})
+
+
+@receiver(post_delete, sender=Tag)
+def tag_listings_post_delete(sender, instance, *args, **kwargs):
+    invalidate_listings({tag_listing(instance.name)})
+
+
+# PUBLISHED RECIPE COUNTERS
+# Category/Tag.published_recipe_count (recipes/counters.py)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_counters_post_save(sender, instance, *args, **kwargs):
+    update_recipe_counters(
+        instance.pk,
+        getattr(instance, '_old_counter_state', None),
+        (instance.is_published, instance.category_id))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_counters_pre_delete(sender, instance, *args, **kwargs):
+    # pre_delete: the tags are still linked. The state is read from the
+    # database, the instance may be outdated
+    old_state = Recipe.objects.filter(pk=instance.pk).values_list(
+        'is_published', 'category_id').first()
+    update_recipe_counters(instance.pk, old_state, None)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_counters_tags_changed(sender, instance, action, reverse, pk_set,
+                                 *args, **kwargs):
+    # Only the links to published recipes are counted.
+    # post_clear has no pk_set, so clear is counted before (pre_clear).
+    # pk_set of remove() has every id passed, linked or not: the links
+    # that really exist are read before (pre_remove)
+    if action not in ('post_add', 'pre_remove', 'post_remove', 'pre_clear'):
+        return
+
+    if action == 'pre_remove':
+        links = sender.objects.filter(
+            recipe_id__in=pk_set, tag_id=instance.pk) if reverse else (
+            sender.objects.filter(recipe_id=instance.pk, tag_id__in=pk_set))
+        instance._counter_removed_links = list(links.filter(
+            recipe__is_published=True).values_list('tag_id', flat=True))
+        return
+
+    if action == 'post_remove':
+        # [tag id] of each removed link to a published recipe
+        removed = Counter(getattr(instance, '_counter_removed_links', []))
+        add_published_recipe_counts(
+            {}, {tag_id: -total for tag_id, total in removed.items()})
+        instance._counter_removed_links = []
+        return
+
+    amount = 1 if action == 'post_add' else -1
+
+    if not reverse:
+        if not instance.is_published:
+            return
+        if action == 'pre_clear':
+            add_to_tag_counters(get_recipe_tag_ids(instance.pk), amount)
+        else:
+            add_to_tag_counters(pk_set, amount)
+        return
+
+    # Changed from the tag side: instance is the tag
+    if action == 'pre_clear':
+        recipes = instance.recipe_set.all()
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set or [])
+
+    add_to_tag_counters(
+        [instance.pk], amount * recipes.filter(is_published=True).count())
+
+
+# SEARCH INDEX
+# The search backend index is updated every time a recipe, its tags or
+# the names of its category/tags change
+
+
+def index_recipes(recipes):
+    # Reindex the recipes of a queryset in chunks (index_recipes() of the
+    # backend: one delete and one insert per chunk)
+    backend = get_search_backend()
+    recipes = recipes.select_related('category').prefetch_related(
+        'tags').order_by('pk')
+
+    for batch in batched(recipes.iterator(
+            chunk_size=STREAM_CHUNK_SIZE), STREAM_CHUNK_SIZE):
+        backend.index_recipes(batch)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_index_post_save(sender, instance, *args, **kwargs):
+    get_search_backend().index_recipe(instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_search_index_pre_delete(sender, instance, *args, **kwargs):
+    # Before the cascade, so the index stats are updated
+    get_search_backend().remove_recipe(instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_search_index_tags_changed(sender, instance, action, reverse,
+                                     pk_set, *args, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            get_search_backend().index_recipe(instance)
+        return
+
+    # Changed from the tag side: instance is the tag and pk_set has
+    # the recipes ids. post_clear has no pk_set, so the recipes are
+    # read before (pre_clear)
+    if action == 'pre_clear':
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        index_recipes(Recipe.objects.filter(
+            pk__in=getattr(instance, '_search_recipe_ids', [])))
+    elif action in ('post_add', 'post_remove'):
+        index_recipes(Recipe.objects.filter(pk__in=pk_set or []))
+
+
+@receiver(post_save, sender=Category)
+def category_search_index_post_save(sender, instance, created,
+                                    *args, **kwargs):
+    if is_renamed(instance):
+        index_recipes(instance.recipe_set.all())
+
+
+@receiver(post_save, sender=Tag)
+def tag_search_index_post_save(sender, instance, created, *args, **kwargs):
+    if is_renamed(instance):
+        index_recipes(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_recipes_pre_delete(sender, instance, *args, **kwargs):
+    # The m2m rows are deleted without m2m_changed, so the recipes are
+    # saved here to be reindexed and synced (cards) after the delete
+    instance._deleted_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_search_index_post_delete(sender, instance, *args, **kwargs):
+    # The recipes are read in pre_delete (tag_recipes_pre_delete)
+    index_recipes(Recipe.objects.filter(
+        pk__in=getattr(instance, '_deleted_recipe_ids', [])))
+
+
+# RECIPE CARDS
+# The denormalized cards (recipes/cards.py) are rebuilt every time a
+# recipe or anything displayed in its card changes. The handlers of the
+# related models drop the cached pages too: they display the names.
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_card_post_save(sender, instance, *args, **kwargs):
+    sync_recipe_card(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_card_post_delete(sender, instance, *args, **kwargs):
+    RecipeCard.objects.filter(pk=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_card_tags_changed(sender, instance, action, reverse, pk_set,
+                             *args, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        sync_recipe_cards(Recipe.objects.filter(pk__in=pk_set or []))
+    else:
+        sync_recipe_card(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def category_card_post_save(sender, instance, created, *args, **kwargs):
+    if is_renamed(instance):
+        sync_recipe_cards(instance.recipe_set.all())
+        invalidate_page_cache()
+
+
+@receiver(post_delete, sender=Category)
+def category_card_post_delete(sender, instance, *args, **kwargs):
+    # Recipe.category is SET_NULL (an update, without signals)
+    if RecipeCard.objects.filter(category_id=instance.pk).update(
+            category_id=None, category_name=None):
+        invalidate_page_cache()
+
+
+@receiver(post_delete, sender=Tag)
+def tag_card_post_delete(sender, instance, *args, **kwargs):
+    recipe_ids = getattr(instance, '_deleted_recipe_ids', [])
+    if recipe_ids:
+        sync_recipe_cards(Recipe.objects.filter(pk__in=recipe_ids))
+        invalidate_page_cache()
+
+
+@receiver(post_save, sender=Tag)
+def tag_card_post_save(sender, instance, created, *args, **kwargs):
+    if is_renamed(instance):
+        sync_recipe_cards(instance.recipe_set.all())
+        invalidate_page_cache()
+
+
+# User fields displayed in the cards (author_display_name)
+AUTHOR_CARD_FIELDS = ('first_name', 'last_name', 'username')
+
+
+def changes_author_card(update_fields):
+    # False when the save only writes other fields (update_last_login
+    # saves update_fields={'last_login'} on every login)
+    return update_fields is None or bool(
+        set(AUTHOR_CARD_FIELDS) & set(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def author_card_pre_save(sender, instance, update_fields=None,
+                         *args, **kwargs):
+    instance._old_card_names = User.objects.filter(
+        pk=instance.pk).values_list(*AUTHOR_CARD_FIELDS).first() if (
+        instance.pk and changes_author_card(update_fields)) else None
+
+
+def is_author_renamed(instance, created, update_fields):
+    # The names before the save are read by author_card_pre_save
+    if created or not changes_author_card(update_fields):
+        return False
+
+    old_names = getattr(instance, '_old_card_names', None)
+    names = tuple(getattr(instance, field) for field in AUTHOR_CARD_FIELDS)
+    return old_names is not None and old_names != names
+
+
+@receiver(post_save, sender=User)
+def author_card_post_save(sender, instance, created, update_fields=None,
+                          *args, **kwargs):
+    if is_author_renamed(instance, created, update_fields):
+        sync_recipe_cards(Recipe.objects.filter(author=instance))
+        invalidate_page_cache()
+
+
+@receiver(post_delete, sender=User)
+def author_card_post_delete(sender, instance, *args, **kwargs):
+    # Recipe.author is SET_NULL (an update, without signals)
+    if RecipeCard.objects.filter(author_id=instance.pk).update(
+            author_id=None, author_display_name=None,
+            author_profile_id=None):
+        invalidate_page_cache()
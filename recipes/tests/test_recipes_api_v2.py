@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse  # type: ignore
+
+from recipes.tests.test_recipe_base import RecipeTestBase
+from utils.pagination import encode_cursor
+
+
+class RecipeApiV2ListTest(RecipeTestBase):
+
+    def setUp(self):
+        self.url = reverse('recipes:recipes_api_v2')
+        return super().setUp()
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    # TEST if the next and previous links walk every published recipe
+    def test_recipes_api_v2_cursor_pagination(self):
+        recipes = self.make_recipes_in_batch(qty=5)
+
+        first_page = self.get_json(self.url + '?page_size=2')
+        self.assertIsNone(first_page['previous'])
+
+        ids = [recipe['id'] for recipe in first_page['results']]
+        page = first_page
+        while page['next']:
+            page = self.get_json(page['next'])
+            ids += [recipe['id'] for recipe in page['results']]
+
+        self.assertEqual(ids, [recipe.pk for recipe in reversed(recipes)])
+
+        previous_page = self.get_json(page['previous'])
+        self.assertEqual(
+            [recipe['id'] for recipe in previous_page['results']],
+            [recipes[2].pk, recipes[1].pk])
+
+    # TEST if stale cursors (no items after or before them) return the
+    # first page instead of an error
+    def test_recipes_api_v2_stale_cursors(self):
+        recipes = self.make_recipes_in_batch(qty=3)
+
+        for query in (f'?after={encode_cursor(3, recipes[0].pk)}',
+                      f'?before={encode_cursor(2, 10 ** 9)}'):
+            with self.subTest(query=query):
+                data = self.get_json(self.url + query)
+                self.assertEqual(
+                    [recipe['id'] for recipe in data['results']],
+                    [recipe.pk for recipe in reversed(recipes)])
+                self.assertIsNone(data['previous'])
+
+    # TEST the category, author and tag filters
+    def test_recipes_api_v2_filters(self):
+        category = self.make_category('Desserts')
+        tag = self.make_tag('Sweet')
+        recipes = self.make_recipes_in_batch(qty=3)
+        recipes[0].category = category
+        recipes[0].save()
+        recipes[1].tags.add(tag)
+
+        for query, expected in (
+            (f'?category={category.pk}', recipes[0]),
+            (f'?author={recipes[2].author_id}', recipes[2]),
+            (f'?tag={tag.pk}', recipes[1]),
+        ):
+            with self.subTest(query=query):
+                data = self.get_json(self.url + query)
+                self.assertEqual(
+                    [recipe['id'] for recipe in data['results']],
+                    [expected.pk])
+
+        response = self.client.get(self.url + '?category=desserts')
+        self.assertEqual(response.status_code, 400)
+
+    # TEST if ?fields= returns only the requested fields, without the
+    # queries of the others (tags)
+    def test_recipes_api_v2_sparse_fieldsets(self):
+        recipe = self.make_recipe()
+        recipe.tags.add(self.make_tag('Sweet'))
+
+        def count_queries(query):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                data = self.get_json(self.url + query)
+            return data, len(context.captured_queries)
+
+        data, sparse_queries = count_queries('?fields=id,title')
+        self.assertEqual(
+            data['results'], [{'id': recipe.pk, 'title': recipe.title}])
+
+        data, full_queries = count_queries('')
+        self.assertEqual(data['results'][0]['tags'], [recipe.tags.get().pk])
+        self.assertEqual(full_queries, sparse_queries + 1)
+
+        response = self.client.get(self.url + '?fields=id,password')
+        self.assertEqual(response.status_code, 400)
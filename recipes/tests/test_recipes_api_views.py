@@ -3,6 +3,7 @@ import datetime
 import json
 from unittest.mock import patch
 from django.urls import resolve, reverse
+from django.core.cache import cache
 from recipes.views import site
 from recipes.tests.test_recipe_base import RecipeTestBase
 from PIL import Image
@@ -1024,3 +1025,67 @@ class RecipesDetailApiViewTest(RecipeTestBase):
             f"Expected: {path_to_images_folder} "
             f"Found: {raw_data['cover']}"
         )
+
+
+class RecipesApiSerializerTest(RecipeTestBase):
+
+    def make_tagged_recipes(self, qty):
+        recipes = self.make_recipes_in_batch(qty=qty)
+        first_tag = self.make_tag('First')
+        second_tag = self.make_tag('Second')
+        for recipe in recipes:
+            recipe.tags.add(first_tag, second_tag)
+        return recipes
+
+    def test_recipes_api_v1_query_count_does_not_grow_with_page_size(self):
+        # Test to check that the API runs the same number of queries
+        # with 2 or 6 recipes in the page: validators (also the count),
+        # recipes and tags. The cached listing stats are cleared to
+        # measure both pages cold
+        self.make_tagged_recipes(6)
+
+        for per_page in (2, 6):
+            cache.clear()
+            with patch('recipes.views.site.PER_PAGE', new=per_page):
+                with self.assertNumQueries(3):
+                    response = self.client.get(
+                        reverse('recipes:recipes_api_v1'))
+
+            self.assertEqual(len(json.loads(response.content)), per_page)
+
+    def test_recipes_api_v1_serializes_author_category_and_tags(self):
+        recipe = self.make_recipe(
+            author_data={'first_name': 'Ana', 'last_name': 'Maria'},
+            category_data=self.make_category('Doces'))
+        recipe.tags.add(self.make_tag('First'), self.make_tag('Second'))
+
+        data = json.loads(
+            self.client.get(reverse('recipes:recipes_api_v1')).content)[0]
+
+        self.assertEqual(data['author_name'], 'Ana Maria')
+        self.assertEqual(data['author_id'], recipe.author.id)
+        self.assertEqual(data['category_name'], 'Doces')
+        self.assertEqual(data['category_id'], recipe.category.id)
+        self.assertEqual(data['tags'], 'First, Second')
+        self.assertEqual(data['cover'], '')
+        self.assertNotIn('author', data)
+        self.assertNotIn('category', data)
+
+    def test_recipes_tag_api_v1_query_count(self):
+        # Test to check that the tag API does not evaluate the queryset
+        # to check if it is empty: validators (also the existence probe
+        # and the count), tag title, recipes and tags
+        self.make_tagged_recipes(3)
+        url = reverse('recipes:tag_api_v1', kwargs={'tag_name': 'First'})
+
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.json()), 3)
+
+        # An unknown tag runs only the probe
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse(
+                'recipes:tag_api_v1', kwargs={'tag_name': 'Unknown'}))
+
+        self.assertEqual(response.status_code, 404)
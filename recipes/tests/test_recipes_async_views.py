@@ -0,0 +1,133 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import override_settings
+from django.urls import include, path, reverse  # type: ignore
+
+from recipes import urls as recipes_urls
+from recipes.tests.test_recipe_base import RecipeTestBase
+from recipes.views import site_async
+
+
+def get_async_urlpatterns():
+    # recipes.urls with the views of site_async (ASYNC_VIEWS=1)
+    patterns = []
+    for pattern in recipes_urls.urlpatterns:
+        view_class = getattr(pattern.callback, 'view_class', None)
+        async_view = getattr(site_async, getattr(view_class, '__name__', ''),
+                             None)
+        if async_view is not None:
+            pattern = path(
+                str(pattern.pattern), async_view.as_view(), name=pattern.name)
+        patterns.append(pattern)
+    return patterns
+
+
+urlpatterns = [
+    path('', include((get_async_urlpatterns(), 'recipes'))),
+    path('authors/', include('authors.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class RecipeAsyncViewsTest(RecipeTestBase):
+
+    def make_tagged_recipe(self):
+        recipe = self.make_recipe(category_data=self.make_category())
+        recipe.tags.add(self.make_tag('Async'))
+        return recipe
+
+    # TEST if the read only views of site_async are async views
+    def test_recipes_async_views_are_coroutines(self):
+        for pattern in get_async_urlpatterns():
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if view_class is None or view_class.__module__ != (
+                    site_async.__name__):
+                continue
+            with self.subTest(view=view_class.__name__):
+                self.assertTrue(view_class.view_is_async)
+
+    # TEST if the HTML pages are rendered by the async views
+    async def test_recipes_async_html_views_return_200(self):
+        recipe = await sync_to_async(self.make_tagged_recipe)()
+
+        for url in (
+            reverse('recipes:home'),
+            reverse('recipes:category',
+                    kwargs={'category_id': recipe.category_id}),
+            reverse('recipes:search') + '?q=recipe',
+            reverse('recipes:tag', kwargs={'tag_name': 'Async'}),
+            reverse('recipes:recipe', kwargs={'pk': recipe.id}),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(recipe.title, response.content.decode())
+
+    # TEST if the async JSON API returns the same data as the sync one
+    async def test_recipes_async_api_matches_sync_api(self):
+        recipe = await sync_to_async(self.make_tagged_recipe)()
+        urls = (
+            reverse('recipes:recipes_api_v1'),
+            reverse('recipes:recipe_api_v1', kwargs={'pk': recipe.id}),
+            reverse('recipes:category_api_v1',
+                    kwargs={'category_id': recipe.category_id}),
+            reverse('recipes:search_api_v1') + '?q=recipe',
+            reverse('recipes:tag_api_v1', kwargs={'tag_name': 'Async'}),
+        )
+
+        for url in urls:
+            with self.subTest(url=url):
+                async_response = await self.async_client.get(url)
+                with override_settings(ROOT_URLCONF='project.urls'):
+                    sync_response = await sync_to_async(self.client.get)(url)
+
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(
+                    json.loads(async_response.content),
+                    json.loads(sync_response.content))
+
+    # TEST if the async views raise 404 as the sync ones
+    async def test_recipes_async_views_return_404(self):
+        for url in (
+            reverse('recipes:category', kwargs={'category_id': 1000}),
+            reverse('recipes:recipe', kwargs={'pk': 1000}),
+            reverse('recipes:recipe_api_v1', kwargs={'pk': 1000}),
+            reverse('recipes:tag_api_v1', kwargs={'tag_name': 'Unknown'}),
+            reverse('recipes:search'),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 404)
+
+    # TEST if the async views answer 304 to a valid ETag
+    async def test_recipes_async_views_return_304_when_etag_matches(self):
+        recipe = await sync_to_async(self.make_tagged_recipe)()
+
+        for url in (
+            reverse('recipes:home'),
+            reverse('recipes:recipe', kwargs={'pk': recipe.id}),
+            reverse('recipes:recipes_api_v1'),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                not_modified = await self.async_client.get(
+                    url, headers={'If-None-Match': response['ETag']})
+
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+
+    # TEST if the async API streams every recipe (async generator)
+    async def test_recipes_async_api_stream_ndjson(self):
+        await sync_to_async(self.make_recipes_in_batch)(qty=3)
+
+        response = await self.async_client.get(
+            reverse('recipes:recipes_export_api_v1'))
+        content = b''.join([
+            chunk async for chunk in response.streaming_content])
+        lines = content.decode('utf-8').splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            [json.loads(line)['title'] for line in lines],
+            ['This is recipe 2', 'This is recipe 1', 'This is recipe 0'])
@@ -0,0 +1,108 @@
+from io import StringIO
+
+from django.contrib.auth.models import update_last_login
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse  # type: ignore
+
+from recipes.models import RecipeCard
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+class RecipeCardTest(RecipeTestBase):
+
+    # TEST if saving a recipe creates its card with the related data
+    def test_recipe_card_is_created_with_related_data(self):
+        recipe = self.make_recipe(
+            category_data=self.make_category('Desserts'),
+            author_data={'first_name': 'Ana', 'last_name': 'Maria'})
+        recipe.tags.add(self.make_tag('Sweet'), self.make_tag('Cake'))
+
+        card = RecipeCard.objects.get(pk=recipe.pk)
+
+        self.assertEqual(card.title, recipe.title)
+        self.assertEqual(card.category_name, 'Desserts')
+        self.assertEqual(card.author_display_name, 'Ana Maria')
+        self.assertEqual(
+            card.author_profile_id, recipe.author.profile.id)
+        self.assertEqual(card.tag_names, ['Cake', 'Sweet'])
+
+    # TEST if the card follows the recipe, category and author changes
+    def test_recipe_card_follows_related_changes(self):
+        recipe = self.make_recipe()
+
+        recipe.title = 'Updated title'
+        recipe.is_published = False
+        recipe.save()
+        recipe.category.name = 'Renamed'
+        recipe.category.save()
+        recipe.author.first_name = 'Renamed'
+        recipe.author.save()
+
+        card = RecipeCard.objects.get(pk=recipe.pk)
+        self.assertEqual(card.title, 'Updated title')
+        self.assertFalse(card.is_published)
+        self.assertEqual(card.category_name, 'Renamed')
+        self.assertTrue(card.author_display_name.startswith('Renamed'))
+
+    # TEST if the saves that do not change the card (login, category,
+    # tag and author saved without a rename) do not sync the cards
+    def test_recipe_card_is_not_synced_without_changes(self):
+        recipe = self.make_recipe()
+        tag = self.make_tag('Sweet')
+        recipe.tags.add(tag)
+
+        def card_queries(save):
+            with CaptureQueriesContext(connection) as context:
+                save()
+            return [query for query in context.captured_queries
+                    if 'recipecard' in query['sql']]
+
+        self.assertEqual(card_queries(
+            lambda: update_last_login(None, recipe.author)), [])
+        self.assertEqual(card_queries(recipe.author.save), [])
+        self.assertEqual(card_queries(recipe.category.save), [])
+        self.assertEqual(card_queries(tag.save), [])
+
+        recipe.author.username = 'renamed'
+        self.assertNotEqual(card_queries(recipe.author.save), [])
+
+    # TEST if deleting a recipe or its category updates the cards
+    def test_recipe_card_follows_deletes(self):
+        recipe = self.make_recipe()
+        other = self.make_recipe(
+            title='Other', slug='other', author_data={'username': 'other'})
+
+        recipe.category.delete()
+        self.assertIsNone(RecipeCard.objects.get(pk=recipe.pk).category_id)
+
+        other.delete()
+        self.assertFalse(RecipeCard.objects.filter(pk=other.pk).exists())
+
+    # TEST if the home page reads the cards with a single query
+    def test_recipe_home_renders_cards_without_joins(self):
+        self.make_recipes_in_batch(qty=3)
+
+        # validators (also the count), cards
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('recipes:home'))
+
+        self.assertContains(response, 'This is recipe 2')
+        self.assertIsInstance(
+            response.context['recipes'][0], RecipeCard)
+
+    # TEST if the command rebuilds missing and stale cards
+    def test_rebuild_recipe_cards_command(self):
+        recipe = self.make_recipe()
+        RecipeCard.objects.all().delete()
+        RecipeCard.objects.create(
+            id=recipe.pk + 100, title='Orphan', slug='orphan',
+            description='', preparation_time=1, servings=1,
+            created_at=recipe.created_at, update_at=recipe.update_at)
+
+        call_command('rebuild_recipe_cards', stdout=StringIO())
+
+        self.assertEqual(
+            list(RecipeCard.objects.values_list('pk', flat=True)),
+            [recipe.pk])
@@ -0,0 +1,136 @@
+from django.urls import reverse  # type: ignore
+from django.utils.http import http_date
+
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+class RecipeConditionalGetTest(RecipeTestBase):
+
+    def assertRevalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+
+        not_modified = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        return response
+
+    # TEST if the list, detail and API views answer 304 to a valid ETag
+    def test_recipes_views_return_304_when_etag_matches(self):
+        recipe = self.make_recipe(category_data=self.make_category())
+        recipe.tags.add(self.make_tag('Conditional'))
+
+        for url in (
+            reverse('recipes:home'),
+            reverse('recipes:category',
+                    kwargs={'category_id': recipe.category.id}),
+            reverse('recipes:search') + '?q=recipe',
+            reverse('recipes:tag', kwargs={'tag_name': 'Conditional'}),
+            reverse('recipes:recipe', kwargs={'pk': recipe.id}),
+            reverse('recipes:recipes_api_v1'),
+            reverse('recipes:recipes_api_v2'),
+            reverse('recipes:recipe_api_v2', kwargs={'pk': recipe.id}),
+        ):
+            with self.subTest(url=url):
+                self.assertRevalidates(url)
+
+    # TEST if only the detail views send Last-Modified: the max
+    # update_at of a list goes back when its newest recipe is unpublished
+    def test_recipes_lists_do_not_send_last_modified(self):
+        older = self.make_recipe(
+            title='Older', slug='older', author_data={'username': 'older'})
+        newest = self.make_recipe()
+
+        self.assertTrue(self.client.get(reverse(
+            'recipes:recipe', kwargs={'pk': older.id})).has_header(
+            'Last-Modified'))
+
+        for url in (
+            reverse('recipes:home'),
+            reverse('recipes:recipes_api_v1'),
+            reverse('recipes:recipes_api_v2'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+
+        if_modified_since = http_date(newest.update_at.timestamp())
+        newest.is_published = False
+        newest.save()
+
+        response = self.client.get(
+            reverse('recipes:home'),
+            HTTP_IF_MODIFIED_SINCE=if_modified_since)
+        self.assertEqual(response.status_code, 200)
+
+    # TEST if the 304 does not render the template
+    def test_recipes_304_does_not_render_template(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:recipe', kwargs={'pk': recipe.id})
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    # TEST if the ETag changes when a recipe is updated
+    def test_recipes_etag_changes_when_recipe_is_updated(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:home')
+        etag = self.client.get(url)['ETag']
+
+        recipe.title = 'Updated title'
+        recipe.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    # TEST if the ETag changes when the tags of a recipe change
+    def test_recipes_etag_changes_when_tags_change(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:recipe', kwargs={'pk': recipe.id})
+        etag = self.client.get(url)['ETag']
+
+        recipe.tags.add(self.make_tag('New tag'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    # TEST if renaming the category or the author of a recipe changes the
+    # ETag of the pages that display the name
+    def test_recipes_etag_changes_when_names_change(self):
+        recipe = self.make_recipe()
+        urls = [
+            reverse('recipes:home'),
+            reverse('recipes:category',
+                    kwargs={'category_id': recipe.category_id}),
+            reverse('recipes:recipe', kwargs={'pk': recipe.id}),
+            reverse('recipes:recipes_api_v2'),
+        ]
+
+        for instance, field in ((recipe.category, 'name'),
+                                (recipe.author, 'first_name')):
+            etags = [self.client.get(url)['ETag'] for url in urls]
+
+            setattr(instance, field, f'Renamed {field}')
+            instance.save()
+
+            for url, etag in zip(urls, etags):
+                with self.subTest(model=type(instance).__name__, url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    # TEST if a page served from the page cache also answers 304
+    def test_recipes_cached_page_returns_304(self):
+        self.make_recipe()
+        url = reverse('recipes:home')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Category, Recipe
+from recipes.tests.test_recipe_base import RecipeTestBase
+from tag.models import Tag
+
+
+class RecipeCountersTest(RecipeTestBase):
+
+    def assertCounters(self, category, tag, category_count, tag_count):
+        category.refresh_from_db()
+        tag.refresh_from_db()
+        self.assertEqual(category.published_recipe_count, category_count)
+        self.assertEqual(tag.published_recipe_count, tag_count)
+
+    # TEST if publishing, unpublishing and deleting a recipe update the
+    # counters of its category and tags
+    def test_recipe_counters_follow_publish_state(self):
+        category = self.make_category('Desserts')
+        tag = self.make_tag('Sweet')
+        recipe = self.make_recipe(category_data=category, is_published=False)
+        recipe.tags.add(tag)
+        self.assertCounters(category, tag, 0, 0)
+
+        recipe.is_published = True
+        recipe.save()
+        self.assertCounters(category, tag, 1, 1)
+
+        recipe.save()
+        self.assertCounters(category, tag, 1, 1)
+
+        recipe.is_published = False
+        recipe.save()
+        self.assertCounters(category, tag, 0, 0)
+
+        recipe.is_published = True
+        recipe.save()
+        recipe.delete()
+        self.assertCounters(category, tag, 0, 0)
+
+    # TEST if moving a published recipe to another category moves it
+    # between the counters
+    def test_recipe_counters_follow_category_change(self):
+        old_category = self.make_category('Old')
+        new_category = self.make_category('New')
+        recipe = self.make_recipe(category_data=old_category)
+        self.assertEqual(
+            Category.objects.get(pk=old_category.pk).published_recipe_count,
+            1)
+
+        recipe.category = new_category
+        recipe.save()
+
+        self.assertEqual(
+            list(Category.objects.order_by('pk').values_list(
+                'published_recipe_count', flat=True)),
+            [0, 1])
+
+    # TEST if adding, removing and clearing tags (from both sides)
+    # update the tag counters of published recipes only
+    def test_recipe_counters_follow_tag_changes(self):
+        tag = self.make_tag('Sweet')
+        recipes = self.make_recipes_in_batch(qty=3)
+        unpublished = self.make_recipe(
+            title='Unpublished', slug='unpublished',
+            author_data={'username': 'unpublished'}, is_published=False)
+
+        recipes[0].tags.add(tag)
+        unpublished.tags.add(tag)
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 1)
+
+        tag.recipe_set.add(recipes[1], recipes[2])
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 3)
+
+        recipes[0].tags.remove(tag)
+        tag.recipe_set.remove(recipes[1])
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 1)
+
+        recipes[2].tags.clear()
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 0)
+
+        tag.recipe_set.add(recipes[0], recipes[1])
+        tag.recipe_set.clear()
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 0)
+
+    # TEST if removing tags that are not linked (from both sides) does
+    # not change the counters
+    def test_recipe_counters_ignore_removing_unlinked_tags(self):
+        tag = self.make_tag('Sweet')
+        other_tag = self.make_tag('Salty')
+        linked, unlinked = self.make_recipes_in_batch(qty=2)
+        linked.tags.add(tag)
+
+        unlinked.tags.remove(tag)
+        unlinked.tags.remove(tag)
+        tag.recipe_set.remove(unlinked)
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 1)
+
+        linked.tags.remove(tag, other_tag)
+        self.assertEqual(
+            list(Tag.objects.order_by('pk').values_list(
+                'published_recipe_count', flat=True)),
+            [0, 0])
+
+        linked.tags.add(tag)
+        tag.recipe_set.remove(linked, unlinked)
+        self.assertEqual(
+            Tag.objects.get(pk=tag.pk).published_recipe_count, 0)
+
+    # TEST if the command fixes the counters changed without signals
+    def test_rebuild_recipe_counters_command(self):
+        category = self.make_category('Desserts')
+        tag = self.make_tag('Sweet')
+        recipe = self.make_recipe(category_data=category)
+        recipe.tags.add(tag)
+
+        Recipe.objects.update(is_published=False)
+        Category.objects.update(published_recipe_count=10)
+        self.assertCounters(category, tag, 10, 1)
+
+        call_command('rebuild_recipe_counters', stdout=StringIO())
+        self.assertCounters(category, tag, 0, 0)
+
+        Recipe.objects.update(is_published=True)
+        call_command('rebuild_recipe_counters', stdout=StringIO())
+        self.assertCounters(category, tag, 1, 1)
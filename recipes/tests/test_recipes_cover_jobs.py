@@ -0,0 +1,179 @@
+import os
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from django.urls import reverse  # type: ignore
+from PIL import Image
+
+from recipes.covers import process_cover_job, process_pending_cover_jobs
+from recipes.models import CoverImageJob, Recipe
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+def make_image_file(width=1000, height=600, name='cover.jpg'):
+    image = Image.new('RGB', (width, height))
+    fp = BytesIO()
+    image.save(fp, format='JPEG')
+    return SimpleUploadedFile(
+        name=name, content=fp.getvalue(), content_type='image/jpeg')
+
+
+# MEDIA_ROOT is a temporary directory in every test (conftest.py)
+@override_settings(COVER_PROCESSING='sync')
+class RecipeCoverJobTest(RecipeTestBase):
+
+    def make_recipe_with_cover(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.make_recipe(cover=make_image_file(), **kwargs)
+
+    # TEST if saving a recipe does not resize the cover before the commit
+    def test_recipe_save_does_not_resize_cover_inline(self):
+        with patch.object(Recipe, 'resize_image') as resize_image, \
+                patch('recipes.covers.dispatch_cover_job') as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = self.make_recipe(cover=make_image_file())
+
+            resize_image.assert_not_called()
+            dispatch.assert_called_once()
+            self.assertEqual(
+                recipe.cover_status, CoverImageJob.STATUS_PENDING)
+
+    # TEST if the job resizes the cover and records its status
+    def test_recipe_cover_job_resizes_cover(self):
+        recipe = self.make_recipe_with_cover()
+
+        with Image.open(recipe.cover.path) as image:
+            self.assertEqual(image.size[0], 840)
+
+        job = CoverImageJob.objects.get(recipe=recipe)
+        self.assertEqual(job.status, CoverImageJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(len(job.content_hash), 64)
+
+    # TEST if saving a recipe with the same cover does not enqueue it again
+    def test_recipe_cover_job_skips_unchanged_cover(self):
+        recipe = self.make_recipe_with_cover()
+
+        with patch('recipes.covers.dispatch_cover_job') as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.title = 'New title'
+                recipe.save()
+
+        dispatch.assert_not_called()
+        self.assertEqual(CoverImageJob.objects.get(recipe=recipe).attempts, 1)
+
+    # TEST if a failed job is recorded as failed
+    def test_recipe_cover_job_records_failure(self):
+        with patch.object(Recipe, 'resize_image', side_effect=OSError('x')):
+            recipe = self.make_recipe_with_cover()
+
+        job = CoverImageJob.objects.get(recipe=recipe)
+        self.assertEqual(job.status, CoverImageJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'x')
+
+    # TEST if the pending jobs can be processed later (worker restart)
+    def test_recipe_pending_cover_jobs_are_processed(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            recipe = self.make_recipe(cover=make_image_file())
+
+        self.assertEqual(process_pending_cover_jobs(), 1)
+        self.assertEqual(recipe.cover_status, CoverImageJob.STATUS_DONE)
+        self.assertTrue(os.path.exists(recipe.cover.path))
+        self.assertEqual(process_pending_cover_jobs(), 0)
+
+    # TEST if a job that fails to load is failed, not left processing
+    def test_recipe_cover_job_load_failure_is_recorded(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            recipe = self.make_recipe(cover=make_image_file())
+
+        with patch.object(CoverImageJob.objects, 'select_related',
+                          side_effect=CoverImageJob.DoesNotExist('gone')):
+            process_cover_job(CoverImageJob.objects.get(recipe=recipe).pk)
+
+        self.assertEqual(recipe.cover_status, CoverImageJob.STATUS_FAILED)
+
+    # TEST if the jobs left processing (the process died) are processed
+    # again after COVER_JOB_TIMEOUT, and the recent ones are not
+    def test_recipe_stale_cover_jobs_are_processed(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            recipe = self.make_recipe(cover=make_image_file())
+        jobs = CoverImageJob.objects.filter(recipe=recipe)
+
+        jobs.update(status=CoverImageJob.STATUS_PROCESSING,
+                    update_at=timezone.now())
+        self.assertEqual(process_pending_cover_jobs(stale_timeout=60), 0)
+
+        jobs.update(update_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(process_pending_cover_jobs(stale_timeout=60), 1)
+        self.assertEqual(recipe.cover_status, CoverImageJob.STATUS_DONE)
+
+    # TEST if a job run again after its variants were saved does not
+    # resize the cover again
+    def test_recipe_cover_job_run_again_does_not_resize(self):
+        recipe = self.make_recipe_with_cover()
+        job = CoverImageJob.objects.get(recipe=recipe)
+        CoverImageJob.objects.filter(pk=job.pk).update(
+            status=CoverImageJob.STATUS_PENDING)
+
+        with patch.object(Recipe, 'resize_image') as resize_image:
+            process_cover_job(job.pk)
+
+        resize_image.assert_not_called()
+        self.assertEqual(recipe.cover_status, CoverImageJob.STATUS_DONE)
+
+    # TEST if the job creates the responsive variants of the cover
+    def test_recipe_cover_job_creates_variants(self):
+        recipe = self.make_recipe_with_cover()
+        recipe.refresh_from_db()
+
+        self.assertEqual(
+            recipe.cover_variants,
+            {'w': [320, 480, 840], 'f': ['webp', 'jpg']})
+
+        for variant_name in recipe.get_cover_variant_names():
+            self.assertTrue(recipe.cover.storage.exists(variant_name))
+
+        with Image.open(recipe.cover.storage.path(
+                Recipe.get_cover_variant_name(
+                    recipe.cover.name, 320, 'webp'))) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size[0], 320)
+
+    # TEST if the variants change the ETag of the recipe page (srcset)
+    def test_recipe_cover_job_changes_etag(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            recipe = self.make_recipe(cover=make_image_file())
+        url = reverse('recipes:recipe', kwargs={'pk': recipe.pk})
+        etag = self.client.get(url)['ETag']
+
+        process_pending_cover_jobs()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    # TEST if the recipe partial has the srcset of the variants
+    def test_recipe_partial_renders_cover_srcset(self):
+        recipe = self.make_recipe_with_cover()
+        recipe.refresh_from_db()
+
+        response = self.client.get(reverse('recipes:home'))
+
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, recipe.cover_srcset_jpg)
+        self.assertIn('_320w.jpg 320w', recipe.cover_srcset_jpg)
+
+    # TEST if deleting a recipe deletes the variants of the cover
+    def test_recipe_delete_removes_cover_variants(self):
+        recipe = self.make_recipe_with_cover()
+        recipe.refresh_from_db()
+        variant_names = recipe.get_cover_variant_names()
+
+        recipe.delete()
+
+        for variant_name in variant_names:
+            self.assertFalse(
+                recipe.cover.storage.exists(variant_name))
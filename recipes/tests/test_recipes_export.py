@@ -0,0 +1,127 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.exporter import (
+    export_recipes, export_to_stream, get_id_ranges, get_partition_path)
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+class RecipeExportTest(RecipeTestBase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        return super().setUp()
+
+    def make_catalog(self):
+        category = self.make_category('Desserts')
+        recipes = self.make_recipes_in_batch(qty=5, category_data=category)
+        recipes[0].tags.add(self.make_tag('Sweet'), self.make_tag('Cake'))
+        self.make_recipe(title='Draft', slug='draft', is_published=False,
+                         author_data={'username': 'draft'})
+        return recipes
+
+    def export(self, file_format, **options):
+        stream = StringIO()
+        total = export_to_stream(stream, file_format, **options)
+        return total, stream.getvalue()
+
+    # TEST if the NDJSON has the published recipes, with the author,
+    # category and tag names
+    def test_export_recipes_ndjson(self):
+        recipes = self.make_catalog()
+
+        total, output = self.export('ndjson')
+        rows = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(total, 5)
+        self.assertEqual([row['id'] for row in rows],
+                         [recipe.pk for recipe in recipes])
+        self.assertEqual(rows[0]['author_username'], '0')
+        self.assertEqual(rows[0]['author_name'], 'Joe Smith')
+        self.assertEqual(rows[0]['category_name'], 'Desserts')
+        self.assertEqual(rows[0]['tags'], ['Sweet', 'Cake'])
+        self.assertEqual(rows[1]['tags'], [])
+
+    # TEST the CSV header and the tags separated by comma
+    def test_export_recipes_csv(self):
+        self.make_catalog()
+
+        total, output = self.export('csv')
+        rows = list(csv.DictReader(StringIO(output)))
+
+        self.assertEqual(total, 5)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['tags'], 'Sweet, Cake')
+        self.assertEqual(rows[0]['category_name'], 'Desserts')
+
+    # TEST if the columnar format has one line per chunk and the
+    # repeated names dictionary encoded
+    def test_export_recipes_columns(self):
+        recipes = self.make_catalog()
+
+        total, output = self.export('columns', chunk_size=3)
+        header, *chunks = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(total, 5)
+        self.assertEqual(header['format'], 'recipes-columns')
+        self.assertEqual([chunk['count'] for chunk in chunks], [3, 2])
+        self.assertEqual(
+            chunks[0]['columns']['id'] + chunks[1]['columns']['id'],
+            [recipe.pk for recipe in recipes])
+        self.assertEqual(
+            chunks[0]['columns']['category_name'],
+            {'values': ['Desserts'], 'indexes': [0, 0, 0]})
+        self.assertEqual(
+            chunks[0]['columns']['tags'], [['Sweet', 'Cake'], [], []])
+
+    # TEST if the recipes are read in chunks: one query to the recipes
+    # and one to the tags of each chunk
+    def test_export_recipes_queries_per_chunk(self):
+        self.make_catalog()
+
+        with CaptureQueriesContext(connection) as context:
+            self.export('ndjson', chunk_size=2)
+
+        self.assertEqual(len(context.captured_queries), 1 + 3)
+
+    # TEST if the partitions cover every published recipe once
+    def test_export_recipes_partitions(self):
+        recipes = self.make_catalog()
+        path = os.path.join(self.tmp_dir.name, 'recipes.ndjson')
+
+        files = export_recipes(path, partitions=2)
+
+        self.assertEqual(len(get_id_ranges(2)), 2)
+        self.assertEqual(
+            [file_path for file_path, _ in files],
+            [get_partition_path(path, 0), get_partition_path(path, 1)])
+        self.assertTrue(files[0][0].endswith('recipes.part000.ndjson'))
+
+        ids = []
+        for file_path, total in files:
+            with open(file_path, encoding='utf-8') as stream:
+                lines = stream.read().splitlines()
+            self.assertEqual(len(lines), total)
+            ids += [json.loads(line)['id'] for line in lines]
+
+        self.assertEqual(ids, [recipe.pk for recipe in recipes])
+
+    # TEST the command, with the format from the extension
+    def test_export_recipes_command(self):
+        self.make_catalog()
+        path = os.path.join(self.tmp_dir.name, 'recipes.csv')
+
+        stdout = StringIO()
+        call_command('export_recipes', path, stdout=stdout)
+
+        with open(path, encoding='utf-8') as stream:
+            self.assertEqual(len(list(csv.DictReader(stream))), 5)
+        self.assertIn('5 recipe(s) exported', stdout.getvalue())
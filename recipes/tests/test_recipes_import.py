@@ -0,0 +1,169 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes.importer import RecipeImporter
+from recipes.models import (Category, CoverImageJob, Recipe, RecipeCard,
+                            RecipeSearchTerm)
+from recipes.tests.test_recipe_base import RecipeTestBase
+from tag.models import Tag
+
+
+class RecipeImportTest(RecipeTestBase):
+
+    def setUp(self):
+        self.author = self.make_author(username='chef')
+        return super().setUp()
+
+    def make_row(self, number, **fields):
+        return {
+            'title': f'Imported recipe {number}',
+            'description': 'Imported description',
+            'preparation_time': 10,
+            'servings': 2,
+            'preparation_steps': 'Mix everything',
+            'is_published': True,
+            'author': 'chef',
+            **fields,
+        }
+
+    def import_rows(self, rows, **options):
+        importer = RecipeImporter(**options)
+        importer.import_stream(
+            StringIO(''.join(json.dumps(row) + '\n' for row in rows)))
+        return importer
+
+    # TEST if the recipes, categories, tags and links are created, with
+    # the data the signals would create (cards, search index, counters)
+    @override_settings(
+        SEARCH_BACKEND='recipes.search.InvertedIndexSearchBackend')
+    def test_import_recipes_creates_recipes_and_related_data(self):
+        importer = self.import_rows([
+            self.make_row(1, category='Desserts', tags=['Sweet', 'Cake']),
+            self.make_row(2, category='Desserts', tags='Sweet'),
+            self.make_row(3, is_published=False, cover='recipes/a.jpg'),
+        ])
+
+        self.assertEqual(importer.created, 3)
+        self.assertEqual(importer.errors, [])
+
+        recipe = Recipe.objects.get(title='Imported recipe 1')
+        self.assertEqual(recipe.slug, 'imported-recipe-1')
+        self.assertEqual(recipe.author, self.author)
+        self.assertEqual(recipe.category.name, 'Desserts')
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Cake', 'Sweet'])
+
+        self.assertEqual(RecipeCard.objects.count(), 3)
+        self.assertEqual(
+            RecipeCard.objects.get(pk=recipe.pk).tag_names,
+            ['Cake', 'Sweet'])
+        self.assertTrue(RecipeSearchTerm.objects.filter(
+            recipe=recipe, term='desserts').exists())
+
+        self.assertEqual(
+            Category.objects.get(name='Desserts').published_recipe_count, 2)
+        self.assertEqual(
+            Tag.objects.get(name='Sweet').published_recipe_count, 2)
+
+        job = CoverImageJob.objects.get()
+        self.assertEqual(job.cover_name, 'recipes/a.jpg')
+        self.assertEqual(job.status, CoverImageJob.STATUS_PENDING)
+
+    # TEST if the existing categories and tags are reused
+    def test_import_recipes_reuses_categories_and_tags(self):
+        category = self.make_category('Desserts')
+        tag = self.make_tag('Sweet')
+
+        self.import_rows([
+            self.make_row(1, category='Desserts', tags=['Sweet'])])
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.category, category)
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Tag.objects.count(), 1)
+
+    # TEST if the duplicated and invalid rows are skipped and reported
+    def test_import_recipes_skips_duplicated_and_invalid_rows(self):
+        self.make_recipe(title='Imported recipe 1', slug='existing',
+                         author_data={'username': 'other'})
+
+        importer = self.import_rows([
+            self.make_row(1),
+            self.make_row(2),
+            self.make_row(2),
+            self.make_row(3, servings='many'),
+            self.make_row(4, author='unknown'),
+            {'title': 'No fields'},
+        ])
+
+        self.assertEqual(importer.created, 1)
+        self.assertEqual(importer.skipped, 2)
+        self.assertEqual(
+            sorted(line for line, _ in importer.errors), [4, 5, 6])
+        self.assertTrue(Recipe.objects.filter(
+            title='Imported recipe 2').exists())
+
+    # TEST if a row of an unknown author does not make the next rows with
+    # the same title or slug duplicated
+    def test_import_recipes_unknown_author_does_not_reserve_title(self):
+        importer = self.import_rows([
+            self.make_row(1, author='unknown'),
+            self.make_row(1),
+            self.make_row(2, author='unknown', slug='same-slug'),
+            self.make_row(3, slug='same-slug'),
+        ])
+
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(importer.skipped, 0)
+        self.assertEqual([line for line, _ in importer.errors], [1, 3])
+        self.assertEqual(
+            Recipe.objects.get(title='Imported recipe 1').author,
+            self.author)
+        self.assertEqual(
+            Recipe.objects.get(slug='same-slug').title, 'Imported recipe 3')
+
+    # TEST if the number of queries does not grow with the rows
+    def test_import_recipes_query_count_does_not_grow_with_rows(self):
+        def count_queries(first, last):
+            rows = [
+                self.make_row(number,
+                              category=f'Category {first} {number % 3}',
+                              tags=[f'Tag {first} {number % 4}'])
+                for number in range(first, last)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                self.import_rows(rows, batch_size=100)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(0, 10), count_queries(100, 130))
+
+    # TEST the command with a CSV file and a default author
+    def test_import_recipes_command_reads_csv(self):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write(
+                'title,description,preparation_time,servings,'
+                'preparation_steps,is_published,tags\n'
+                'CSV recipe,From CSV,5,1,Steps,true,"Fast, Easy"\n')
+        self.addCleanup(os.remove, csv_file.name)
+
+        stdout = StringIO()
+        call_command('import_recipes', csv_file.name, '--author', 'chef',
+                     stdout=stdout)
+
+        recipe = Recipe.objects.get(title='CSV recipe')
+        self.assertTrue(recipe.is_published)
+        self.assertEqual(recipe.author, self.author)
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Easy', 'Fast'])
+        self.assertIn('1 recipe(s) imported', stdout.getvalue())
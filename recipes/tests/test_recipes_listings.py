@@ -0,0 +1,95 @@
+from django.urls import reverse  # type: ignore
+
+from recipes.tests.test_recipe_base import RecipeTestBase
+from utils.cache import page_cache
+
+
+class RecipeListingStatsTest(RecipeTestBase):
+
+    def get_total(self, url):
+        # Pagination total of a listing page. The page cache is dropped to
+        # render the page with the (cached) listing stats
+        page_cache.invalidate()
+        response = self.client.get(url)
+        return response.context['recipes'].paginator.count
+
+    # TEST if the listing stats are not computed again to another page
+    # of the same listing: only the page is read
+    def test_recipes_listing_stats_are_cached(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:category',
+                      kwargs={'category_id': recipe.category.id})
+
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url + '?page=2')
+
+        self.assertEqual(response.context['recipes'].paginator.count, 1)
+
+    # TEST if publishing, unpublishing and deleting a recipe update the
+    # totals of the home page and of its category
+    def test_recipes_listing_stats_follow_publish_and_delete(self):
+        recipe = self.make_recipe()
+        home_url = reverse('recipes:home')
+        category_url = reverse('recipes:category',
+                               kwargs={'category_id': recipe.category.id})
+        self.assertEqual(self.get_total(home_url), 1)
+        self.assertEqual(self.get_total(category_url), 1)
+
+        new_recipe = self.make_recipe(
+            title='New Recipe', slug='new-recipe',
+            author_data={'username': 'new'},
+            category_data=recipe.category, is_published=False)
+        self.assertEqual(self.get_total(home_url), 1)
+
+        new_recipe.is_published = True
+        new_recipe.save()
+        self.assertEqual(self.get_total(home_url), 2)
+        self.assertEqual(self.get_total(category_url), 2)
+
+        recipe.is_published = False
+        recipe.save()
+        self.assertEqual(self.get_total(category_url), 1)
+
+        new_recipe.delete()
+        self.assertEqual(self.get_total(home_url), 0)
+        self.assertEqual(self.client.get(category_url).status_code, 404)
+
+    # TEST if moving a recipe to another category updates both
+    def test_recipes_listing_stats_follow_category_change(self):
+        recipe = self.make_recipe()
+        old_url = reverse('recipes:category',
+                          kwargs={'category_id': recipe.category.id})
+        self.assertEqual(self.get_total(old_url), 1)
+
+        recipe.category = self.make_category('Other')
+        recipe.save()
+
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertEqual(self.get_total(reverse(
+            'recipes:category', kwargs={'category_id': recipe.category.id})),
+            1)
+
+    # TEST if adding/removing tags (from both sides) and renaming a tag
+    # update the totals of the tag pages
+    def test_recipes_listing_stats_follow_tag_changes(self):
+        recipe = self.make_recipe()
+        tag = self.make_tag('Sweet')
+        url = reverse('recipes:tag', kwargs={'tag_name': 'Sweet'})
+        self.assertEqual(self.get_total(url), 0)
+
+        recipe.tags.add(tag)
+        self.assertEqual(self.get_total(url), 1)
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.get_total(url), 0)
+
+        tag.recipe_set.add(recipe)
+        self.assertEqual(self.get_total(url), 1)
+
+        tag.name = 'Salty'
+        tag.save()
+        self.assertEqual(self.get_total(url), 0)
+        self.assertEqual(self.get_total(
+            reverse('recipes:tag', kwargs={'tag_name': 'Salty'})), 1)
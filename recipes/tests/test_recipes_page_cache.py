@@ -0,0 +1,117 @@
+from django.urls import reverse  # type: ignore
+
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+class RecipePageCacheTest(RecipeTestBase):
+
+    # TEST if the second hit to the same page does not touch the database
+    def test_recipes_home_second_hit_is_served_from_cache(self):
+        self.make_recipe()
+        url = reverse('recipes:home')
+
+        first_response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            second_response = self.client.get(url)
+
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertIsNone(second_response.context)
+
+    # TEST if each page number has its own cache entry
+    def test_recipes_page_cache_is_keyed_by_query_string(self):
+        self.make_recipe(title='Cached Recipe')
+
+        self.client.get(reverse('recipes:home'))
+        response = self.client.get(reverse('recipes:home') + '?page=2')
+
+        # The page was rendered (not read from cache)
+        self.assertIsNotNone(response.context)
+
+    # TEST if publishing a recipe drops the cached pages
+    def test_recipes_page_cache_is_dropped_when_recipe_is_published(self):
+        recipe = self.make_recipe(
+            title='Will be published', is_published=False)
+        url = reverse('recipes:home')
+
+        self.assertNotContains(self.client.get(url), 'Will be published')
+
+        recipe.is_published = True
+        recipe.save()
+
+        self.assertContains(self.client.get(url), 'Will be published')
+
+    # TEST if unpublishing a recipe drops the cached pages
+    def test_recipes_page_cache_is_dropped_when_recipe_is_unpublished(self):
+        recipe = self.make_recipe(title='Will be unpublished')
+        url = reverse('recipes:home')
+
+        self.assertContains(self.client.get(url), 'Will be unpublished')
+
+        recipe.is_published = False
+        recipe.save()
+
+        self.assertNotContains(self.client.get(url), 'Will be unpublished')
+
+    # TEST if deleting a published recipe drops the cached pages
+    def test_recipes_page_cache_is_dropped_when_recipe_is_deleted(self):
+        recipe = self.make_recipe(title='Will be deleted')
+        url = reverse('recipes:home')
+
+        self.assertContains(self.client.get(url), 'Will be deleted')
+
+        recipe.delete()
+
+        self.assertNotContains(self.client.get(url), 'Will be deleted')
+
+    # TEST if changing the tags of a published recipe drops the cache
+    def test_recipes_page_cache_is_dropped_when_tags_change(self):
+        recipe = self.make_recipe(title='Tagged Recipe')
+        tag = self.make_tag('CacheTag')
+        url = reverse('recipes:tag', kwargs={'tag_name': 'CacheTag'})
+
+        self.assertNotContains(self.client.get(url), 'Tagged Recipe')
+
+        recipe.tags.add(tag)
+
+        self.assertContains(self.client.get(url), 'Tagged Recipe')
+
+    # TEST if renaming the category or the author of a recipe drops the
+    # cached pages (they display the names)
+    def test_recipes_page_cache_is_dropped_when_names_change(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:home')
+
+        for instance, field in ((recipe.category, 'name'),
+                                (recipe.author, 'first_name')):
+            with self.subTest(model=type(instance).__name__):
+                self.client.get(url)
+                setattr(instance, field, f'Renamed{field}')
+                instance.save()
+                self.assertContains(self.client.get(url), f'Renamed{field}')
+
+    # TEST if saving an unpublished recipe keeps the cache
+    def test_recipes_page_cache_is_kept_when_unpublished_recipe_saved(self):
+        self.make_recipe()
+        url = reverse('recipes:home')
+        self.client.get(url)
+
+        self.make_recipe(
+            title='Draft', slug='draft', is_published=False,
+            author_data={'username': 'draft_author'})
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    # TEST if logged users never receive a cached page
+    def test_recipes_page_cache_is_not_used_to_logged_users(self):
+        self.make_recipe()
+        self.make_author(username='logged_user', email='logged@server.com')
+        self.client.login(username='logged_user', password='123456')
+        url = reverse('recipes:home')
+
+        self.client.get(url)
+        response = self.client.get(url)
+
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Logout')
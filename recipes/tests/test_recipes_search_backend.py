@@ -0,0 +1,152 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse  # type: ignore
+
+from recipes.models import Recipe, RecipeSearchStats, RecipeSearchTerm
+from recipes.search import (
+    InvertedIndexSearchBackend, SimpleSearchBackend, tokenize)
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+class RecipeSearchBackendTest(RecipeTestBase):
+
+    def setUp(self) -> None:
+        self.backend = InvertedIndexSearchBackend()
+        return super().setUp()
+
+    def search(self, search_term):
+        return list(self.backend.search(
+            Recipe.objects.filter(is_published=True), search_term))
+
+    # TEST if the tokenizer folds accents and case
+    def test_recipes_search_tokenize_folds_accents(self):
+        self.assertEqual(
+            tokenize('Feijão à Moda, PÃO-de-Queijo'),
+            ['feijao', 'a', 'moda', 'pao', 'de', 'queijo'])
+
+    # TEST if a search term without accents finds accented content
+    def test_recipes_search_is_accent_insensitive(self):
+        recipe = self.make_recipe(title='Pão de Queijo')
+
+        self.assertEqual(self.search('pao de queijo'), [recipe])
+        self.assertEqual(self.search('PÃO'), [recipe])
+
+    # TEST if preparation steps, tags and category are searched
+    def test_recipes_search_finds_steps_tags_and_category(self):
+        recipe = self.make_recipe(
+            preparation_steps='Asse em forno bem quente',
+            category_data=self.make_category('Sobremesas'))
+        recipe.tags.add(self.make_tag('Vegano'))
+
+        self.assertEqual(self.search('forno'), [recipe])
+        self.assertEqual(self.search('vegano'), [recipe])
+        self.assertEqual(self.search('sobremesas'), [recipe])
+
+    # TEST if the tokens are matched as prefix
+    def test_recipes_search_matches_prefix(self):
+        recipe = self.make_recipe(title='Bolos de cenoura')
+
+        self.assertEqual(self.search('bolo cen'), [recipe])
+
+    # TEST if the tokens only match the start of the words (unlike the
+    # icontains of SimpleSearchBackend)
+    def test_recipes_search_does_not_match_middle_of_words(self):
+        recipe = self.make_recipe(title='Bolo de chocolate')
+        published = Recipe.objects.filter(is_published=True)
+
+        self.assertEqual(self.search('colate'), [])
+        self.assertEqual(
+            list(SimpleSearchBackend().search(published, 'colate')), [recipe])
+
+    # TEST if every token must be found in the recipe
+    def test_recipes_search_requires_every_token(self):
+        self.make_recipe(title='Bolo de cenoura')
+
+        self.assertEqual(self.search('bolo chocolate'), [])
+
+    # TEST if title matches are ranked above steps matches
+    def test_recipes_search_ranks_title_above_steps(self):
+        in_steps = self.make_recipe(
+            title='Torta salgada', slug='torta',
+            preparation_steps='Sirva com frango desfiado',
+            author_data={'username': 'steps'})
+        in_title = self.make_recipe(
+            title='Frango assado', slug='frango',
+            author_data={'username': 'title'})
+
+        self.assertEqual(self.search('frango'), [in_title, in_steps])
+
+    # TEST if unpublished recipes are not returned
+    def test_recipes_search_ignores_unpublished_recipes(self):
+        self.make_recipe(title='Rascunho de lasanha', is_published=False)
+
+        self.assertEqual(self.search('lasanha'), [])
+
+    # TEST if renaming a tag updates the index
+    def test_recipes_search_index_follows_tag_rename(self):
+        recipe = self.make_recipe()
+        tag = self.make_tag('Antigo')
+        recipe.tags.add(tag)
+
+        tag.name = 'Novo'
+        tag.save()
+
+        self.assertEqual(self.search('novo'), [recipe])
+        self.assertEqual(self.search('antigo'), [])
+
+    # TEST if clearing and deleting a tag (from the tag side) drop its
+    # terms from the index
+    def test_recipes_search_index_follows_tag_clear_and_delete(self):
+        recipe = self.make_recipe()
+        cleared = self.make_tag('Limpa')
+        deleted = self.make_tag('Apagada')
+        recipe.tags.add(cleared, deleted)
+
+        cleared.recipe_set.clear()
+        deleted.delete()
+
+        self.assertEqual(self.search('limpa'), [])
+        self.assertEqual(self.search('apagada'), [])
+        self.assertEqual(self.search('recipe'), [recipe])
+
+    # TEST if saving a category/tag without renaming it does not
+    # reindex its recipes
+    def test_recipes_search_index_skips_save_without_rename(self):
+        category = self.make_category('Massas')
+        self.make_recipes_in_batch(qty=3, category_data=category)
+
+        with CaptureQueriesContext(connection) as context:
+            category.save()
+
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'recipesearchterm' in query['sql']])
+
+    # TEST if the stats row follows the indexed and deleted recipes
+    def test_recipes_search_stats_follow_the_index(self):
+        recipes = self.make_recipes_in_batch(qty=3)
+
+        recipes[0].delete()
+        recipes[1].title = 'A much longer title to this recipe'
+        recipes[1].save()
+
+        lengths = dict(RecipeSearchTerm.objects.values_list(
+            'recipe_id', 'document_length').distinct())
+        stats = RecipeSearchStats.objects.get()
+        self.assertEqual(stats.documents, 2)
+        self.assertEqual(stats.total_length, sum(lengths.values()))
+
+        self.backend.rebuild(Recipe.objects.all())
+        self.assertEqual(
+            RecipeSearchStats.objects.values_list(
+                'documents', 'total_length').get(),
+            (stats.documents, stats.total_length))
+
+    # TEST if the search page uses the index (finds recipes by tag)
+    def test_recipes_search_view_finds_recipe_by_tag(self):
+        recipe = self.make_recipe(title='Moqueca')
+        recipe.tags.add(self.make_tag('Baiana'))
+
+        response = self.client.get(reverse('recipes:search') + '?q=baiana')
+
+        self.assertContains(response, 'Moqueca')
@@ -0,0 +1,81 @@
+import json
+from unittest.mock import patch
+
+from django.urls import reverse  # type: ignore
+
+from recipes.tests.test_recipe_base import RecipeTestBase
+
+
+class RecipeStreamingApiTest(RecipeTestBase):
+
+    def get_streamed_content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    # TEST if ?stream=1 streams every recipe as a JSON array
+    @patch('recipes.views.site.PER_PAGE', new=2)
+    def test_recipes_api_v1_stream_returns_every_recipe(self):
+        self.make_recipes_in_batch(qty=5)
+
+        response = self.client.get(
+            reverse('recipes:recipes_api_v1') + '?stream=1')
+        data = json.loads(self.get_streamed_content(response))
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['title'], 'This is recipe 4')
+
+    # TEST if ?stream=ndjson streams one recipe per line
+    @patch('recipes.views.site.STREAM_CHUNK_SIZE', new=2)
+    def test_recipes_api_v1_stream_ndjson(self):
+        self.make_recipes_in_batch(qty=3)
+        recipe = self.make_recipe(
+            title='Tagged', slug='tagged', author_data={'username': 'tag'})
+        recipe.tags.add(self.make_tag('Streamed'))
+
+        response = self.client.get(
+            reverse('recipes:recipes_api_v1') + '?stream=ndjson')
+        lines = self.get_streamed_content(response).splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[0])['tags'], 'Streamed')
+
+    # TEST if the category stream only has the category recipes
+    def test_recipes_category_api_v1_stream_is_filtered(self):
+        category = self.make_category('Streamed category')
+        self.make_recipe(category_data=category)
+        self.make_recipe(
+            title='Other', slug='other', author_data={'username': 'other'})
+
+        response = self.client.get(
+            reverse('recipes:category_api_v1',
+                    kwargs={'category_id': category.id}) + '?stream=1')
+        data = json.loads(self.get_streamed_content(response))
+
+        self.assertEqual(
+            [item['title'] for item in data], ['My Recipe Title'])
+
+    # TEST if the export endpoint streams NDJSON by default
+    def test_recipes_export_api_v1_streams_published_recipes(self):
+        self.make_recipes_in_batch(qty=3)
+        self.make_recipe(
+            title='Draft', slug='draft', is_published=False,
+            author_data={'username': 'draft'})
+
+        response = self.client.get(reverse('recipes:recipes_export_api_v1'))
+        lines = self.get_streamed_content(response).splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertNotIn('Draft', ''.join(lines))
+
+    # TEST if the DRF list streams every recipe (not only 7)
+    def test_recipes_api_v2_stream_returns_every_recipe(self):
+        self.make_recipes_in_batch(qty=9)
+
+        response = self.client.get(
+            reverse('recipes:recipes_api_v2') + '?stream=1')
+        data = json.loads(self.get_streamed_content(response))
+
+        self.assertEqual(len(data), 9)
+        self.assertIn('tags_links', data[0])
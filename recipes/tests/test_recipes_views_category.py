@@ -141,3 +141,22 @@ class RecipeViewsCategoryTest(RecipeTestBase):
             msg="CATEGORY VIEW - PAGINATOR: The third page has the wrong "
             "number of recipes. Expected: 1. Found: "
             f"{len(response.context['recipes'].paginator.get_page(3))}",)
+
+    # TEST if the category page is loaded with a single probe query:
+    # validators (also the existence probe and the count) and the page
+    def test_recipes_category_view_query_count(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:category',
+                      kwargs={'category_id': recipe.category.id})
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        # A missing category runs only the probe
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('recipes:category', kwargs={'category_id': 9999}))
+
+        self.assertEqual(response.status_code, 404)
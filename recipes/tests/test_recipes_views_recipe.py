@@ -131,3 +131,23 @@ class RecipeViewsRecipeTest(RecipeTestBase):
             msg="DETAILED VIEW - RECIPE'S TAGs: Wrong tag found. "
             f"Expected: '{not_expected_tag.name}'. "
             f"Found: {tag_list}")
+
+    # TEST if the detail page is loaded with the minimum queries:
+    # validators (also the existence probe), recipe with its relations
+    # and tags
+    def test_recipes_detail_view_query_count(self):
+        recipe = self.make_recipe()
+        recipe.tags.add(self.make_tag('Counted'))
+        url = reverse('recipes:recipe', kwargs={'pk': recipe.id})
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+
+        self.assertContains(response, 'Counted')
+
+        # A missing recipe runs only the probe
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('recipes:recipe', kwargs={'pk': 9999}))
+
+        self.assertEqual(response.status_code, 404)
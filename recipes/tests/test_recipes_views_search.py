@@ -293,3 +293,26 @@ class RecipeViewsSearchTest(RecipeTestBase):
                 msg="SEARCH VIEW - PAGINATOR: The first page has the wrong "
                 "number of recipes. Expected: 1. Found: "
                 f"{len(response.context['recipes'].paginator.get_page(3))}",)
+
+    # TEST if the page says so when the results reached max_results
+    def test_recipes_search_shows_when_results_are_limited(self):
+        self.make_recipes_in_batch(qty=3)
+        search_url = reverse('recipes:search')
+        notice = 'Only the 2 most relevant recipes are shown.'
+
+        with patch(
+                'recipes.search.InvertedIndexSearchBackend.max_results', 2):
+            response = self.client.get(f'{search_url}?q=recipe')
+
+        self.assertEqual(len(response.context['recipes']), 2)
+        self.assertTrue(response.context['search_results_limited'])
+        self.assertContains(response, notice)
+
+        with patch(
+                'recipes.search.InvertedIndexSearchBackend.max_results', 4):
+            # Another term: the first page is cached
+            response = self.client.get(f'{search_url}?q=this')
+
+        self.assertEqual(len(response.context['recipes']), 3)
+        self.assertFalse(response.context['search_results_limited'])
+        self.assertNotContains(response, 'most relevant recipes are shown')
@@ -252,3 +252,25 @@ class RecipeViewsTagTest(RecipeTestBase):
                 msg="TAG VIEW - PAGINATOR: The first page has the wrong "
                 "number of recipes. Expected: 1. Found: "
                 f"{len(response.context['recipes'].paginator.get_page(2))}",)
+
+    # TEST if the tag is read once (title and filter) and the recipes
+    # of tags with the same name are listed once
+    def test_recipes_tag_view_reads_the_tag_once(self):
+        recipe = self.make_recipe()
+        same_name_tag = Tag.objects.create(name=self.tag.name)
+        recipe.tags.add(self.tag, same_name_tag)
+        url = reverse('recipes:tag', kwargs={'tag_name': self.tag.name})
+
+        # tags, validators, recipes and their tags
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.context['recipes']), 1)
+        self.assertEqual(response.context['recipes'].paginator.count, 1)
+        self.assertEqual(response.context['page_title'],
+                         f'Tag "{self.tag.name}" ')
+
+        # An unknown tag runs only the tag lookup
+        with self.assertNumQueries(1):
+            self.client.get(reverse('recipes:tag', kwargs={
+                'tag_name': 'Unknown'}))
@@ -14,75 +14,96 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import os
+
 from django.urls import path  # type: ignore
 
-from .views import site, api
+from utils.lazy_imports import lazy_view
+
+from .views import site
 
 app_name = 'recipes'
 
+# 1 = native async views (recipes/views/site_async.py). Set by
+# project/asgi.py: under WSGI the sync views are faster.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
+if ASYNC_VIEWS:
+    from .views import site_async as views
+else:
+    views = site
+
+# The DRF views (and DRF itself) are imported on the first v2 request
+API_V2_VIEWS = 'recipes.views.api'
+
 urlpatterns = [
-    path('', site.RecipeListViewHome.as_view(), name='home'),
+    path('', views.RecipeListViewHome.as_view(), name='home'),
 
     path(
         'recipes/search/',
-        site.RecipeListViewSearch.as_view(),
+        views.RecipeListViewSearch.as_view(),
         name='search'),
 
     path(
         'recipes/category/<int:category_id>/',
-        site.RecipeListViewCategory.as_view(),
+        views.RecipeListViewCategory.as_view(),
         name='category'),
 
     path(
         'recipes/<int:pk>/',
-        site.RecipeDetail.as_view(),
+        views.RecipeDetail.as_view(),
         name='recipe'),
 
     path(
         'recipes/tag/<str:tag_name>/',
-        site.RecipeListViewTag.as_view(),
+        views.RecipeListViewTag.as_view(),
         name='tag'),
 
     # API
     path(
         'recipes/api/v1/',
-        site.RecipeListViewHomeAPI.as_view(),
+        views.RecipeListViewHomeAPI.as_view(),
         name='recipes_api_v1'),
 
+    path(
+        'recipes/api/v1/export/',
+        views.RecipeExportAPI.as_view(),
+        name='recipes_export_api_v1'),
+
     path(
         'recipes/api/v1/<int:pk>/',
-        site.RecipeDetailAPI.as_view(),
+        views.RecipeDetailAPI.as_view(),
         name='recipe_api_v1'),
 
     path(
         'recipes/api/v1/category/<int:category_id>/',
-        site.RecipeListViewCategoryAPI.as_view(),
+        views.RecipeListViewCategoryAPI.as_view(),
         name='category_api_v1'),
 
     path(
         'recipes/api/v1/search/',
-        site.RecipeListViewSearchAPI.as_view(),
+        views.RecipeListViewSearchAPI.as_view(),
         name='search_api_v1'),
 
 
     path(
         'recipes/api/v1/tag/<str:tag_name>/',
-        site.RecipeListViewTagAPI.as_view(),
+        views.RecipeListViewTagAPI.as_view(),
         name='tag_api_v1'),
 
     # DJANGO REST FRAMEWORK
     path(
         'recipes/api/v2/',
-        api.recipe_api_list,
+        lazy_view(f'{API_V2_VIEWS}.recipe_api_list', csrf_exempt=True),
         name='recipes_api_v2'),
 
     path(
         'recipes/api/v2/<int:pk>',
-        api.recipe_api_detail,
+        lazy_view(f'{API_V2_VIEWS}.recipe_api_detail', csrf_exempt=True),
         name='recipe_api_v2'),
 
     path(
         'recipes/api/v2/tag/<int:pk>',
-        api.recipe_api_tag,
+        lazy_view(f'{API_V2_VIEWS}.recipe_api_tag', csrf_exempt=True),
         name='tag_detail_api_v2'),
 ]
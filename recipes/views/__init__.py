@@ -1,3 +1,2 @@
 # flake8: noqa
 from .site import *
-from .api import *
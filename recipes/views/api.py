@@ -1,34 +1,212 @@
+import os
+
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
+from recipes.listings import HOME_LISTING, get_listing_stats
 from recipes.models import Recipe
 from recipes.serializers import RecipeSerializer
 from tag.models import Tag
 from tag.serializers import TagSerializer
+from utils.conditional import (
+    conditional_get, get_queryset_validators, make_validators)
+from utils.pagination import make_keyset_pagination
+from utils.profiling import record_time
+from utils.streaming import (
+    STREAM_CHUNK_SIZE, batched, get_stream_format,
+    make_streaming_json_response)
+
+# Recipes per page of the list (?page_size= up to the max)
+API_V2_PAGE_SIZE = int(os.environ.get('API_V2_PAGE_SIZE', 7))
+API_V2_MAX_PAGE_SIZE = int(os.environ.get('API_V2_MAX_PAGE_SIZE', 100))
+
+# Recipe columns loaded to each field of RecipeSerializer.
+# The ones not listed in ?fields= are not loaded (only())
+FIELD_COLUMNS = {
+    'id': ('id',),
+    'title': ('title',),
+    'description': ('description',),
+    'preparation': ('preparation_time', 'preparation_time_unit'),
+    'category_name': ('category',),
+    'category': ('category',),
+    'author_name': ('author',),
+    'author': ('author',),
+    'public': ('is_published',),
+    'tags': (),
+    'tags_objects': (),
+    'tags_links': (),
+}
+
+# Fields that need the related rows (joined or prefetched)
+CATEGORY_FIELDS = ('category_name',)
+AUTHOR_FIELDS = ('author_name',)
+TAG_FIELDS = ('tags', 'tags_objects', 'tags_links')
+
+# ?<filter>=<id> of the list
+LIST_FILTERS = {
+    'category': 'category_id',
+    'author': 'author_id',
+    'tag': 'tags',
+}
+
+
+def get_requested_fields(request):
+    # ?fields=id,title -> ['id', 'title']. None (every field) when
+    # the parameter is missing
+    value = request.GET.get('fields', '')
+    if not value:
+        return None
+
+    fields = list(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELD_COLUMNS]
+    if unknown:
+        raise ValidationError(
+            {'fields': [f"Unknown field(s): {', '.join(unknown)}."]})
+    return fields
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET.get('page_size', API_V2_PAGE_SIZE))
+    except ValueError:
+        return API_V2_PAGE_SIZE
+    return min(max(page_size, 1), API_V2_MAX_PAGE_SIZE)
+
+
+def get_list_queryset(request, fields):
+    # Published recipes filtered by ?category=, ?author= and ?tag=
+    # (ids), loading only what the requested fields need
+    queryset = Recipe.objects.filter(is_published=True)
+
+    for name, lookup in LIST_FILTERS.items():
+        value = request.GET.get(name)
+        if value is None:
+            continue
+        try:
+            queryset = queryset.filter(**{lookup: int(value)})
+        except ValueError:
+            raise ValidationError(
+                {name: ['A valid integer is required.']})
+
+    if fields is None:
+        fields = FIELD_COLUMNS
+
+    queryset = queryset.only(*{
+        column for name in fields for column in FIELD_COLUMNS[name]})
+
+    related = [
+        relation for relation, relation_fields in (
+            ('category', CATEGORY_FIELDS), ('author', AUTHOR_FIELDS))
+        if any(name in fields for name in relation_fields)
+    ]
+    if related:
+        queryset = queryset.select_related(*related)
+    if any(name in fields for name in TAG_FIELDS):
+        queryset = queryset.prefetch_related('tags')
+
+    return queryset
+
+
+def get_page_link(request, cursor, param):
+    # Absolute url of the list with ?after= or ?before= (the other
+    # cursor is removed). None when there is no such page
+    if cursor is None:
+        return None
+
+    url = request.build_absolute_uri()
+    for name in ('after', 'before'):
+        url = remove_query_param(url, name)
+    return replace_query_param(url, param, cursor)
+
+
+def iter_serialized_recipes(request, queryset, fields=None):
+    # Serialize a queryset chunk by chunk (server-side cursor), keeping
+    # only STREAM_CHUNK_SIZE recipes in memory
+    recipes = queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+    for batch in batched(recipes, STREAM_CHUNK_SIZE):
+        serializer = RecipeSerializer(
+            batch, many=True, fields=fields, context={'request': request})
+        yield from serializer.data
+
+
+def recipe_list_validators(request):
+    # The list depends on every published recipe and on the
+    # negotiated format (json, browsable api...). Its stats are the
+    # cached ones of the home listing (recipes/listings.py)
+    return make_validators(
+        get_listing_stats(
+            HOME_LISTING, Recipe.objects.filter(is_published=True)),
+        'recipe_api_list',
+        sorted(request.GET.lists()),
+        request.META.get('HTTP_ACCEPT', ''),
+        use_last_modified=False,
+    )
+
+
+def recipe_detail_validators(request, pk):
+    return get_queryset_validators(
+        Recipe.objects.filter(is_published=True, pk=pk),
+        'recipe_api_detail',
+        pk,
+        sorted(request.GET.lists()),
+        request.META.get('HTTP_ACCEPT', ''),
+    )
 
 
 @api_view(http_method_names=['get', 'post'])
+@conditional_get(recipe_list_validators)
 def recipe_api_list(request):
     if request.method == 'GET':
+        fields = get_requested_fields(request)
+        recipes = get_list_queryset(request, fields)
+
+        # ?stream=1 (JSON array) or ?stream=ndjson: every published recipe
+        # is streamed instead of one page
+        stream_format = get_stream_format(request)
+        if stream_format is not None:
+            return make_streaming_json_response(
+                iter_serialized_recipes(
+                    request, recipes.order_by('-pk'), fields),
+                stream_format, encoder=JSONEncoder)
+
+        # Cursor pagination (utils/pagination.py): ?after=<cursor> and
+        # ?before=<cursor>, from the next and previous links
+        page_obj, _ = make_keyset_pagination(
+            request, recipes, get_page_size(request))
 
-        recipes = Recipe.objects.get_published()[:7]
         serializer = RecipeSerializer(
-            recipes, many=True, context={'request': request})
-        return Response(serializer.data)
+            page_obj.object_list, many=True, fields=fields,
+            context={'request': request})
+        with record_time('serializer'):
+            data = serializer.data
+        return Response({
+            'next': get_page_link(request, page_obj.next_cursor, 'after'),
+            'previous': get_page_link(
+                request, page_obj.previous_cursor, 'before'),
+            'results': data,
+        })
     elif request.method == 'POST':
         
         return Response('POST', status=status.HTTP_201_CREATED)
 
 
 @api_view()
+@conditional_get(recipe_detail_validators)
 def recipe_api_detail(request, pk):
     recipe = get_object_or_404(Recipe.objects.get_published(), pk=pk)
 
     serializer = RecipeSerializer(
         recipe, many=False, context={'request': request})
-    return Response(serializer.data)
+    with record_time('serializer'):
+        data = serializer.data
+    return Response(data)
 
 
 @api_view()
@@ -36,4 +214,6 @@ def recipe_api_tag(request, pk):
     tag = get_object_or_404(Tag.objects.all(), pk=pk)
     serializer = TagSerializer(
         tag, many=False, context={'request': request})
-    return Response(serializer.data)
+    with record_time('serializer'):
+        data = serializer.data
+    return Response(data)
@@ -1,20 +1,35 @@
-from django.forms import model_to_dict
+from collections import defaultdict
+from django.contrib.messages import get_messages
+from django.db.models import QuerySet
 from django.http import JsonResponse
 import os
-from django.db.models import Q
 from django.http.response import HttpResponse as HttpResponse
 from django.views.generic import DetailView, ListView
 from django.http import Http404
 from django.utils import translation
+from django.utils.functional import lazy
 from django.utils.translation import gettext as _
 
-from recipes.models import Recipe
+from recipes.listings import (
+    HOME_LISTING, category_listing, get_listing_stats, tag_listing)
+from recipes.models import Recipe, RecipeCard
+from recipes.search import get_search_backend
 from tag.models import Tag
+from utils.cache import page_cache
+from utils.conditional import make_conditional_response, make_validators
 from utils.i18n import set_language
 from utils.pagination import make_pagination
+from utils.profiling import record_time
+from utils.streaming import (
+    STREAM_CHUNK_SIZE, batched, get_stream_format,
+    make_streaming_json_response)
 
 PER_PAGE = int(os.environ.get('PER_PAGE', 6))
 
+# 'offset' (page numbers) or 'keyset' (after/before cursors).
+# See utils/pagination.py
+PAGINATION_MODE = os.environ.get('PAGINATION_MODE', 'offset')
+
 
 def get_path_to_media(self):
     # Method to recover the url to media folder.
@@ -22,131 +37,238 @@ def get_path_to_media(self):
     # it is required only the domain. The first thing after the domain
     # is 'recipes. So the str is cutted where recipes is found
     # and is concated with 'media/', which is the folder where the medias
-    # are saved. This method allows the set_path_to_media() to create the
+    # are saved. This method allows the serialize_recipes() to create the
     # correct link to the media
 
-    return self.request.build_absolute_uri(
-    )[:self.request.build_absolute_uri().find('recipes')] + 'media/'
+    absolute_uri = self.request.build_absolute_uri()
+    return absolute_uri[:absolute_uri.find('recipes')] + 'media/'
 
 
-def set_path_to_media(self, recipe):
-    # Method to adjust the link to the recipes medias
-    # It get the path to media folder from get_path_to_media()
-    # and add the cover name from recipe.
-    # If no cover was passed to recipe, it uses an empty string
-    # and them return the recipe adjusted.
-    if recipe.get('cover'):
-        path_to_media = get_path_to_media(self)
-        recipe['cover'] = path_to_media + recipe['cover'].name
-    else:
-        recipe['cover'] = ''
-    return recipe
+# Columns read by the v1 JSON API. Only these columns are selected
+# (values()), the recipes are not loaded as model instances.
+RECIPE_JSON_FIELDS = (
+    'id', 'title', 'description', 'slug', 'preparation_time',
+    'preparation_time_unit', 'servings', 'servings_unit',
+    'preparation_steps', 'preparation_steps_is_html', 'is_published',
+    'cover', 'cover_variants', 'created_at', 'author_id',
+    'author__first_name', 'author__last_name', 'category_id',
+    'category__name',
+)
 
 
-def set_author_name(recipe):
-    # Method to check author name
-    #     The future API methods to interact with the application
-    #     will be done by the author's id and category's id
-    #     But the author's name and category's name should be available
-    #     in the API.
+def recipe_to_row(recipe):
+    # Method to convert an already loaded recipe (model instance)
+    # to the same dict returned by values(*RECIPE_JSON_FIELDS)
+    row = {
+        field: getattr(recipe, field)
+        for field in RECIPE_JSON_FIELDS if '__' not in field
+    }
+    row['cover'] = recipe.cover.name
+    row['author__first_name'] = getattr(recipe.author, 'first_name', None)
+    row['author__last_name'] = getattr(recipe.author, 'last_name', None)
+    row['category__name'] = getattr(recipe.category, 'name', None)
+    return row
 
-    author_id = recipe.author.id
 
-    author_name = recipe.author.first_name + \
-        ' ' + recipe.author.last_name
+def get_recipe_rows(recipes):
+    # Method to get the rows of the recipes in a page.
+    # Offset pages hold a lazy (sliced) queryset: only the required
+    # columns are selected. Keyset pages are already evaluated lists.
+    object_list = getattr(recipes, 'object_list', recipes)
 
-    return author_id, author_name.strip()
+    if isinstance(object_list, QuerySet):
+        return list(object_list.values(*RECIPE_JSON_FIELDS))
 
+    return [recipe_to_row(recipe) for recipe in object_list]
 
-def adjust_recipe(self, recipe):
-    # Method to adjust the recipe to be passed as JSON
-    # It converts the recipe model to dict and adjust
-    # some values
-    #
-    # Any interaction with the application should be done
-    # by IDs. So here is created new keys to recipe dict,
-    # allowing API to know the authors and category's names,
-    # but also knowing their IDs, if necessary.
-    #
-    # This variables are created to be easier to use their
-    # values. It was easier to work with recipe model here,
-    # so the values are saved before recipe convertion
-    # to dict
-    if recipe.category:
-        category_name = recipe.category.name
-    else:
-        category_name = ''
 
-    author_id, author_name = set_author_name(recipe)
-    created_at = recipe.created_at
+def get_tag_links(recipe_ids):
+    # (recipe_id, tag_name) of many recipes
+    return Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list('recipe_id', 'tag__name')
 
-    # Here recipe become a dict
-    recipe = model_to_dict(recipe)
 
-    # Creating new keys to recipe dict.
-    # Author's name to be display to users
-    # Author's id to interact with application
-    recipe['author_name'] = author_name
-    recipe['author_id'] = author_id
+def get_tag_names(recipe_ids):
+    # Method to get the tag names of many recipes in one query.
+    # Returns {recipe_id: ['tag1', 'tag2']}
+    tag_names = defaultdict(list)
 
-    # Creating new keys to recipe dict.
-    # Category's name to be display to users
-    # Category's id to interact with application
-    # recipe['category'] returns the id
-    # (after the model_to_dict() method)
-    recipe['category_name'] = category_name
-    recipe['category_id'] = recipe['category']
+    for recipe_id, tag_name in get_tag_links(recipe_ids):
+        tag_names[recipe_id].append(tag_name)
 
-    # Adjusting the link to recipe's cover
-    recipe = set_path_to_media(self, recipe)
+    return tag_names
 
-    # Adjusting the tags to be passed as JSON
-    # The decision here was to use a string with
-    # each tag separated by comma.
-    tag_list = ''
-    for tag in recipe['tags']:
-        tag_list += tag.name + ', '
 
-    # Removing the last char because it will add a comma
-    # after the last tag
-    tag_list = tag_list.strip()[:-1]
+def serialize_recipes(self, rows, tag_names):
+    # Method to adjust the recipes rows to be passed as JSON, in a single
+    # pass. The link to media folder is computed once per request.
+    #
+    # Any interaction with the application should be done
+    # by IDs. So the recipe dict has the author's and category's names
+    # (to be displayed to users) and also their IDs.
+    # Tags are passed as a string with each tag separated by comma.
+    path_to_media = get_path_to_media(self)
+    recipes_list = list()
+
+    for row in rows:
+        author_name = '{} {}'.format(
+            row.pop('author__first_name') or '',
+            row.pop('author__last_name') or '',
+        ).strip()
+        category_name = row.pop('category__name') or ''
+        cover = row['cover']
+
+        row.update({
+            'cover': path_to_media + cover if cover else '',
+            'author_name': author_name,
+            'author_id': row.pop('author_id'),
+            'category_name': category_name,
+            'category_id': row.pop('category_id'),
+            'tags': ', '.join(tag_names.get(row['id'], [])),
+            'created_at': str(row['created_at']),
+        })
+        recipes_list.append(row)
 
-    # Removing the key-values that were adjusted here to be
-    # passed as JSON. Their values are saved in different keys above
-    del recipe['tags']
-    del recipe['author']
-    del recipe['category']
+    return recipes_list
 
-    # Creating new keys
-    recipe['tags'] = tag_list
-    recipe['created_at'] = str(created_at)
 
-    return recipe
+def iter_recipes_json(self, queryset):
+    # Method to serialize a whole queryset chunk by chunk.
+    # iterator() uses a server-side cursor (PostgreSQL), so only
+    # STREAM_CHUNK_SIZE rows are in memory at a time
+    rows = queryset.prefetch_related(None).values(
+        *RECIPE_JSON_FIELDS).iterator(chunk_size=STREAM_CHUNK_SIZE)
 
+    for batch in batched(rows, STREAM_CHUNK_SIZE):
+        tag_names = get_tag_names([row['id'] for row in batch])
+        yield from serialize_recipes(self, batch, tag_names)
 
-def get_recipes(self, is_detailed=False):
+
+def get_recipes(self, is_detailed=False, context=None):
     # Method to recover the recipes to each view and return it
     # prepared to be used in JsonResponse()
     # Two situations here: first to detailed view (which search for
     # 'recipe' context); and second to the remain views (which
     # search for 'recipes' context)
+    # context -> the context already built by the view (passed to
+    #     render_to_response). If None, it is built here.
+    if context is None:
+        context = self.get_context_data()
+
     if is_detailed:
+        rows = [recipe_to_row(context['recipe'])]
+    else:
+        rows = get_recipe_rows(context['recipes'])
 
-        recipe = self.get_context_data()['recipe']
-        return adjust_recipe(self, recipe)
+    tag_names = get_tag_names([row['id'] for row in rows]) if rows else {}
 
-    else:
-        recipes = self.get_context_data()['recipes']
-        recipes_list = list()
+    with record_time('serializer'):
+        recipes_list = serialize_recipes(self, rows, tag_names)
+
+    if is_detailed:
+        return recipes_list[0]
+    return recipes_list
+
+
+class RecipeStreamMixin:
+
+    # Mixin to the JSON list views.
+    # ?stream=1 (JSON array) or ?stream=ndjson streams every recipe of the
+    # view queryset, without pagination, in constant memory.
+    # default_stream_format -> format used when no stream parameter is
+    # passed (None = normal paginated response)
+
+    default_stream_format = None
+
+    # The JSON serializer reads the Recipe columns
+    use_recipe_cards = False
+
+    def get(self, request, *args, **kwargs):
+        stream_format = (
+            get_stream_format(request) or self.default_stream_format)
+
+        if stream_format is None:
+            return super().get(request, *args, **kwargs)
+
+        self.object_list = self.get_queryset()
 
-        for recipe in recipes:
-            recipe = adjust_recipe(self, recipe)
-            recipes_list.append(recipe)
+        if (getattr(self, 'raise_404_if_empty', False) and
+                not self.object_list.exists()):
+            raise Http404()
+
+        return make_streaming_json_response(
+            iter_recipes_json(self, self.object_list), stream_format)
+
+
+class RecipeConditionalGetMixin:
+
+    # HTTP conditional GET (utils/conditional.py).
+    # The validators are computed from the view queryset with a single
+    # aggregate query (count and max update_at). When the client has the
+    # current version, a 304 is returned without rendering the template.
+    # The same query is the existence probe of the views that raise 404
+    # when empty (raise_404_if_empty) and gives the pagination total.
+    # The stats of the listings (get_listing()) are cached
+    # (recipes/listings.py): those requests run no aggregate at all.
+
+    raise_404_if_empty = False
 
-        return recipes_list
+    # False when get_validators_queryset() is not the view queryset:
+    # its total can not be used as the view total
+    validators_use_view_queryset = True
+
+    queryset_total = None
+
+    # False to the lists (see make_validators): only the ETag is sent
+    use_last_modified = True
+
+    def get_validators_queryset(self):
+        return self.get_queryset()
+
+    def get_listing(self):
+        # Listing of get_validators_queryset() in the listing stats cache.
+        # None = not cached
+        return None
+
+    def get_validators(self, stats):
+        return make_validators(
+            stats,
+            self.__class__.__name__,
+            sorted(self.kwargs.items()),
+            sorted(self.request.GET.lists()),
+            translation.get_language(),
+            PER_PAGE,
+            self.request.user.pk,
+            use_last_modified=self.use_last_modified,
+        )
 
+    def get(self, request, *args, **kwargs):
+        # Responses with flash messages are displayed only once
+        if len(get_messages(request)):
+            # LIMIT 1 probe, instead of evaluating the whole queryset
+            if (self.raise_404_if_empty and
+                    not self.get_queryset().exists()):
+                raise Http404()
+            return super().get(request, *args, **kwargs)
 
-class RecipeListViewBase(ListView):
+        stats = get_listing_stats(
+            self.get_listing(), self.get_validators_queryset())
+
+        if self.validators_use_view_queryset:
+            self.queryset_total = stats['total']
+            if self.raise_404_if_empty and not self.queryset_total:
+                raise Http404()
+
+        self.etag, self.last_modified = self.get_validators(stats)
+
+        return make_conditional_response(
+            request, self.etag, self.last_modified,
+            lambda: super(RecipeConditionalGetMixin, self).get(
+                request, *args, **kwargs))
+
+
+class RecipeListViewBase(RecipeConditionalGetMixin, ListView):
 
     # Base View to all recipes views
     # Holds the default conf
@@ -154,6 +276,9 @@ class RecipeListViewBase(ListView):
     model = Recipe
     context_object_name = 'recipes'
 
+    # max(update_at) of a list is not monotonic: ETag only
+    use_last_modified = False
+
     # paginate_by = None because I am using the utils/pagination.py
     # that was created in the course
     paginate_by = None
@@ -161,11 +286,85 @@ class RecipeListViewBase(ListView):
     # Order the data by descending ids
     ordering = ['-id']
 
+    # 'offset' or 'keyset'. See utils/pagination.py
+    pagination_mode = PAGINATION_MODE
+
+    # The HTML list pages read the denormalized cards (RecipeCard, kept
+    # in sync by recipes/signals.py): a single query without joins or
+    # prefetches. The JSON views and the filters that need the relations
+    # (search, tags) read Recipe.
+    use_recipe_cards = True
+
+    # (page_obj, pagination_range) already computed before
+    # get_context_data() (the async views fetch the page with the async
+    # ORM, recipes/views/site_async.py). None = computed there.
+    pagination = None
+
+    # Rendered pages are kept in the page cache (utils/cache.py) and
+    # dropped by recipes/signals.py when a published recipe changes.
+    # Only anonymous requests without pending messages use it: the menu,
+    # the logout form (csrf token) and the messages are user specific.
+    def can_use_page_cache(self):
+        return (
+            page_cache.is_enabled()
+            and self.request.method == 'GET'
+            and not self.request.user.is_authenticated
+            and not len(get_messages(self.request))
+        )
+
+    # Every published recipe. The subclasses filtering the queryset
+    # override it
+    def get_listing(self):
+        return HOME_LISTING
+
+    def get_page_cache_key(self):
+        return page_cache.make_key(
+            self.__class__.__name__,
+            sorted(self.kwargs.items()),
+            self.request.GET.get('page', '1'),
+            sorted(self.request.GET.lists()),
+            translation.get_language(),
+            PER_PAGE,
+            self.pagination_mode,
+        )
+
+    def get(self, request, *args, **kwargs):
+        if not self.can_use_page_cache():
+            return super().get(request, *args, **kwargs)
+
+        cache_key = self.get_page_cache_key()
+        cached_page = page_cache.get(cache_key)
+
+        if cached_page is not None:
+            content, content_type, etag, last_modified = cached_page
+            return make_conditional_response(
+                request, etag, last_modified,
+                lambda: HttpResponse(content, content_type=content_type))
+
+        response = super().get(request, *args, **kwargs)
+
+        # TemplateResponse is lazy. Rendering it here allows to cache
+        # the final html
+        if hasattr(response, 'render'):
+            response.render()
+
+        if response.status_code == 200 and not response.streaming:
+            page_cache.set(cache_key, (
+                response.content, response['Content-Type'],
+                self.etag, self.last_modified))
+
+        return response
+
     # get_querysey -> to manipulate the queryset
     # Here it is required to filter the unpublished recipes
 
     def get_queryset(self, *args, **kwargs):
 
+        if self.use_recipe_cards:
+            return RecipeCard.objects.filter(
+                is_published=True
+            ).order_by(*self.ordering)
+
         # Getting the queryset super()
         qs = super().get_queryset(*args, **kwargs)
 
@@ -177,8 +376,8 @@ class RecipeListViewBase(ListView):
         # Performance boost; returns a queryset that will follow
         # foreign key relationships selecting additional related-object
         # data when it executes its query.
-        qs = qs.select_related('author', 'category')
-        qs = qs.prefetch_related('tags', 'author__profile')
+        qs = qs.select_related('author', 'author__profile', 'category')
+        qs = qs.prefetch_related('tags')
 
         # Returning the new super().get_queryset
         return qs
@@ -206,8 +405,11 @@ class RecipeListViewBase(ListView):
         #       navigation? (boolean)
         # last_page_out_of_range: Is the last page out of range in
         #       navigation? (boolean)
-        page_obj, pagination_range = make_pagination(
-            self.request, ctx.get('recipes'), PER_PAGE)
+        # queryset_total -> known from the validators query (no COUNT(*))
+        page_obj, pagination_range = self.pagination or make_pagination(
+            self.request, ctx.get('recipes'), PER_PAGE,
+            mode=self.pagination_mode, approximate_total=True,
+            total=self.queryset_total)
 
         # Getting the browser language
         html_language = translation.get_language()
@@ -232,7 +434,7 @@ class RecipeListViewHome(RecipeListViewBase):
     template_name = 'recipes/pages/home.html'
 
 
-class RecipeListViewHomeAPI(RecipeListViewHome):
+class RecipeListViewHomeAPI(RecipeStreamMixin, RecipeListViewHome):
     # View to be used as API, returning JSON with home data
     def render_to_response(self, context, **response_kwargs):
         # Overwriting render_to_response() to return the JSON
@@ -244,7 +446,7 @@ class RecipeListViewHomeAPI(RecipeListViewHome):
         # to search to the specific context.
         # Detail view uses recipe (singular)
         # and the remaining views use recipes (plural)
-        recipes = get_recipes(self, is_detailed=False)
+        recipes = get_recipes(self, is_detailed=False, context=context)
 
         return JsonResponse(
             recipes,
@@ -252,12 +454,20 @@ class RecipeListViewHomeAPI(RecipeListViewHome):
         )
 
 
+class RecipeExportAPI(RecipeStreamMixin, RecipeListViewBase):
+    # View to export every published recipe as a stream.
+    # NDJSON by default, ?stream=1 to a JSON array
+    default_stream_format = 'ndjson'
+
+
 class RecipeListViewCategory(RecipeListViewBase):
     # template_name -> required because django uses
     #     f'{context_object_name}_list.html'
     # If this is not the template's name, change here
     template_name = 'recipes/pages/category.html'
 
+    raise_404_if_empty = True
+
     def get_queryset(self, *args, **kwargs):
         # Overwriting the get_queryset method
         # It calls the RecipeListViewBase get_queryset
@@ -267,17 +477,18 @@ class RecipeListViewCategory(RecipeListViewBase):
         # Here the is_published is added to the filter
         # only as a guarantee (It is used in super().get_queryset)
         # Empty queryset is treated as error and raises 404
+        # (raise_404_if_empty, checked once by RecipeConditionalGetMixin)
         qs = super().get_queryset(*args, **kwargs)
 
         qs = qs.filter(
             is_published=True,
             category_id=self.kwargs.get('category_id')
         )
-        # If the returned queryset is empty, raises 404
-        if not qs:
-            raise Http404()
         return qs
 
+    def get_listing(self):
+        return category_listing(self.kwargs.get('category_id'))
+
     def get_context_data(self, *args, **kwargs):
         # Overwriting get_context_data to create page title
         # based on the category required
@@ -286,16 +497,23 @@ class RecipeListViewCategory(RecipeListViewBase):
         # to change the page title
         ctx = super().get_context_data(*args, **kwargs)
 
+        recipes = ctx.get('recipes')
         category_translation = _('Category')
+
+        # Lazy: only the pages that display the title read the first
+        # recipe (the JSON views serialize the page with values())
+        def get_title():
+            return (f"{recipes[0].category_name} - "
+                    f"{category_translation} |")
+
         ctx.update({
-            'title': f"{ctx.get('recipes')[0].category.name} - "
-            f"{category_translation} |"
+            'title': lazy(get_title, str)()
         })
 
         return ctx
 
 
-class RecipeListViewCategoryAPI(RecipeListViewCategory):
+class RecipeListViewCategoryAPI(RecipeStreamMixin, RecipeListViewCategory):
     # Overwriting render_to_response() to return the JSON with requested data.
     # This logic was moved to method get_recipes() to avoid repetition
     # and to let the view code cleaner.
@@ -304,7 +522,7 @@ class RecipeListViewCategoryAPI(RecipeListViewCategory):
     # recipes (plural)
     def render_to_response(self, context, **response_kwargs):
 
-        recipes = get_recipes(self)
+        recipes = get_recipes(self, context=context)
 
         return JsonResponse(
             recipes,
@@ -318,6 +536,32 @@ class RecipeListViewSearch(RecipeListViewBase):
     # If this is not the template's name, change here
     template_name = 'recipes/pages/search.html'
 
+    # The results are ordered by relevance, not by id, so they can not be
+    # paginated by keyset
+    pagination_mode = 'offset'
+
+    # The search backend filters Recipe
+    use_recipe_cards = False
+
+    # The validators use every published recipe: the search results
+    # change only when a published recipe changes, and this avoids
+    # running the search twice
+    validators_use_view_queryset = False
+
+    def get_validators_queryset(self):
+        return Recipe.objects.filter(is_published=True)
+
+    def get_listing(self):
+        return HOME_LISTING
+
+    def get_search_term(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_search_base_queryset(self, *args, **kwargs):
+        # Published recipes, before the search
+        qs = super().get_queryset(*args, **kwargs)
+        return qs.filter(is_published=True)
+
     def get_queryset(self, *args, **kwargs):
         # Overwriting the get_queryset method
         # It calls the RecipeListViewBase get_queryset
@@ -327,16 +571,27 @@ class RecipeListViewSearch(RecipeListViewBase):
         # Here the is_published is added to the filter
         # only as a guarantee (It is used in super().get_queryset)
         # Empty queryset is treated as error and raises 404
-        qs = super().get_queryset(*args, **kwargs)
-        search_term = self.request.GET.get('q', '').strip()
-
-        qs = qs.filter(
-            Q(
-                Q(title__icontains=search_term) | Q(
-                    description__icontains=search_term)),
-            is_published=True,)
-
-        return qs
+        # The search itself is done by the configured search backend
+        # (recipes/search.py), which also orders the results by relevance
+        qs = self.get_search_base_queryset(*args, **kwargs)
+
+        return get_search_backend().search(qs, self.get_search_term())
+
+    def get_results_limit_context(self, ctx):
+        # The backend returns at most max_results recipes: the page says
+        # so when the results reached it. The total is the one of the
+        # pagination (no new query)
+        max_results = get_search_backend().max_results
+        paginator = getattr(ctx['recipes'], 'paginator', None)
+        total = (paginator.count if paginator is not None
+                 else ctx['pagination_range'].get('approximate_total'))
+
+        return {
+            'max_results': max_results,
+            'search_results_limited': (
+                max_results is not None and total is not None and
+                total >= max_results),
+        }
 
     def get_context_data(self, *args, **kwargs):
         # Overwriting get_context_data to create page title
@@ -348,7 +603,7 @@ class RecipeListViewSearch(RecipeListViewBase):
         # If no search term is passed, raises a 404 error
         ctx = super().get_context_data(*args, **kwargs)
 
-        search_term = self.request.GET.get('q', '').strip()
+        search_term = self.get_search_term()
 
         if not search_term:
             raise Http404()
@@ -356,13 +611,14 @@ class RecipeListViewSearch(RecipeListViewBase):
         ctx.update({
             'page_title': f'{prev_page_title} "{ search_term }"',
             'search_term': search_term,
-            'additional_url_query': f'&q={search_term}'
+            'additional_url_query': f'&q={search_term}',
+            **self.get_results_limit_context(ctx),
         })
 
         return ctx
 
 
-class RecipeListViewSearchAPI(RecipeListViewSearch):
+class RecipeListViewSearchAPI(RecipeStreamMixin, RecipeListViewSearch):
     # Overwriting render_to_response() to return the JSON with requested data.
     # This logic was moved to method get_recipes() to avoid repetition
     # and to let the view code cleaner.
@@ -371,7 +627,7 @@ class RecipeListViewSearchAPI(RecipeListViewSearch):
     # recipes (plural)
     def render_to_response(self, context, **response_kwargs):
 
-        recipes = get_recipes(self)
+        recipes = get_recipes(self, context=context)
 
         return JsonResponse(
             recipes,
@@ -379,7 +635,7 @@ class RecipeListViewSearchAPI(RecipeListViewSearch):
         )
 
 
-class RecipeDetail(DetailView):
+class RecipeDetail(RecipeConditionalGetMixin, DetailView):
     # Define the model (require to DetailView)
     model = Recipe
 
@@ -391,6 +647,8 @@ class RecipeDetail(DetailView):
     # If this is not the template's name, change here
     template_name = 'recipes/pages/recipe-view.html'
 
+    raise_404_if_empty = True
+
     def get_queryset(self, *args, **kwargs):
         # get_querysey -> to manipulate the queryset
         # Here it is required to filter the unpublished recipes out of
@@ -398,16 +656,17 @@ class RecipeDetail(DetailView):
         # and uses the pk to filter the recipes, keeping
         # only the desired one
         # If no recipe is found with that pk,
-        # raises 404
+        # raises 404 (raise_404_if_empty)
+        # The relations rendered by the page are fetched in the same
+        # query (tags in a second one)
         qs = super().get_queryset(*args, **kwargs)
 
         qs = qs.filter(
             id=self.kwargs.get('pk'),
             is_published=True
-        )
-
-        if not qs:
-            raise Http404()
+        ).select_related(
+            'author', 'author__profile', 'category'
+        ).prefetch_related('tags')
 
         return qs
 
@@ -425,6 +684,12 @@ class RecipeDetail(DetailView):
 
 
 class RecipeDetailAPI(RecipeDetail):
+
+    def get_queryset(self, *args, **kwargs):
+        # The tag names are read by get_recipes() in one query: the tags
+        # prefetched to the HTML page are not needed
+        return super().get_queryset(*args, **kwargs).prefetch_related(None)
+
     # Overwriting render_to_response() to return the JSON with requested data.
     # This logic was moved to method get_recipes() to avoid repetition
     # and to let the view code cleaner.
@@ -432,7 +697,7 @@ class RecipeDetailAPI(RecipeDetail):
     # context. Detail view uses recipe (singular) and the remaining views use
     # recipes (plural)
     def render_to_response(self, context, **response_kwargs):
-        recipe = get_recipes(self, is_detailed=True)
+        recipe = get_recipes(self, is_detailed=True, context=context)
 
         return JsonResponse(
             recipe,
@@ -446,24 +711,55 @@ class RecipeListViewTag(RecipeListViewBase):
     # If this is not the template's name, change here
     template_name = 'recipes/pages/tag.html'
 
+    # The tags are filtered by the relation
+    use_recipe_cards = False
+
+    # Tags of the url name, read once per request (get_tags()) and used
+    # by both the filter and the title. None = not read yet
+    tags = None
+
     def get_queryset(self, *args, **kwargs):
         # get_querysey -> to manipulate the queryset
-        # Filter the recipes that have the same tag as passed
-        # by url
+        # Filter the recipes that have the tag passed by url.
+        # Tag names are not unique: the recipes of every tag with the
+        # name are selected by a semi join on the m2m table (its
+        # (tag_id, recipe_id) index), so a recipe is never repeated
         qs = super().get_queryset(*args, **kwargs)
 
-        qs = qs.filter(tags__name=self.kwargs.get('tag_name', ''))
+        tag_ids = [tag.pk for tag in self.get_tags()]
+        if not tag_ids:
+            # Unknown tag: no query at all
+            return qs.none()
+
+        qs = qs.filter(pk__in=Recipe.tags.through.objects.filter(
+            tag_id__in=tag_ids).values('recipe_id'))
 
         return qs
 
+    def get_listing(self):
+        return tag_listing(self.kwargs.get('tag_name', ''))
+
+    def get_tag_queryset(self):
+        # Tag.name is indexed
+        return Tag.objects.filter(
+            name=self.kwargs.get('tag_name', '')).order_by('pk')
+
+    def get_tags(self):
+        if self.tags is None:
+            self.tags = list(self.get_tag_queryset())
+        return self.tags
+
+    def get_tag(self):
+        tags = self.get_tags()
+        return tags[0] if tags else None
+
     def get_context_data(self, *args, **kwargs):
         # Overwriting get_context_data to create page title
         # based on the tag name required
 
         ctx = super().get_context_data(*args, **kwargs)
 
-        tag = Tag.objects.filter(
-            name=self.kwargs.get('tag_name', '')).first()
+        tag = self.get_tag()
 
         if not tag:
             page_title = 'No recipes found'
@@ -478,21 +774,18 @@ class RecipeListViewTag(RecipeListViewBase):
         return ctx
 
 
-class RecipeListViewTagAPI(RecipeListViewTag):
+class RecipeListViewTagAPI(RecipeStreamMixin, RecipeListViewTag):
+
+    # Unknown tags (or tags without recipes) raise 404
+    raise_404_if_empty = True
 
-    def get_queryset(self, *args, **kwargs):
-        qs = super().get_queryset(*args, **kwargs)
-        if not qs:
-            raise Http404()
-        else:
-            return qs
     # Overwriting render_to_response() to return the JSON with requested data.
     # This logic was moved to method get_recipes() to avoid repetition
     # and to let the view code cleaner.
 
     def render_to_response(self, context, **response_kwargs):
 
-        recipes = get_recipes(self)
+        recipes = get_recipes(self, context=context)
 
         return JsonResponse(
             recipes,
@@ -0,0 +1,326 @@
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.db.models import QuerySet
+from django.http import Http404, HttpResponse, JsonResponse
+
+from recipes.listings import aget_listing_stats
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+from utils.cache import page_cache
+from utils.conditional import amake_conditional_response
+from utils.pagination import amake_pagination
+from utils.profiling import record_time
+from utils.streaming import (
+    abatched, get_stream_format,
+    make_streaming_json_response)
+
+from . import site
+from .site import (
+    RECIPE_JSON_FIELDS, get_tag_links, recipe_to_row,
+    serialize_recipes)
+
+# ASYNC VIEWS
+# Native async versions of the read only views of site.py, used when the
+# project is served by project.asgi (ASYNC_VIEWS=1, see recipes/urls.py).
+# The queries use the async ORM (aaggregate, acount, aget, async for) and
+# the page cache uses the async cache API, so an ASGI worker keeps
+# serving other requests while one waits for the database or for a slow
+# client, instead of holding a thread per request.
+#
+# The views have the same names as in site.py and reuse their querysets,
+# validators and context. Still run in a thread (sync_to_async): the
+# first read of the session (user and flash messages), the template
+# rendering and the keyset pages.
+
+
+def load_request_state(request):
+    # The user and the flash messages are read from the session (database)
+    # the first time they are used. Reading them here, in one thread hop,
+    # allows the async code to use them.
+    return request.user.is_authenticated, len(get_messages(request))
+
+
+async def aget_tag_names(recipe_ids):
+    # Async version of site.get_tag_names()
+    tag_names = defaultdict(list)
+
+    async for recipe_id, tag_name in get_tag_links(recipe_ids):
+        tag_names[recipe_id].append(tag_name)
+
+    return tag_names
+
+
+async def aget_recipe_rows(recipes):
+    # Async version of site.get_recipe_rows()
+    object_list = getattr(recipes, 'object_list', recipes)
+
+    if isinstance(object_list, QuerySet):
+        rows = object_list.values(*RECIPE_JSON_FIELDS)
+        return [row async for row in rows]
+
+    return [recipe_to_row(recipe) for recipe in object_list]
+
+
+async def aget_recipes(self, context, is_detailed=False):
+    # Async version of site.get_recipes()
+    if is_detailed:
+        rows = [recipe_to_row(context['recipe'])]
+    else:
+        rows = await aget_recipe_rows(context['recipes'])
+
+    tag_names = (
+        await aget_tag_names([row['id'] for row in rows]) if rows else {})
+
+    with record_time('serializer'):
+        recipes_list = serialize_recipes(self, rows, tag_names)
+
+    if is_detailed:
+        return recipes_list[0]
+    return recipes_list
+
+
+async def aiter_recipes_json(self, queryset):
+    # Async version of site.iter_recipes_json()
+    rows = queryset.prefetch_related(None).values(
+        *RECIPE_JSON_FIELDS).aiterator(chunk_size=site.STREAM_CHUNK_SIZE)
+
+    async for batch in abatched(rows, site.STREAM_CHUNK_SIZE):
+        tag_names = await aget_tag_names([row['id'] for row in batch])
+        for recipe in serialize_recipes(self, batch, tag_names):
+            yield recipe
+
+
+class AsyncRecipeConditionalGetMixin:
+
+    # Async version of site.RecipeConditionalGetMixin.get()
+    # aget_response() builds the response when the client does not have
+    # the current version
+
+    has_messages = False
+
+    async def aload_request_state(self):
+        _, messages = await sync_to_async(load_request_state)(self.request)
+        self.has_messages = bool(messages)
+
+    async def get(self, request, *args, **kwargs):
+        await self.aload_request_state()
+        return await self.aget_conditional_response(
+            request, *args, **kwargs)
+
+    async def aget_conditional_response(self, request, *args, **kwargs):
+        # Responses with flash messages are displayed only once
+        if self.has_messages:
+            if (self.raise_404_if_empty and
+                    not await self.get_queryset().aexists()):
+                raise Http404()
+            return await self.aget_response(request, *args, **kwargs)
+
+        stats = await aget_listing_stats(
+            self.get_listing(), self.get_validators_queryset())
+
+        if self.validators_use_view_queryset:
+            self.queryset_total = stats['total']
+            if self.raise_404_if_empty and not self.queryset_total:
+                raise Http404()
+
+        self.etag, self.last_modified = self.get_validators(stats)
+
+        return await amake_conditional_response(
+            request, self.etag, self.last_modified,
+            lambda: self.aget_response(request, *args, **kwargs))
+
+    async def aget_response(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def arender_to_response(self, context):
+        # TemplateResponse is rendered later by the handler
+        return self.render_to_response(context)
+
+
+class AsyncRecipeListViewMixin(AsyncRecipeConditionalGetMixin):
+
+    # Async version of site.RecipeListViewBase.get() (page cache) and
+    # ListView.get()
+
+    # False keeps the page as a lazy queryset (read by the JSON views
+    # with values())
+    evaluate_page = True
+
+    async def get(self, request, *args, **kwargs):
+        await self.aload_request_state()
+
+        if not self.can_use_page_cache():
+            return await self.aget_conditional_response(
+                request, *args, **kwargs)
+
+        cache_key = self.get_page_cache_key()
+        cached_page = await page_cache.aget(cache_key)
+
+        if cached_page is not None:
+            content, content_type, etag, last_modified = cached_page
+
+            async def aget_cached_response():
+                return HttpResponse(content, content_type=content_type)
+
+            return await amake_conditional_response(
+                request, etag, last_modified, aget_cached_response)
+
+        response = await self.aget_conditional_response(
+            request, *args, **kwargs)
+
+        # TemplateResponse is lazy. Rendering it here allows to cache
+        # the final html
+        if hasattr(response, 'render'):
+            await sync_to_async(response.render)()
+
+        if response.status_code == 200 and not response.streaming:
+            await page_cache.aset(cache_key, (
+                response.content, response['Content-Type'],
+                self.etag, self.last_modified))
+
+        return response
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def aget_context_data(self, **kwargs):
+        # The page is fetched here, get_context_data() does not run
+        # any query
+        self.pagination = await amake_pagination(
+            self.request, self.object_list, site.PER_PAGE,
+            mode=self.pagination_mode, approximate_total=True,
+            total=self.queryset_total, evaluate=self.evaluate_page)
+
+        return self.get_context_data(**kwargs)
+
+    async def aget_response(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        context = await self.aget_context_data()
+        return await self.arender_to_response(context)
+
+
+class AsyncRecipeJSONListMixin:
+
+    # Async version of the render_to_response() of the JSON list views
+
+    evaluate_page = False
+
+    async def arender_to_response(self, context):
+        recipes = await aget_recipes(self, context)
+
+        return JsonResponse(
+            recipes,
+            safe=False
+        )
+
+
+class AsyncRecipeStreamMixin:
+
+    # Async version of site.RecipeStreamMixin
+
+    async def get(self, request, *args, **kwargs):
+        stream_format = (
+            get_stream_format(request) or self.default_stream_format)
+
+        if stream_format is None:
+            return await super().get(request, *args, **kwargs)
+
+        self.object_list = await self.aget_queryset()
+
+        if (getattr(self, 'raise_404_if_empty', False) and
+                not await self.object_list.aexists()):
+            raise Http404()
+
+        return make_streaming_json_response(
+            aiter_recipes_json(self, self.object_list), stream_format)
+
+
+class RecipeListViewHome(AsyncRecipeListViewMixin, site.RecipeListViewHome):
+    pass
+
+
+class RecipeListViewHomeAPI(AsyncRecipeStreamMixin, AsyncRecipeJSONListMixin,
+                            AsyncRecipeListViewMixin,
+                            site.RecipeListViewHomeAPI):
+    pass
+
+
+class RecipeExportAPI(AsyncRecipeStreamMixin, AsyncRecipeListViewMixin,
+                      site.RecipeExportAPI):
+    pass
+
+
+class RecipeListViewCategory(AsyncRecipeListViewMixin,
+                             site.RecipeListViewCategory):
+    pass
+
+
+class RecipeListViewCategoryAPI(AsyncRecipeStreamMixin,
+                                AsyncRecipeJSONListMixin,
+                                AsyncRecipeListViewMixin,
+                                site.RecipeListViewCategoryAPI):
+    pass
+
+
+class RecipeListViewSearch(AsyncRecipeListViewMixin,
+                           site.RecipeListViewSearch):
+
+    async def aget_queryset(self):
+        # The search backend reads its index with the async ORM
+        return await get_search_backend().asearch(
+            self.get_search_base_queryset(), self.get_search_term())
+
+
+class RecipeListViewSearchAPI(AsyncRecipeStreamMixin,
+                              AsyncRecipeJSONListMixin,
+                              RecipeListViewSearch,
+                              site.RecipeListViewSearchAPI):
+    pass
+
+
+class RecipeDetail(AsyncRecipeConditionalGetMixin, site.RecipeDetail):
+
+    async def aget_response(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget()
+        except Recipe.DoesNotExist:
+            raise Http404()
+
+        context = self.get_context_data(object=self.object)
+        return await self.arender_to_response(context)
+
+
+class RecipeDetailAPI(RecipeDetail, site.RecipeDetailAPI):
+
+    async def arender_to_response(self, context):
+        recipe = await aget_recipes(self, context, is_detailed=True)
+
+        return JsonResponse(
+            recipe,
+            safe=False
+        )
+
+
+class RecipeListViewTag(AsyncRecipeListViewMixin, site.RecipeListViewTag):
+
+    async def aget_tags(self):
+        # get_tags() is called by the sync get_queryset(): the tags are
+        # read here first, with the async ORM
+        if self.tags is None:
+            self.tags = [tag async for tag in self.get_tag_queryset()]
+        return self.tags
+
+    async def aload_request_state(self):
+        await super().aload_request_state()
+        await self.aget_tags()
+
+    async def aget_queryset(self):
+        await self.aget_tags()
+        return await super().aget_queryset()
+
+
+class RecipeListViewTagAPI(AsyncRecipeStreamMixin, AsyncRecipeJSONListMixin,
+                           RecipeListViewTag, site.RecipeListViewTagAPI):
+    pass
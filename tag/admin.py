@@ -5,7 +5,7 @@ from .models import Tag
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'slug')
+    list_display = ('id', 'name', 'slug', 'published_recipe_count')
     list_display_links = ('id', 'slug')
 
     search_fields = ('id', 'name', 'slug')
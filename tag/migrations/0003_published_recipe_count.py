@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tag', '0002_remove_tag_content_type_remove_tag_object_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='published_recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
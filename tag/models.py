@@ -4,20 +4,33 @@ from django.utils.text import slugify
 from django.db import models
 
 
+def make_tag_slug(name, random=None):
+    # Tag names are not unique: 5 random letters make the slug unique.
+    # random -> random.Random() to the bulk imports (SystemRandom by
+    # default)
+    rand_letters = ''.join(
+        (random or SystemRandom()).choices(
+            string.ascii_letters + string.digits,
+            k=5
+        )
+    )
+    return slugify(f'{name}-{rand_letters}')
+
+
 # Create your models here.
 class Tag(models.Model):
-    name = models.CharField(max_length=255)
+    # Indexed: the tag pages look the tags up by name
+    name = models.CharField(max_length=255, db_index=True)
     slug = models.SlugField(unique=True)
 
+    # Number of published recipes with the tag. Kept by
+    # recipes/counters.py (signals) and 'manage.py rebuild_recipe_counters'
+    published_recipe_count = models.PositiveIntegerField(
+        default=0, editable=False)
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            rand_letters = ''.join(
-                SystemRandom().choices(
-                    string.ascii_letters + string.digits,
-                    k=5
-                )
-            )
-            self.slug = slugify(f'{self.name}-{rand_letters}')
+            self.slug = make_tag_slug(self.name)
         return super().save(*args, **kwargs)
 
     def __str__(self):
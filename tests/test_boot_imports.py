@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from django.test import SimpleTestCase
+from django.urls import resolve, reverse
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Heavy dependencies that a booting worker must not import
+# (utils/lazy_imports.py, benchmarks/boot.py)
+LAZY_MODULES = ('PIL.Image', 'rest_framework.views', 'faker')
+
+BOOT_CODE = '''
+import json, sys
+import django
+django.setup()
+
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+
+get_wsgi_application()
+get_resolver().url_patterns
+print(json.dumps(sorted(set(sys.argv[1:]) & set(sys.modules))))
+'''
+
+
+class BootImportsTest(SimpleTestCase):
+
+    def test_boot_does_not_import_heavy_dependencies(self):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'project.settings',
+            'SETTINGS_PROFILE': 'prod',
+        }
+        output = subprocess.run(
+            [sys.executable, '-c', BOOT_CODE, *LAZY_MODULES],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True,
+            check=True,
+        ).stdout
+
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [])
+
+    def test_drf_views_are_routed_lazily(self):
+        view = resolve(reverse('recipes:recipes_api_v2')).func
+
+        self.assertEqual(
+            view.lazy_view_path, 'recipes.views.api.recipe_api_list')
+        self.assertTrue(view.csrf_exempt)
@@ -0,0 +1,68 @@
+from django.test import TransactionTestCase
+
+from project.asgi import application as asgi_application
+from project.wsgi import application as wsgi_application
+from utils import loadtest
+from utils.recipes.factory import seed_recipes
+
+
+class LoadTestScenariosTest(TransactionTestCase):
+
+    # The virtual users run in other threads: the data must be committed.
+    # One user at a time: the in-memory test database locks whole tables.
+    def setUp(self):
+        seeded = seed_recipes(qty=12, authors=2, seed=1)
+        self.dataset = loadtest.get_dataset([
+            (author.username, 'P@ssw0rd') for author in seeded['authors']
+        ])
+        loadtest.install_query_counter()
+        return super().setUp()
+
+    def assertReport(self, results):
+        samples = [sample for result in results for sample in result[0]]
+        report = loadtest.make_report(
+            samples, sum(result[1] for result in results))
+
+        self.assertEqual(report['total']['errors'], 0, samples)
+        self.assertGreater(report['total']['rps'], 0)
+        self.assertGreater(report['total']['queries_per_request'], 0)
+        self.assertEqual(
+            set(report['scenarios']), set(loadtest.DEFAULT_MIX))
+
+    # TEST if every scenario runs against the WSGI application
+    def test_load_test_wsgi_runs_every_scenario(self):
+        transport = loadtest.WSGITransport(wsgi_application)
+
+        self.assertReport([
+            loadtest.run_sync(
+                transport, self.dataset, {name: 1}, users=1, iterations=2)
+            for name in loadtest.SCENARIOS
+        ])
+
+    # TEST if every scenario runs against the ASGI application
+    def test_load_test_asgi_runs_every_scenario(self):
+        transport = loadtest.ASGITransport(asgi_application)
+
+        self.assertReport([
+            loadtest.run_async(
+                transport, self.dataset, {name: 1}, users=1, iterations=2)
+            for name in loadtest.SCENARIOS
+        ])
+
+    # TEST if the dashboard saves create recipes
+    def test_load_test_dashboard_save_creates_recipe(self):
+        from recipes.models import Recipe
+
+        loadtest.run_sync(
+            loadtest.WSGITransport(wsgi_application), self.dataset,
+            {'dashboard_save': 1}, users=1, iterations=2)
+
+        self.assertEqual(
+            Recipe.objects.filter(title__startswith='Load test').count(), 2)
+
+    # TEST if the mix string is parsed and validated
+    def test_load_test_parse_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix('home=3, detail'), {'home': 3, 'detail': 1})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('unknown=1')
@@ -0,0 +1,70 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from utils.budgets import (ROUTE_BUDGETS, RouteRequest, get_named_routes,
+                           get_route_requests, run_route_budgets)
+from utils.recipes.factory import seed_recipes
+
+
+class RouteBudgetsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_recipes(qty=40, seed=1)
+        return super().setUpTestData()
+
+    # TEST if every named route has a budget and a request
+    def test_every_named_route_has_a_budget(self):
+        routes = get_named_routes()
+
+        self.assertEqual(sorted(ROUTE_BUDGETS), routes)
+        self.assertEqual(sorted(get_route_requests(self.dataset)), routes)
+
+    # TEST if every route is inside its query and time budgets
+    def test_routes_are_inside_their_budgets(self):
+        report = run_route_budgets(self.client, self.dataset, repeats=3)
+
+        failures = {
+            route: result for route, result in report['routes'].items()
+            if not result['ok']
+        }
+        self.assertEqual(failures, {}, json.dumps(failures, indent=2))
+
+    # TEST if the form routes are measured with valid POSTs (the write
+    # paths), and if an error status is over the budget
+    def test_form_routes_post_valid_data(self):
+        requests = get_route_requests(self.dataset)
+        report = run_route_budgets(
+            self.client, self.dataset, repeats=1, budgets={
+                route: {'queries': 1000, 'p95_ms': 10_000}
+                for route in requests})
+        routes = report['routes']
+
+        for route, location in (
+            ('authors:register_create', reverse('authors:login')),
+            ('authors:login_auth', reverse('authors:dashboard')),
+            ('authors:dashboard_recipe_new', reverse('authors:dashboard')),
+            ('authors:dashboard_recipe', reverse('authors:dashboard')),
+            ('authors:dashboard_delete_recipe', reverse('authors:dashboard')),
+        ):
+            with self.subTest(route=route):
+                self.assertEqual(routes[route]['method'], 'POST')
+                self.assertEqual(routes[route]['status'], 302)
+                self.assertEqual(routes[route]['location'], location)
+
+        self.assertTrue(User.objects.filter(
+            username__startswith='budget_').exists())
+        self.assertIsNotNone(
+            User.objects.get(pk=self.dataset['authors'][0].pk).last_login)
+
+        missing = {'authors:missing': RouteRequest(
+            reverse('recipes:recipe', kwargs={'pk': 987654}))}
+        with patch('utils.budgets.get_route_requests', return_value=missing):
+            report = run_route_budgets(
+                self.client, self.dataset, repeats=1,
+                budgets={'authors:missing': {'queries': 1000}})
+        self.assertFalse(report['routes']['authors:missing']['ok'])
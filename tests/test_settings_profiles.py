@@ -0,0 +1,36 @@
+import os
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from django.urls import NoReverseMatch, reverse
+
+from project.settings.profiles import PROFILES, get_settings_profile
+
+
+class SettingsProfilesTest(SimpleTestCase):
+
+    def test_settings_profile_is_test_under_the_test_runner(self):
+        self.assertEqual(settings.SETTINGS_PROFILE, 'test')
+        self.assertNotIn('debug_toolbar', settings.INSTALLED_APPS)
+        self.assertNotIn(
+            'debug_toolbar.middleware.DebugToolbarMiddleware',
+            settings.MIDDLEWARE)
+
+    def test_settings_profile_does_not_route_the_debug_toolbar(self):
+        with self.assertRaises(NoReverseMatch):
+            reverse('djdt:render_panel')
+
+    def test_settings_profile_from_environment(self):
+        with patch.dict(os.environ, {'SETTINGS_PROFILE': 'prod'}):
+            self.assertEqual(get_settings_profile(), 'prod')
+
+    def test_settings_profile_must_exist(self):
+        with patch.dict(os.environ, {'SETTINGS_PROFILE': 'staging'}):
+            with self.assertRaises(ImproperlyConfigured):
+                get_settings_profile()
+
+    def test_settings_prod_profile_adds_nothing(self):
+        self.assertEqual(
+            PROFILES['prod'], {'apps': [], 'middleware': [], 'urls': []})
@@ -0,0 +1,292 @@
+import itertools
+import json
+import math
+import statistics
+import time
+from typing import Callable, NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authors import urls as authors_urls
+from recipes import urls as recipes_urls
+from utils.cache import page_cache
+from utils.recipes.factory import SEEDED_PASSWORD
+
+# ROUTE BUDGETS
+# Maximum number of queries and p95 time (ms) of every named route of
+# recipes.urls and authors.urls, measured against a dataset seeded by
+# utils/recipes/factory.py (seed_recipes). The caches are cleared before
+# each request: the budgets are the cold (worst case) numbers.
+# The query budgets must not depend on the dataset size: a budget that
+# has to grow with the number of recipes is an N+1 regression.
+# The form routes are measured with a POST of valid data (the write
+# paths: login, register, dashboard save and delete). A route that does
+# not answer 2xx/3xx is over its budget.
+#
+# Used by tests/test_route_budgets.py and benchmarks/route_budgets.py
+# (machine readable report, to be compared between releases).
+
+DEFAULT_P95_MS = 500
+PASSWORD_P95_MS = 1500
+
+ROUTE_BUDGETS = {
+    'recipes:home': {'queries': 2},
+    # search: stats row, document frequencies and ranked ids (BM25 in SQL)
+    'recipes:search': {'queries': 7},
+    'recipes:category': {'queries': 2},
+    'recipes:recipe': {'queries': 3},
+    'recipes:tag': {'queries': 4},
+    'recipes:recipes_api_v1': {'queries': 3},
+    'recipes:recipes_export_api_v1': {'queries': 2},
+    'recipes:recipe_api_v1': {'queries': 3},
+    'recipes:category_api_v1': {'queries': 3},
+    'recipes:search_api_v1': {'queries': 7},
+    'recipes:tag_api_v1': {'queries': 4},
+    'recipes:recipes_api_v2': {'queries': 3},
+    'recipes:recipe_api_v2': {'queries': 3},
+    'recipes:tag_detail_api_v2': {'queries': 1},
+    'authors:register': {'queries': 0},
+    # Hashing the password is slow on purpose (real hashers)
+    'authors:register_create': {'queries': 5, 'p95_ms': PASSWORD_P95_MS},
+    'authors:login': {'queries': 0},
+    'authors:login_auth': {'queries': 9, 'p95_ms': PASSWORD_P95_MS},
+    'authors:logout': {'queries': 4},
+    'authors:dashboard': {'queries': 3},
+    # Saving a recipe also runs its signals (cards, index, counters...)
+    'authors:dashboard_recipe_new': {'queries': 19},
+    'authors:dashboard_delete_recipe': {'queries': 16},
+    'authors:dashboard_recipe': {'queries': 22},
+    'authors:profile': {'queries': 1},
+}
+
+
+def get_named_routes():
+    # Every named route of recipes.urls and authors.urls
+    return sorted(
+        f'{urls.app_name}:{pattern.name}'
+        for urls in (recipes_urls, authors_urls)
+        for pattern in urls.urlpatterns
+        if pattern.name
+    )
+
+
+class RouteRequest(NamedTuple):
+    # needs_login -> the seeded author is logged in before each request
+    # data -> None = GET. Otherwise a POST of data(repeat), called
+    #     before the measure: the objects it creates (a draft to be
+    #     deleted...) are not counted
+    url: str
+    needs_login: bool = False
+    data: Optional[Callable[[int], dict]] = None
+
+    @property
+    def method(self):
+        return 'GET' if self.data is None else 'POST'
+
+
+def make_recipe_form_data(title):
+    # Valid data to authors.forms.AuthorsRecipeForm
+    return {
+        'title': title,
+        'description': 'Recipe made to measure the budgets',
+        'preparation_time': 10,
+        'preparation_time_unit': 'minutes',
+        'servings': 2,
+        'servings_unit': 'portions',
+        'preparation_steps': 'Mix everything',
+    }
+
+
+def get_route_requests(dataset):
+    # {route: RouteRequest} to the dataset of seed_recipes()
+    from recipes.models import Recipe
+
+    author = dataset['authors'][0]
+    published = [r for r in dataset['recipes'] if r.is_published]
+    draft = next(
+        r for r in dataset['recipes']
+        if not r.is_published and r.author_id == author.pk)
+    recipe = published[0]
+    tag = recipe.tags.first()
+    search = '?q=' + recipe.title.split()[0]
+
+    # Unique names between the repeats and the runs
+    numbers = itertools.count()
+
+    def register_data(repeat):
+        username = f'budget_{next(numbers)}'
+        return {
+            'first_name': 'Budget', 'last_name': 'User',
+            'username': username, 'email': f'{username}@server.com',
+            'password': SEEDED_PASSWORD, 'password2': SEEDED_PASSWORD,
+        }
+
+    def new_recipe_data(repeat):
+        return make_recipe_form_data(f'Budget recipe {next(numbers)}')
+
+    def edit_recipe_data(repeat):
+        return make_recipe_form_data(f'Budget edit {next(numbers)}')
+
+    def delete_recipe_data(repeat):
+        number = next(numbers)
+        recipe_to_delete = Recipe.objects.create(
+            **make_recipe_form_data(f'Budget delete {number}'),
+            slug=f'budget-delete-{number}', author=author,
+            is_published=False)
+        return {'id': recipe_to_delete.pk}
+
+    return {
+        'recipes:home': RouteRequest(reverse('recipes:home')),
+        'recipes:search': RouteRequest(reverse('recipes:search') + search),
+        'recipes:category': RouteRequest(reverse(
+            'recipes:category', kwargs={'category_id': recipe.category_id})),
+        'recipes:recipe': RouteRequest(reverse(
+            'recipes:recipe', kwargs={'pk': recipe.pk})),
+        'recipes:tag': RouteRequest(reverse(
+            'recipes:tag', kwargs={'tag_name': tag.name})),
+        'recipes:recipes_api_v1': RouteRequest(
+            reverse('recipes:recipes_api_v1')),
+        'recipes:recipes_export_api_v1': RouteRequest(
+            reverse('recipes:recipes_export_api_v1')),
+        'recipes:recipe_api_v1': RouteRequest(reverse(
+            'recipes:recipe_api_v1', kwargs={'pk': recipe.pk})),
+        'recipes:category_api_v1': RouteRequest(reverse(
+            'recipes:category_api_v1',
+            kwargs={'category_id': recipe.category_id})),
+        'recipes:search_api_v1': RouteRequest(
+            reverse('recipes:search_api_v1') + search),
+        'recipes:tag_api_v1': RouteRequest(reverse(
+            'recipes:tag_api_v1', kwargs={'tag_name': tag.name})),
+        'recipes:recipes_api_v2': RouteRequest(
+            reverse('recipes:recipes_api_v2')),
+        'recipes:recipe_api_v2': RouteRequest(reverse(
+            'recipes:recipe_api_v2', kwargs={'pk': recipe.pk})),
+        'recipes:tag_detail_api_v2': RouteRequest(reverse(
+            'recipes:tag_detail_api_v2', kwargs={'pk': tag.pk})),
+        'authors:register': RouteRequest(reverse('authors:register')),
+        'authors:register_create': RouteRequest(
+            reverse('authors:register_create'), data=register_data),
+        'authors:login': RouteRequest(reverse('authors:login')),
+        'authors:login_auth': RouteRequest(
+            reverse('authors:login_auth'),
+            data=lambda repeat: {
+                'username': author.username, 'password': SEEDED_PASSWORD}),
+        'authors:logout': RouteRequest(
+            reverse('authors:logout'), needs_login=True,
+            data=lambda repeat: {'username': author.username}),
+        'authors:dashboard': RouteRequest(
+            reverse('authors:dashboard'), needs_login=True),
+        'authors:dashboard_recipe_new': RouteRequest(
+            reverse('authors:dashboard_recipe_new'), needs_login=True,
+            data=new_recipe_data),
+        'authors:dashboard_delete_recipe': RouteRequest(
+            reverse('authors:dashboard_delete_recipe'), needs_login=True,
+            data=delete_recipe_data),
+        'authors:dashboard_recipe': RouteRequest(reverse(
+            'authors:dashboard_recipe', kwargs={'id': draft.pk}),
+            needs_login=True, data=edit_recipe_data),
+        'authors:profile': RouteRequest(reverse(
+            'authors:profile', kwargs={'id': author.profile.pk})),
+    }
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(math.ceil(len(values) * percent / 100) - 1, 0)
+    return values[index]
+
+
+def is_success(status):
+    return 200 <= status < 400
+
+
+def measure_request(client, route_request, author, repeats=5):
+    # Returns the status, the max number of queries and the timings.
+    # status -> the worst one of the repeats (an error in any repeat
+    #     is reported)
+    statuses = []
+    queries = []
+    timings = []
+
+    for repeat in range(repeats):
+        cache.clear()
+        page_cache.invalidate()
+
+        if route_request.needs_login:
+            client.force_login(author)
+        else:
+            client.logout()
+
+        data = None
+        if route_request.data is not None:
+            data = route_request.data(repeat)
+
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            if data is None:
+                response = client.get(route_request.url)
+            else:
+                response = client.post(route_request.url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        statuses.append(response.status_code)
+        queries.append(len(context.captured_queries))
+
+    return {
+        'status': next(
+            (status for status in statuses if not is_success(status)),
+            statuses[-1]),
+        'location': response.get('Location'),
+        'queries': max(queries),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+    }
+
+
+def run_route_budgets(client, dataset, repeats=5, budgets=None):
+    # Measures every route and returns the report:
+    # {'routes': {route: {method, status, location, queries, p50_ms,
+    #  p95_ms, budget, ok}}, 'dataset': {...}, 'ok': bool}
+    budgets = ROUTE_BUDGETS if budgets is None else budgets
+    author = dataset['authors'][0]
+    routes = {}
+
+    for route, route_request in sorted(
+            get_route_requests(dataset).items()):
+        result = measure_request(
+            client, route_request, author, repeats=repeats)
+        budget = {'p95_ms': DEFAULT_P95_MS, **budgets.get(route, {})}
+
+        result.update({
+            'url': route_request.url,
+            'method': route_request.method,
+            'budget': budget,
+            'ok': (
+                route in budgets and
+                is_success(result['status']) and
+                result['queries'] <= budget['queries'] and
+                result['p95_ms'] <= budget['p95_ms']
+            ),
+        })
+        routes[route] = result
+
+    client.logout()
+
+    return {
+        'dataset': {
+            key: len(value) for key, value in sorted(dataset.items())},
+        'repeats': repeats,
+        'routes': routes,
+        'ok': all(result['ok'] for result in routes.values()),
+    }
+
+
+def dump_report(report, fp):
+    # Stable JSON (sorted keys) to be diffed between releases
+    json.dump(report, fp, indent=2, sort_keys=True)
+    fp.write('\n')
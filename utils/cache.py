@@ -0,0 +1,150 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class TieredPageCache:
+
+    # Two tiers page cache:
+    #     local -> a small LRU dict living in the worker memory. A hot
+    #         page costs one small read to the shared cache (the
+    #         generation) instead of reading and unpickling the page.
+    #         The generation is not kept locally: an invalidation made
+    #         by another worker is seen by the next request.
+    #     shared -> django's default cache (locmem, redis, memcached...)
+    #         shared by all workers.
+    #
+    # Every key carries a generation number, which is stored in the shared
+    # cache. Invalidating the cache is just incrementing the generation:
+    # all the old keys (in both tiers) are never read again and expire
+    # by themselves. So one worker invalidating the cache invalidates it
+    # to every worker.
+    #
+    # aget() and aset() are the versions to the async views: they use the
+    # async API of django's cache.
+
+    def __init__(self, namespace, timeout=None, local_size=None):
+        self.namespace = namespace
+        self.generation_key = f'{namespace}:generation'
+        self.timeout = timeout
+        self.local_size = local_size
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+    def get_local_size(self):
+        if self.local_size is not None:
+            return self.local_size
+        return getattr(settings, 'PAGE_CACHE_LOCAL_SIZE', 256)
+
+    def is_enabled(self):
+        return self.get_timeout() > 0
+
+    def get_generation(self):
+        # The generation never expires (timeout=None). If the shared cache
+        # lost it (restart, eviction) it restarts from the current time,
+        # so the pages still living in the local tiers are not reused.
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            cache.add(self.generation_key, self._new_generation(),
+                      timeout=None)
+            generation = cache.get(self.generation_key)
+        return generation
+
+    async def aget_generation(self):
+        # Async version of get_generation() (async views)
+        generation = await cache.aget(self.generation_key)
+        if generation is None:
+            await cache.aadd(self.generation_key, self._new_generation(),
+                             timeout=None)
+            generation = await cache.aget(self.generation_key)
+        return generation
+
+    def _new_generation(self):
+        return time.time_ns() // 1000
+
+    def make_key(self, *parts):
+        # Parts can be anything with a stable repr (view name, kwargs,
+        # page number...). They are hashed to keep the key short and
+        # valid to memcached.
+        raw_key = '|'.join(repr(part) for part in parts)
+        digest = hashlib.md5(raw_key.encode('utf-8')).hexdigest()
+        return f'{self.namespace}:{digest}'
+
+    def _versioned_key(self, key, generation):
+        return f'{key}:{generation}'
+
+    def get(self, key):
+        versioned_key = self._versioned_key(key, self.get_generation())
+
+        with self._lock:
+            if versioned_key in self._local:
+                self._local.move_to_end(versioned_key)
+                return self._local[versioned_key]
+
+        value = cache.get(versioned_key)
+
+        if value is not None:
+            self._set_local(versioned_key, value)
+
+        return value
+
+    async def aget(self, key):
+        versioned_key = self._versioned_key(
+            key, await self.aget_generation())
+
+        with self._lock:
+            if versioned_key in self._local:
+                self._local.move_to_end(versioned_key)
+                return self._local[versioned_key]
+
+        value = await cache.aget(versioned_key)
+
+        if value is not None:
+            self._set_local(versioned_key, value)
+
+        return value
+
+    def set(self, key, value):
+        versioned_key = self._versioned_key(key, self.get_generation())
+        cache.set(versioned_key, value, timeout=self.get_timeout())
+        self._set_local(versioned_key, value)
+
+    async def aset(self, key, value):
+        versioned_key = self._versioned_key(
+            key, await self.aget_generation())
+        await cache.aset(versioned_key, value, timeout=self.get_timeout())
+        self._set_local(versioned_key, value)
+
+    def _set_local(self, versioned_key, value):
+        local_size = self.get_local_size()
+        if local_size <= 0:
+            return
+
+        with self._lock:
+            self._local[versioned_key] = value
+            self._local.move_to_end(versioned_key)
+            while len(self._local) > local_size:
+                self._local.popitem(last=False)
+
+    def invalidate(self):
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            # The generation was not in the cache yet
+            cache.add(self.generation_key, self._new_generation(),
+                      timeout=None)
+
+        with self._lock:
+            self._local.clear()
+
+
+page_cache = TieredPageCache(namespace='recipes:pages')
@@ -0,0 +1,127 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+# HTTP CONDITIONAL GET
+# Validators (ETag, and Last-Modified to single recipes) are computed
+# from the recipes data with one aggregate query, before any template or
+# serializer work. When the client already has the current version, a 304
+# is returned and the response is never built.
+
+
+def get_queryset_stats(queryset, field='update_at'):
+    # {'last_modified': max(field), 'total': count} in one query.
+    # The total is also used by the views as an existence probe and as
+    # the pagination count.
+    return queryset.order_by().aggregate(
+        last_modified=Max(field), total=Count('pk'))
+
+
+async def aget_queryset_stats(queryset, field='update_at'):
+    # Async version of get_queryset_stats() (async views)
+    return await queryset.order_by().aaggregate(
+        last_modified=Max(field), total=Count('pk'))
+
+
+def make_validators(stats, *key_parts, use_last_modified=True):
+    # Returns (etag, last_modified) to the stats of a queryset.
+    # key_parts -> anything else that changes the response (view, page,
+    #     language, user...)
+    # use_last_modified -> False to the lists: max(update_at) of a list
+    #     goes back when its newest recipe is unpublished or deleted, so
+    #     If-Modified-Since would answer 304 to a changed list. Only the
+    #     etag (None as last_modified) is used
+    # The etag changes when a recipe is added/removed (count) or
+    # updated (max update_at).
+    last_modified = stats['last_modified']
+
+    raw_etag = '|'.join(repr(part) for part in (
+        *key_parts,
+        stats['total'],
+        last_modified.isoformat() if last_modified else None,
+    ))
+    etag = hashlib.md5(raw_etag.encode('utf-8')).hexdigest()
+
+    return etag, last_modified if use_last_modified else None
+
+
+def get_queryset_validators(queryset, *key_parts, field='update_at'):
+    # Returns (etag, last_modified) to a queryset
+    return make_validators(get_queryset_stats(queryset, field), *key_parts)
+
+
+def _get_validators_headers(etag, last_modified):
+    # (quoted etag, last_modified timestamp) as used by the headers
+    etag = quote_etag(etag) if etag else None
+    last_modified = (
+        timegm(last_modified.utctimetuple()) if last_modified else None)
+    return etag, last_modified
+
+
+def _get_not_modified_response(request, etag, last_modified):
+    # 304 (or 412) if the request validators match, otherwise None
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+
+def _set_validators_headers(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault(
+                'Last-Modified', http_date(last_modified))
+    return response
+
+
+def make_conditional_response(request, etag, last_modified, get_response):
+    # Returns 304 (or 412) if the request validators match, otherwise the
+    # response returned by get_response(). Both get the validators in
+    # their headers.
+    etag, last_modified = _get_validators_headers(etag, last_modified)
+
+    response = _get_not_modified_response(request, etag, last_modified)
+
+    if response is None:
+        response = get_response()
+
+    return _set_validators_headers(response, etag, last_modified)
+
+
+async def amake_conditional_response(
+        request, etag, last_modified, aget_response):
+    # Async version of make_conditional_response() (async views).
+    # aget_response() is a coroutine function
+    etag, last_modified = _get_validators_headers(etag, last_modified)
+
+    response = _get_not_modified_response(request, etag, last_modified)
+
+    if response is None:
+        response = await aget_response()
+
+    return _set_validators_headers(response, etag, last_modified)
+
+
+def conditional_get(validators_func):
+    # Decorator to function views.
+    # validators_func(request, *args, **kwargs) -> (etag, last_modified)
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = validators_func(request, *args, **kwargs)
+
+            return make_conditional_response(
+                request, etag, last_modified,
+                lambda: view_func(request, *args, **kwargs))
+        return inner
+    return decorator
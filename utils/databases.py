@@ -0,0 +1,121 @@
+import os
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+# DATABASE CONNECTIONS
+# Builds the DATABASES entries from the environment variables:
+# <PREFIX>_ENGINE, _NAME, _USER, _PASSWORD, _HOST, _PORT and the
+# connection management ones:
+# <PREFIX>_CONN_MAX_AGE -> seconds a connection is reused by the
+#     following requests (0 = one connection per request, empty = forever)
+#     Default: DEFAULT_CONN_MAX_AGE under WSGI, 0 under ASGI
+#     (project/asgi.py sets DJANGO_ASGI=1): each async request may run
+#     its queries in another thread, so persistent connections are not
+#     reused and pile up (see the Django docs, "Connection management")
+# <PREFIX>_CONN_HEALTH_CHECKS -> 1 = check a reused connection before
+#     the request uses it (a dropped connection is replaced)
+# <PREFIX>_POOL -> 1 = in-process connection pool (Postgres + psycopg 3,
+#     Django >= 5.1, ImproperlyConfigured otherwise). The pool replaces
+#     the persistent connections.
+# <PREFIX>_POOL_MIN_SIZE, _POOL_MAX_SIZE, _POOL_TIMEOUT
+
+CONNECTION_KEYS = ('ENGINE', 'NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')
+
+DEFAULT_CONN_MAX_AGE = 60
+ASGI_CONN_MAX_AGE = 0
+
+NATIVE_POOL_DJANGO_VERSION = (5, 1)
+
+
+def get_bool(name, default='0'):
+    return os.environ.get(name, default) == '1'
+
+
+def get_default_conn_max_age():
+    if get_bool('DJANGO_ASGI'):
+        return ASGI_CONN_MAX_AGE
+    return DEFAULT_CONN_MAX_AGE
+
+
+def get_conn_max_age(prefix):
+    value = os.environ.get(
+        f'{prefix}_CONN_MAX_AGE', get_default_conn_max_age())
+
+    # Empty value = unlimited persistent connections
+    if value == '':
+        return None
+    return int(value)
+
+
+def can_use_pool(engine):
+    return (
+        engine == 'django.db.backends.postgresql'
+        and django.VERSION[:2] >= NATIVE_POOL_DJANGO_VERSION
+    )
+
+
+def get_pool_options(prefix):
+    return {
+        'min_size': int(os.environ.get(f'{prefix}_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get(f'{prefix}_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.environ.get(f'{prefix}_POOL_TIMEOUT', 10)),
+    }
+
+
+def get_database_settings(prefix='DATABASE', base=None):
+    # Returns one DATABASES entry. The connection keys missing in the
+    # environment are copied from base (a replica uses the same user,
+    # password... as the primary unless it sets its own)
+    base = base or {}
+    database = {
+        key: os.environ.get(f'{prefix}_{key}', base.get(key))
+        for key in CONNECTION_KEYS
+    }
+
+    database['CONN_MAX_AGE'] = get_conn_max_age(prefix)
+    database['CONN_HEALTH_CHECKS'] = get_bool(
+        f'{prefix}_CONN_HEALTH_CHECKS', '1')
+
+    if get_bool(f'{prefix}_POOL'):
+        if not can_use_pool(database['ENGINE']):
+            raise ImproperlyConfigured(
+                f'{prefix}_POOL=1 needs PostgreSQL and Django >= '
+                f'{".".join(map(str, NATIVE_POOL_DJANGO_VERSION))} '
+                f'(installed: {django.get_version()}, engine: '
+                f'{database["ENGINE"]})')
+
+        # Django does not allow persistent connections with the pool
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS'] = {'pool': get_pool_options(prefix)}
+
+    return database
+
+
+def get_replica_settings(primary, prefix='DATABASE_REPLICA'):
+    # The replica alias exists only when its host or name is configured
+    if not (os.environ.get(f'{prefix}_HOST') or
+            os.environ.get(f'{prefix}_NAME')):
+        return None
+
+    replica = get_database_settings(prefix, base=primary)
+
+    # The tests do not have a real replica: it reads the test database
+    replica['TEST'] = {'MIRROR': 'default'}
+    return replica
+
+
+def get_replicas_settings(primary, max_replicas=9):
+    # DATABASES entries of the replicas, by alias:
+    # DATABASE_REPLICA_* -> 'replica', DATABASE_REPLICA_2_* -> 'replica_2'
+    replicas = {}
+
+    for number in range(1, max_replicas + 1):
+        suffix = '' if number == 1 else f'_{number}'
+        replica = get_replica_settings(
+            primary, prefix=f'DATABASE_REPLICA{suffix}')
+        if replica is None:
+            break
+        replicas[f'replica{suffix}'] = replica
+
+    return replicas
@@ -0,0 +1,28 @@
+from django.utils.module_loading import import_string
+
+# LAZY IMPORTS
+# Heavy dependencies are imported when first used, not when a worker
+# boots: a worker that never serves a view does not pay its imports.
+# See benchmarks/boot.py
+
+
+def lazy_view(dotted_path, csrf_exempt=False):
+    # URLconf entry to a view imported on its first request.
+    # csrf_exempt -> must match the real view (DRF views are exempt, the
+    #     check is done by their authentication classes)
+    view = None
+
+    def get_view():
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path)
+        return view
+
+    def inner(request, *args, **kwargs):
+        return get_view()(request, *args, **kwargs)
+
+    inner.__name__ = dotted_path.rsplit('.', 1)[-1]
+    inner.__qualname__ = inner.__name__
+    inner.lazy_view_path = dotted_path
+    inner.csrf_exempt = csrf_exempt
+    return inner
@@ -0,0 +1,579 @@
+import asyncio
+import io
+import math
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from http import client as http_client
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+
+# LOAD TEST
+# Replays a weighted mix of scenarios (home, deep pagination, category,
+# tag, search, detail, APIs, login and dashboard saves) with concurrent
+# virtual users, against:
+# - project.wsgi.application, in-process (WSGITransport, one thread per
+#   virtual user)
+# - project.asgi.application, in-process (ASGITransport, one task per
+#   virtual user)
+# - a running server (HTTPTransport, ex: http://127.0.0.1:8000)
+# and reports the requests per second, the latency percentiles and the
+# database queries per request (in-process only).
+#
+# Scenarios are generators: they yield Request objects and receive the
+# Response of each one, so the same scenario runs on every transport.
+# Used by benchmarks/load_test.py.
+
+DEFAULT_MIX = {
+    'home': 30,
+    'deep_page': 8,
+    'category': 10,
+    'tag': 8,
+    'search': 10,
+    'detail': 15,
+    'api_v1': 7,
+    'api_v2': 6,
+    'login': 3,
+    'dashboard_save': 3,
+}
+
+HOST = 'testserver'
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    data: dict = None
+
+
+@dataclass
+class Response:
+    status: int
+    headers: list
+    size: int
+
+
+@dataclass
+class Sample:
+    scenario: str
+    path: str
+    status: int
+    elapsed_ms: float
+    queries: int = None
+
+
+# QUERY COUNTER
+# The queries are counted by an execute wrapper installed in every
+# connection. The counter of the current request is a ContextVar, so it
+# also works in the threads used by the ASGI handler (asgiref copies the
+# context to them).
+
+_query_counter = ContextVar('load_test_query_counter', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def install_query_counter():
+    connection_created.connect(_install_query_counter)
+    for connection in connections.all(initialized_only=True):
+        _install_query_counter(None, connection)
+
+
+# DATASET
+
+
+def get_dataset(logins=None):
+    # Ids and names used by the scenarios, read from the database.
+    # logins -> [(username, password)] to the login/dashboard scenarios
+    from recipes.models import Recipe
+    from tag.models import Tag
+
+    published = Recipe.objects.filter(is_published=True)
+
+    return {
+        'recipe_ids': list(published.values_list('pk', flat=True)[:500]),
+        'category_ids': list(
+            published.exclude(category=None).values_list(
+                'category_id', flat=True).distinct()[:100]),
+        'tag_names': list(
+            Tag.objects.filter(recipe__is_published=True).values_list(
+                'name', flat=True).distinct()[:100]),
+        'search_terms': [
+            title.split()[0] for title in published.values_list(
+                'title', flat=True)[:100] if title.split()
+        ],
+        'pages': max(math.ceil(published.count() / 9), 1),
+        'logins': list(logins or []),
+    }
+
+
+# SCENARIOS
+
+
+def scenario_home(user, dataset):
+    yield Request('GET', reverse('recipes:home'))
+
+
+def scenario_deep_page(user, dataset):
+    # One of the last pages of the home (offset pagination)
+    page = user.random.randint(
+        max(dataset['pages'] - 5, 1), dataset['pages'])
+    yield Request('GET', reverse('recipes:home') + f'?page={page}')
+
+
+def scenario_category(user, dataset):
+    category_id = user.random.choice(dataset['category_ids'])
+    yield Request('GET', reverse(
+        'recipes:category', kwargs={'category_id': category_id}))
+
+
+def scenario_tag(user, dataset):
+    tag_name = user.random.choice(dataset['tag_names'])
+    yield Request('GET', reverse(
+        'recipes:tag', kwargs={'tag_name': tag_name}))
+
+
+def scenario_search(user, dataset):
+    term = user.random.choice(dataset['search_terms'])
+    yield Request(
+        'GET', reverse('recipes:search') + '?' + urlencode({'q': term}))
+
+
+def scenario_detail(user, dataset):
+    recipe_id = user.random.choice(dataset['recipe_ids'])
+    yield Request('GET', reverse('recipes:recipe', kwargs={'pk': recipe_id}))
+
+
+def scenario_api_v1(user, dataset):
+    recipe_id = user.random.choice(dataset['recipe_ids'])
+    yield Request('GET', reverse('recipes:recipes_api_v1'))
+    yield Request('GET', reverse(
+        'recipes:recipe_api_v1', kwargs={'pk': recipe_id}))
+
+
+def scenario_api_v2(user, dataset):
+    recipe_id = user.random.choice(dataset['recipe_ids'])
+    yield Request('GET', reverse('recipes:recipes_api_v2'))
+    yield Request('GET', reverse(
+        'recipes:recipe_api_v2', kwargs={'pk': recipe_id}))
+
+
+def scenario_login(user, dataset):
+    username, password = user.random.choice(dataset['logins'])
+    user.cookies.clear()
+
+    # The login page sets the csrf cookie
+    yield Request('GET', reverse('authors:login'))
+    yield Request('POST', reverse('authors:login_auth'), {
+        'username': username, 'password': password})
+    user.logged_in = True
+
+
+def scenario_dashboard_save(user, dataset):
+    if not user.logged_in:
+        yield from scenario_login(user, dataset)
+
+    yield Request('GET', reverse('authors:dashboard_recipe_new'))
+    number = user.random.randint(1, 10 ** 9)
+    yield Request('POST', reverse('authors:dashboard_recipe_new'), {
+        'title': f'Load test recipe {number}',
+        'description': f'Created by the load test {number}',
+        'preparation_time': 10,
+        'preparation_time_unit': 'minutes',
+        'servings': 4,
+        'servings_unit': 'portions',
+        'preparation_steps': 'Mix everything.',
+    })
+
+
+SCENARIOS = {
+    'home': scenario_home,
+    'deep_page': scenario_deep_page,
+    'category': scenario_category,
+    'tag': scenario_tag,
+    'search': scenario_search,
+    'detail': scenario_detail,
+    'api_v1': scenario_api_v1,
+    'api_v2': scenario_api_v2,
+    'login': scenario_login,
+    'dashboard_save': scenario_dashboard_save,
+}
+
+
+def parse_mix(value):
+    # 'home=30,detail=10' -> {'home': 30, 'detail': 10}
+    mix = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario: {name}')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def get_runnable_mix(mix, dataset):
+    # Scenarios without data (ex: login without credentials) are removed
+    needs = {
+        'category': 'category_ids',
+        'tag': 'tag_names',
+        'search': 'search_terms',
+        'detail': 'recipe_ids',
+        'api_v1': 'recipe_ids',
+        'api_v2': 'recipe_ids',
+        'login': 'logins',
+        'dashboard_save': 'logins',
+    }
+    return {
+        name: weight for name, weight in mix.items()
+        if weight > 0 and dataset.get(needs.get(name), True)
+    }
+
+
+# VIRTUAL USERS
+
+
+@dataclass
+class VirtualUser:
+    random: random.Random
+    cookies: dict = field(default_factory=dict)
+    logged_in: bool = False
+
+    def get_headers(self, request):
+        headers = [('host', HOST)]
+        if self.cookies:
+            headers.append(('cookie', '; '.join(
+                f'{key}={value}' for key, value in self.cookies.items())))
+        if request.method == 'POST':
+            headers.append(
+                ('content-type', 'application/x-www-form-urlencoded'))
+            if 'csrftoken' in self.cookies:
+                headers.append(('x-csrftoken', self.cookies['csrftoken']))
+        return headers
+
+    def get_body(self, request):
+        return urlencode(request.data or {}).encode('utf-8')
+
+    def update_cookies(self, response):
+        for name, value in response.headers:
+            if name.lower() != 'set-cookie':
+                continue
+            for key, morsel in SimpleCookie(value).items():
+                if morsel['max-age'] == '0' or not morsel.value:
+                    self.cookies.pop(key, None)
+                else:
+                    self.cookies[key] = morsel.value
+
+    def choose_scenario(self, mix):
+        names = list(mix)
+        return self.random.choices(names, weights=[mix[n] for n in names])[0]
+
+
+# TRANSPORTS
+
+
+class WSGITransport:
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, method, path, headers, body):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers:
+            if name == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            else:
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = response_headers
+
+        result = self.application(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+        return Response(started['status'], started['headers'], size)
+
+
+class ASGITransport:
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, method, path, headers, body):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode('utf-8'),
+            'query_string': query.encode('utf-8'),
+            'headers': [
+                (name.encode('latin-1'), value.encode('latin-1'))
+                for name, value in
+                [*headers, ('content-length', str(len(body)))]
+            ],
+            'server': (HOST, 80),
+            'client': ('127.0.0.1', 0),
+        }
+        messages = [{'type': 'http.request', 'body': body,
+                     'more_body': False}]
+        finished = asyncio.Event()
+        response = {'size': 0}
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = [
+                    (name.decode('latin-1'), value.decode('latin-1'))
+                    for name, value in message.get('headers', [])
+                ]
+            elif message['type'] == 'http.response.body':
+                response['size'] += len(message.get('body', b''))
+                if not message.get('more_body', False):
+                    finished.set()
+
+        await self.application(scope, receive, send)
+        finished.set()
+
+        return Response(
+            response['status'], response['headers'], response['size'])
+
+
+class HTTPTransport:
+
+    # Requests to a running server. One connection per thread
+    # (keep-alive, like a browser)
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.local = threading.local()
+
+    def get_connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            connection_class = (
+                http_client.HTTPSConnection if self.scheme == 'https'
+                else http_client.HTTPConnection)
+            self.local.connection = connection_class(
+                self.netloc, timeout=30)
+        return self.local.connection
+
+    def __call__(self, method, path, headers, body):
+        connection = self.get_connection()
+        headers = dict(headers, host=self.netloc)
+        try:
+            connection.request(method, path, body=body or None,
+                               headers=headers)
+            response = connection.getresponse()
+            size = len(response.read())
+        except (http_client.HTTPException, OSError):
+            connection.close()
+            self.local.connection = None
+            raise
+        return Response(response.status, response.getheaders(), size)
+
+
+# RUNNERS
+
+
+def run_scenario_sync(transport, user, name, dataset, count_queries):
+    samples = []
+    scenario = SCENARIOS[name](user, dataset)
+    response = None
+
+    while True:
+        try:
+            request = scenario.send(response)
+        except StopIteration:
+            return samples
+
+        counter = [0]
+        token = _query_counter.set(counter) if count_queries else None
+        start = time.perf_counter()
+        try:
+            response = transport(
+                request.method, request.path, user.get_headers(request),
+                user.get_body(request))
+        finally:
+            if token is not None:
+                _query_counter.reset(token)
+
+        samples.append(Sample(
+            name, request.path, response.status,
+            (time.perf_counter() - start) * 1000,
+            counter[0] if count_queries else None))
+        user.update_cookies(response)
+
+
+async def run_scenario_async(transport, user, name, dataset):
+    samples = []
+    scenario = SCENARIOS[name](user, dataset)
+    response = None
+
+    while True:
+        try:
+            request = scenario.send(response)
+        except StopIteration:
+            return samples
+
+        counter = [0]
+        token = _query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await transport(
+                request.method, request.path, user.get_headers(request),
+                user.get_body(request))
+        finally:
+            _query_counter.reset(token)
+
+        samples.append(Sample(
+            name, request.path, response.status,
+            (time.perf_counter() - start) * 1000, counter[0]))
+        user.update_cookies(response)
+
+
+def run_sync(transport, dataset, mix, users=4, iterations=100, seed=1,
+             count_queries=True):
+    # Closed loop: each virtual user runs scenarios one after the other
+    # until `iterations` scenarios were run in total
+    remaining = iter(range(iterations))
+    lock = threading.Lock()
+
+    def virtual_user(number):
+        user = VirtualUser(random.Random(seed + number))
+        samples = []
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return samples
+            samples.extend(run_scenario_sync(
+                transport, user, user.choose_scenario(mix), dataset,
+                count_queries))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        results = list(executor.map(virtual_user, range(users)))
+    elapsed = time.perf_counter() - start
+
+    return [sample for samples in results for sample in samples], elapsed
+
+
+def run_async(transport, dataset, mix, users=4, iterations=100, seed=1):
+    remaining = iter(range(iterations))
+
+    async def virtual_user(number):
+        user = VirtualUser(random.Random(seed + number))
+        samples = []
+        while next(remaining, None) is not None:
+            samples.extend(await run_scenario_async(
+                transport, user, user.choose_scenario(mix), dataset))
+        return samples
+
+    async def main():
+        return await asyncio.gather(
+            *(virtual_user(number) for number in range(users)))
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+
+    return [sample for samples in results for sample in samples], elapsed
+
+
+# REPORT
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(math.ceil(len(values) * percent / 100) - 1, 0)
+    return values[index]
+
+
+def summarize(samples, elapsed=None):
+    timings = [sample.elapsed_ms for sample in samples]
+    queries = [s.queries for s in samples if s.queries is not None]
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status >= 400),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p90_ms': round(percentile(timings, 90), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'queries_per_request': (
+            round(statistics.mean(queries), 2) if queries else None),
+    }
+    if elapsed:
+        summary['rps'] = round(len(samples) / elapsed, 2)
+    return summary
+
+
+def make_report(samples, elapsed, **info):
+    by_scenario = {}
+    for sample in samples:
+        by_scenario.setdefault(sample.scenario, []).append(sample)
+
+    return {
+        **info,
+        'elapsed_s': round(elapsed, 3),
+        'total': summarize(samples, elapsed),
+        'scenarios': {
+            name: summarize(scenario_samples)
+            for name, scenario_samples in sorted(by_scenario.items())
+        },
+    }
@@ -1,5 +1,16 @@
+import base64
+import binascii
+import hashlib
+import json
 import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
 from django.core.paginator import Paginator  # type: ignore
+from django.db import connections
+
+# Seconds an approximate total is kept in cache (keyset mode)
+APPROXIMATE_TOTAL_TIMEOUT = 60
 
 
 def make_pagination_range(
@@ -62,7 +73,8 @@ def make_pagination_range(
     return pagination
 
 
-def make_pagination(request, queryset, per_page, qty_pages=4):
+def make_pagination(request, queryset, per_page, qty_pages=4,
+                    mode='offset', approximate_total=False, total=None):
 
     # Method to create the pagination scheme.
     # queryset -> list of items to be displayed in the pages
@@ -71,6 +83,16 @@ def make_pagination(request, queryset, per_page, qty_pages=4):
     #     Example: if qty_pages = 5 and the current page is 5
     #         It will be displayed the navigation itens to
     #         page 3,4,5,6,7
+    # mode -> 'offset' (default) uses django's Paginator (page numbers).
+    #     'keyset' uses make_keyset_pagination() (after/before cursors)
+    # approximate_total -> only used in keyset mode
+    # total -> number of items, when the caller already knows it
+    #     (no COUNT(*) query)
+
+    if mode == 'keyset':
+        return make_keyset_pagination(
+            request, queryset, per_page, qty_pages=qty_pages,
+            approximate_total=approximate_total, total=total)
 
     # Try to get the page query in the url. If no attribute page is found
     # use 1 (representing the first page)
@@ -87,6 +109,11 @@ def make_pagination(request, queryset, per_page, qty_pages=4):
     # accessing the items for each page.
     paginator = Paginator(queryset, per_page)
 
+    # Paginator.count is a cached property: a known total replaces
+    # the COUNT(*) query
+    if total is not None:
+        paginator.count = total
+
     # check if the current page is in the page_range
     # If not, uses the page 1
     if current_page > len(paginator.page_range):
@@ -103,3 +130,207 @@ def make_pagination(request, queryset, per_page, qty_pages=4):
     )
 
     return page_obj, pagination_range
+
+
+async def amake_pagination(request, queryset, per_page, qty_pages=4,
+                           mode='offset', approximate_total=False,
+                           total=None, evaluate=True):
+
+    # Async version of make_pagination() (async views).
+    # The templates iterate the page synchronously, so the page items are
+    # fetched here with the async ORM.
+    # evaluate -> False keeps the offset page as a lazy (sliced)
+    #     queryset, to the callers that read it with values()
+
+    if mode == 'keyset':
+        # The keyset page is already evaluated (one LIMIT query)
+        return await sync_to_async(make_keyset_pagination)(
+            request, queryset, per_page, qty_pages=qty_pages,
+            approximate_total=approximate_total, total=total)
+
+    if total is None:
+        total = await queryset.acount()
+
+    # The total is known: make_pagination() does not run any query
+    page_obj, pagination_range = make_pagination(
+        request, queryset, per_page, qty_pages=qty_pages, total=total)
+
+    if evaluate:
+        page_obj.object_list = [
+            item async for item in page_obj.object_list]
+
+    return page_obj, pagination_range
+
+
+def encode_cursor(page_number, item_id):
+    # Cursors are opaque to the user: the page number and the id of the
+    # first/last item of a page, dumped as json and encoded as base64
+    raw_cursor = json.dumps([page_number, item_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw_cursor).decode('ascii')
+
+
+def decode_cursor(cursor):
+    # Returns (page_number, item_id) or None if the cursor is not valid
+    try:
+        raw_cursor = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        page_number, item_id = json.loads(raw_cursor)
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        return None
+
+    if not isinstance(page_number, int) or not isinstance(item_id, int):
+        return None
+
+    return max(page_number, 1), item_id
+
+
+def approximate_count(queryset):
+    # Total number of items without running a COUNT(*) on every request.
+    # On PostgreSQL the planner estimate is used (EXPLAIN, no table scan).
+    # On the other databases the exact count is cached for
+    # APPROXIMATE_TOTAL_TIMEOUT seconds.
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        explain = json.loads(queryset.explain(format='json'))
+        return int(explain[0]['Plan']['Plan Rows'])
+
+    sql, params = queryset.values('pk').query.sql_with_params()
+    raw_key = f'{sql}|{params}'.encode('utf-8')
+    cache_key = 'pagination:count:' + hashlib.md5(raw_key).hexdigest()
+    total = cache.get(cache_key)
+
+    if total is None:
+        total = queryset.count()
+        cache.set(cache_key, total, timeout=APPROXIMATE_TOTAL_TIMEOUT)
+
+    return total
+
+
+class KeysetPage:
+
+    # Page returned by make_keyset_pagination().
+    # It has the same interface used in the templates as django's Page
+    # (iteration, len, number, has_next, has_previous, has_other_pages)
+    # plus the cursors to the next and previous pages.
+
+    def __init__(self, object_list, number, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f'<KeysetPage {self.number}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    # An empty page has no item to point to: no cursors
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return encode_cursor(self.number + 1, self.object_list[-1].pk)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return encode_cursor(self.number - 1, self.object_list[0].pk)
+
+
+def make_keyset_pagination(
+        request, queryset, per_page, qty_pages=4, approximate_total=False,
+        total=None):
+
+    # Method to create the keyset (seek) pagination scheme.
+    # Instead of OFFSET, each page is found by the id of the last item
+    # of the previous page (-id ordering, as in RecipeListViewBase):
+    #     ?after=<cursor> -> items with id lower than the cursor
+    #     ?before=<cursor> -> items with id greater than the cursor
+    # So page 5000 costs the same as page 1 (no COUNT(*) and no OFFSET).
+    # approximate_total -> if True, approximate_count() is used to
+    #     estimate the number of pages. Otherwise the known pages are the
+    #     ones until the current page (+1 if there is a next page).
+    # total -> exact number of items, when the caller already knows it
+    # A stale cursor (its items were deleted or unpublished) that finds no
+    # items returns the first page, as an invalid one.
+    after = decode_cursor(request.GET.get('after', ''))
+    before = decode_cursor(request.GET.get('before', ''))
+
+    queryset = queryset.order_by()
+
+    # One extra item is fetched to know if there is another page
+    # in the same direction
+    if after is not None:
+        current_page, item_id = after
+        items = list(
+            queryset.filter(pk__lt=item_id).order_by('-pk')[:per_page + 1])
+        has_more = len(items) > per_page
+        items = items[:per_page]
+        has_next, has_previous = has_more, True
+
+    elif before is not None:
+        current_page, item_id = before
+        items = list(
+            queryset.filter(pk__gt=item_id).order_by('pk')[:per_page + 1])
+        has_more = len(items) > per_page
+        items = list(reversed(items[:per_page]))
+        has_next, has_previous = True, has_more
+
+        # The cursor was created in another page, but there are no more
+        # items before this one: it is the first page
+        if not has_previous:
+            current_page = 1
+
+    if (after is None and before is None) or not items:
+        current_page = 1
+        items = list(queryset.order_by('-pk')[:per_page + 1])
+        has_next = len(items) > per_page
+        items = items[:per_page]
+        has_previous = False
+
+    page_obj = KeysetPage(
+        items, current_page, has_next=has_next, has_previous=has_previous)
+
+    if total is None and approximate_total:
+        total = approximate_count(queryset)
+
+    if total is not None:
+        total_pages = max(math.ceil(total / per_page), current_page)
+        if has_next:
+            total_pages = max(total_pages, current_page + 1)
+    else:
+        total_pages = current_page + 1 if has_next else current_page
+
+    pagination_range = make_pagination_range(
+        current_page=current_page,
+        page_range=range(1, total_pages + 1),
+        qty_pages=qty_pages
+    )
+
+    pagination_range.update({
+        'is_keyset': True,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+        'approximate_total': total,
+    })
+
+    return page_obj, pagination_range
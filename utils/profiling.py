@@ -0,0 +1,464 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# REQUEST PROFILING
+# With PROFILING_ENABLED, ProfilingMiddleware profiles a fraction of the
+# requests (PROFILING_SAMPLE_RATE) and the requests carrying a signed
+# PROFILING_HEADER (make_profiling_token()). A profiled request gets:
+# - the stacks of the request thread, sampled every PROFILING_INTERVAL_MS
+#   by a background thread (no tracing: the request runs at full speed).
+#   WSGI only: under ASGI the request thread is the event loop, shared
+#   by the other requests, and the ORM runs in the sync_to_async threads,
+#   so the async requests get no stacks.
+# - the number and time of the SQL queries, the template render time and
+#   the serializer time (record_time('serializer')). The ContextVar is
+#   copied to the sync_to_async threads: these are per request under
+#   ASGI too.
+# The timings are returned in the Server-Timing header of the response.
+# The profiles are queued to a writer thread (no file access in the
+# request) that appends them to the files of its process, in
+# PROFILING_DIR/parts/. merge_profiles() (benchmarks/merge_profiles.py)
+# merges the files of every process, per URL name:
+#     <url name>.collapsed -> collapsed stacks (flamegraph.pl, speedscope)
+#     <url name>.speedscope.json -> https://www.speedscope.app
+#     <url name>.stats.json -> totals of the profiled requests
+
+PROFILING_SALT = 'utils.profiling'
+
+# Subdirectory of PROFILING_DIR with the files of each process
+PROFILE_PARTS_DIR = 'parts'
+
+logger = logging.getLogger(__name__)
+
+# The profile of the current request. None = not profiled
+_current_profile = ContextVar('current_profile', default=None)
+
+
+def make_profiling_token():
+    # Value of the PROFILING_HEADER to profile a request. Valid for
+    # PROFILING_TOKEN_MAX_AGE seconds
+    return signing.TimestampSigner(salt=PROFILING_SALT).sign('profile')
+
+
+def is_valid_profiling_token(token, max_age):
+    try:
+        value = signing.TimestampSigner(salt=PROFILING_SALT).unsign(
+            token, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return value == 'profile'
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.timings = Counter()
+        self.sql_count = 0
+
+    def add_time(self, section, seconds):
+        self.timings[section] += seconds * 1000
+
+
+@contextmanager
+def record_time(section):
+    # Adds the time of the block to a section of the current profile.
+    # Nothing is measured when the request is not profiled
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(section, time.perf_counter() - start)
+
+
+# SQL
+# Execute wrapper installed in every connection (also the ones of the
+# threads used by the async views: the ContextVar is copied to them)
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    profile.sql_count += 1
+    with record_time('sql'):
+        return execute(sql, params, many, context)
+
+
+def _install_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install_query_recorder():
+    connection_created.connect(_install_query_recorder)
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(None, connection)
+
+
+# TEMPLATES
+# Only the top level renders (TemplateResponse, render_to_string) are
+# timed: the included templates are inside them
+
+
+_templates_instrumented = False
+
+
+def instrument_templates():
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+
+    from django.template.backends.django import Template
+
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        with record_time('template'):
+            return render(self, *args, **kwargs)
+
+    Template.render = timed_render
+    _templates_instrumented = True
+
+
+# STACK SAMPLING
+
+
+def format_frame(frame):
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}:{name}"
+
+
+def format_stack(frame):
+    # Root first, separated by ';' (collapsed stacks format)
+    names = []
+    while frame is not None:
+        names.append(format_frame(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+
+    # Samples the stack of one thread from a background thread
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[format_stack(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+# OUTPUT
+
+
+def get_profile_name(request):
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match and match.view_name else None
+    return (view_name or 'unresolved').replace(':', '.')
+
+
+def read_collapsed(path):
+    stacks = Counter()
+    if not os.path.exists(path):
+        return stacks
+
+    with open(path, encoding='utf-8') as fp:
+        for line in fp:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def make_speedscope(name, stacks, interval_ms):
+    # Sampled profile of the speedscope file format. Each collapsed stack
+    # is one sample weighted by its time
+    frames = []
+    frame_indexes = {}
+    samples = []
+    weights = []
+
+    for stack, count in sorted(stacks.items()):
+        sample = []
+        for frame in stack.split(';'):
+            if frame not in frame_indexes:
+                frame_indexes[frame] = len(frames)
+                frames.append({'name': frame})
+            sample.append(frame_indexes[frame])
+        samples.append(sample)
+        weights.append(count * interval_ms)
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'utils.profiling',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
+
+
+def write_json(path, data):
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as fp:
+        json.dump(data, fp, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def save_profile(directory, name, stacks, stats):
+    # Appends one profiled request to the files of its URL name in this
+    # process: <parts>/<url name>.<pid>.collapsed and .stats.jsonl. No
+    # other process writes them (nothing is read or locked)
+    parts_directory = os.path.join(directory, PROFILE_PARTS_DIR)
+    os.makedirs(parts_directory, exist_ok=True)
+    base_path = os.path.join(parts_directory, f'{name}.{os.getpid()}')
+
+    if stacks:
+        with open(f'{base_path}.collapsed', 'a', encoding='utf-8') as fp:
+            for stack, count in sorted(stacks.items()):
+                fp.write(f'{stack} {count}\n')
+
+    with open(f'{base_path}.stats.jsonl', 'a', encoding='utf-8') as fp:
+        fp.write(json.dumps(stats, sort_keys=True) + '\n')
+
+
+def merge_profiles(directory, interval_ms):
+    # Merges the files of every process into the files of each URL name
+    # (offline: benchmarks/merge_profiles.py). Returns the URL names
+    parts_directory = os.path.join(directory, PROFILE_PARTS_DIR)
+    if not os.path.isdir(parts_directory):
+        return []
+
+    # {url name: [<parts>/<url name>.<pid>, ...]}
+    base_paths = {}
+    for file_name in sorted(os.listdir(parts_directory)):
+        if not file_name.endswith('.stats.jsonl'):
+            continue
+        base_name = file_name[:-len('.stats.jsonl')]
+        name, _ = base_name.rsplit('.', 1)
+        base_paths.setdefault(name, []).append(
+            os.path.join(parts_directory, base_name))
+
+    for name, paths in base_paths.items():
+        collapsed = Counter()
+        totals = Counter()
+        for base_path in paths:
+            collapsed.update(read_collapsed(f'{base_path}.collapsed'))
+            with open(f'{base_path}.stats.jsonl', encoding='utf-8') as fp:
+                for line in fp:
+                    totals.update(json.loads(line))
+                    totals['requests'] += 1
+
+        base_path = os.path.join(directory, name)
+        temp_path = f'{base_path}.collapsed.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as fp:
+            for stack, count in sorted(collapsed.items()):
+                fp.write(f'{stack} {count}\n')
+        os.replace(temp_path, f'{base_path}.collapsed')
+
+        write_json(
+            f'{base_path}.speedscope.json',
+            make_speedscope(name, collapsed, interval_ms))
+        write_json(f'{base_path}.stats.json', {
+            key: round(value, 3) for key, value in totals.items()})
+
+    return sorted(base_paths)
+
+
+class ProfileWriter:
+
+    # Saves the profiles (save_profile) in a background thread: the
+    # request, or the event loop under ASGI, only queues them. The thread
+    # is started again after a fork (gunicorn --preload)
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, directory, name, stacks, stats):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='profile-writer', daemon=True)
+                self._thread.start()
+        self._queue.put((directory, name, stacks, stats))
+
+    def _run(self):
+        while True:
+            profile = self._queue.get()
+            try:
+                save_profile(*profile)
+            except Exception:
+                logger.exception('Profile of %s not saved', profile[1])
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        # Waits for the queued profiles to be saved
+        self._queue.join()
+
+
+profile_writer = ProfileWriter()
+
+
+def make_server_timing(stats):
+    return ', '.join([
+        f"total;dur={stats['total_ms']:.2f}",
+        f"sql;dur={stats['sql_ms']:.2f};desc=\"{stats['sql_count']} "
+        f"queries\"",
+        f"template;dur={stats['template_ms']:.2f}",
+        f"serializer;dur={stats['serializer_ms']:.2f}",
+    ])
+
+
+class ProfilingMiddleware:
+
+    # Sync and async. The stacks are sampled only in the sync requests
+    # (see REQUEST PROFILING)
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        self.header = getattr(settings, 'PROFILING_HEADER', None)
+
+        # Disabled by default: nothing is wrapped or patched
+        if (not getattr(settings, 'PROFILING_ENABLED', False) or
+                (self.sample_rate <= 0 and not self.header)):
+            raise MiddlewareNotUsed()
+
+        self.header_key = (
+            'HTTP_' + self.header.upper().replace('-', '_')
+            if self.header else None)
+        self.token_max_age = getattr(
+            settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+        self.interval = getattr(settings, 'PROFILING_INTERVAL_MS', 1) / 1000
+        self.directory = str(settings.PROFILING_DIR)
+
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        install_query_recorder()
+        instrument_templates()
+
+    def should_profile(self, request):
+        token = request.META.get(self.header_key) if self.header_key else None
+        if token:
+            return is_valid_profiling_token(token, self.token_max_age)
+        return random.random() < self.sample_rate
+
+    def start_profile(self, sample_stacks=True):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        sampler = None
+        if sample_stacks:
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+        return profile, token, sampler, time.perf_counter()
+
+    def stop_sampler(self, sampler):
+        return sampler.stop() if sampler is not None else Counter()
+
+    def finish_profile(self, request, response, profile, token, sampler,
+                       start):
+        total_ms = (time.perf_counter() - start) * 1000
+        stacks = self.stop_sampler(sampler)
+        _current_profile.reset(token)
+
+        stats = {
+            'total_ms': total_ms,
+            'sql_count': profile.sql_count,
+            'sql_ms': profile.timings['sql'],
+            'template_ms': profile.timings['template'],
+            'serializer_ms': profile.timings['serializer'],
+            'samples': sum(stacks.values()),
+        }
+        profile_writer.put(
+            self.directory, get_profile_name(request), stacks, stats)
+
+        response['Server-Timing'] = make_server_timing(stats)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile, token, sampler, start = self.start_profile()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.stop_sampler(sampler)
+            _current_profile.reset(token)
+            raise
+
+        return self.finish_profile(
+            request, response, profile, token, sampler, start)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+
+        # The event loop thread runs the other requests too: no stacks
+        profile, token, sampler, start = self.start_profile(
+            sample_stacks=False)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.stop_sampler(sampler)
+            _current_profile.reset(token)
+            raise
+
+        return self.finish_profile(
+            request, response, profile, token, sampler, start)
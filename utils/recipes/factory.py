@@ -9,6 +9,9 @@ def rand_ratio():
 
 
 fake = Faker('pt_BR')
+
+# Password of the authors created by seed_recipes()
+SEEDED_PASSWORD = 'P@ssw0rd'
 # print(signature(fake.random_number))
 
 
@@ -34,3 +37,68 @@ def make_recipe():
             'url': 'https://loremflickr.com/%s/%s/food,cook' % rand_ratio(),
         }
     }
+
+
+def seed_recipes(qty=100, authors=10, categories=8, tags=12,
+                 tags_per_recipe=3, unpublished_every=10, seed=None):
+    # Saves a realistic dataset in the database (values from make_recipe)
+    # and returns a dict with the created objects.
+    # Every unpublished_every-th recipe is a draft (0 = none).
+    # The objects are created with the ORM (not bulk_create) so the
+    # signals build the cards and the search index, as in production.
+    from django.contrib.auth.models import User
+
+    from recipes.models import Category, Recipe
+    from tag.models import Tag
+
+    if seed is not None:
+        Faker.seed(seed)
+
+    seeded_authors = [
+        User.objects.create_user(
+            username=f'author_{index}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            email=f'author_{index}@server.com',
+            password=SEEDED_PASSWORD,
+        )
+        for index in range(authors)
+    ]
+    seeded_categories = [
+        Category.objects.create(name=f'{fake.word()} {index}'[:65])
+        for index in range(categories)
+    ]
+    seeded_tags = [
+        Tag.objects.create(name=f'{fake.word()}{index}')
+        for index in range(tags)
+    ]
+
+    recipes = []
+    for index in range(qty):
+        data = make_recipe()
+        recipe = Recipe.objects.create(
+            title=data['title'][:65],
+            description=data['description'][:165],
+            slug=f'seeded-recipe-{index}',
+            preparation_time=data['preparation_time'],
+            preparation_time_unit='minutes',
+            servings=data['servings'],
+            servings_unit='portions',
+            preparation_steps=data['preparation_steps'],
+            is_published=not (
+                unpublished_every and index % unpublished_every == 0),
+            author=seeded_authors[index % authors],
+            category=seeded_categories[index % categories],
+        )
+        recipe.tags.add(*(
+            seeded_tags[(index + offset) % tags]
+            for offset in range(min(tags_per_recipe, tags))
+        ))
+        recipes.append(recipe)
+
+    return {
+        'authors': seeded_authors,
+        'categories': seeded_categories,
+        'tags': seeded_tags,
+        'recipes': recipes,
+    }
@@ -0,0 +1,178 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# READ REPLICAS
+# The reads of the published content (recipes, tags, profiles) go to the
+# replica aliases (utils/databases.py). Everything else stays on the
+# primary (default):
+# - the writes, and the auth/sessions/admin apps
+# - the reads inside a transaction of the primary
+# - the views decorated with use_primary_database (author dashboard)
+# - the code run with use_primary() outside a request (cover workers and
+#   the management commands that write): they read rows written just
+#   before (ex: the job enqueued by a request) and the replicas may not
+#   have them yet
+# - the requests of a client that wrote something in the last
+#   REPLICA_STICKINESS_SECONDS (read-your-writes: the replicas may not
+#   have the new data yet). A cookie keeps the client on the primary.
+
+REPLICA_APP_LABELS = {'recipes', 'tag', 'authors'}
+
+REPLICA_STICKINESS_SECONDS = int(
+    os.environ.get('DATABASE_REPLICA_STICKINESS', 10))
+
+REPLICA_STICKINESS_COOKIE = 'db_primary_until'
+
+# State of the current request. None outside a request (shell, commands,
+# worker threads): in that case only the transactions and use_primary()
+# pin the primary.
+_routing_state = ContextVar('routing_state', default=None)
+
+
+def get_replica_aliases():
+    return [
+        alias for alias in settings.DATABASES
+        if alias.startswith('replica')
+    ]
+
+
+def pin_primary():
+    # The rest of the current request reads from the primary
+    state = _routing_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+def is_primary_pinned():
+    state = _routing_state.get()
+    return bool(state and state['pinned'])
+
+
+def use_primary_database(view_func):
+    # Decorator to the views that must read from the primary
+    @wraps(view_func)
+    def inner(*args, **kwargs):
+        pin_primary()
+        return view_func(*args, **kwargs)
+    return inner
+
+
+@contextmanager
+def use_primary():
+    # Block (or function, as a decorator: @use_primary()) that reads from
+    # the primary. In a request it pins the rest of the request.
+    if _routing_state.get() is not None:
+        pin_primary()
+        yield
+        return
+
+    token = _routing_state.set({'pinned': True, 'wrote': False})
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICA_APP_LABELS:
+            return None
+
+        replicas = get_replica_aliases()
+
+        if (not replicas or is_primary_pinned() or
+                connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state['wrote'] = True
+            state['pinned'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas have the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas are migrated by the replication
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+
+    # Sync and async: under ASGI the async views (recipes/views/
+    # site_async.py) are not moved to a thread by this middleware
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def is_sticky(self, request):
+        try:
+            primary_until = float(
+                request.COOKIES.get(REPLICA_STICKINESS_COOKIE, 0))
+        except ValueError:
+            return False
+        return primary_until > time.time()
+
+    def get_request_state(self, request):
+        return {
+            'pinned': (request.method not in ('GET', 'HEAD', 'OPTIONS')
+                       or self.is_sticky(request)),
+            'wrote': False,
+        }
+
+    def process_response(self, state, response):
+        if state['wrote'] and REPLICA_STICKINESS_SECONDS > 0:
+            response.set_cookie(
+                REPLICA_STICKINESS_COOKIE,
+                str(time.time() + REPLICA_STICKINESS_SECONDS),
+                max_age=REPLICA_STICKINESS_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = self.get_request_state(request)
+        token = _routing_state.set(state)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        # The ContextVar is copied to the threads of sync_to_async (ORM)
+        state = self.get_request_state(request)
+        token = _routing_state.set(state)
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        return self.process_response(state, response)
@@ -0,0 +1,96 @@
+import json
+import os
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Number of rows read from the database (server-side cursor) and
+# serialized at a time
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 500))
+
+
+def batched(iterable, size):
+    # batched('ABCDE', 2) -> ['A', 'B'], ['C', 'D'], ['E']
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def abatched(aiterable, size):
+    # Async version of batched() to async iterables
+    batch = []
+    async for item in aiterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_json_array(items, encoder=DjangoJSONEncoder):
+    # Yield a JSON array one item at a time: '[', 'item', ',item', ']'
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item, cls=encoder)
+        separator = ','
+    yield ']'
+
+
+def iter_ndjson(items, encoder=DjangoJSONEncoder):
+    # Yield one JSON document per line (newline delimited JSON)
+    for item in items:
+        yield json.dumps(item, cls=encoder) + '\n'
+
+
+async def aiter_json_array(items, encoder=DjangoJSONEncoder):
+    # Async version of iter_json_array() to async iterables
+    yield '['
+    separator = ''
+    async for item in items:
+        yield separator + json.dumps(item, cls=encoder)
+        separator = ','
+    yield ']'
+
+
+async def aiter_ndjson(items, encoder=DjangoJSONEncoder):
+    # Async version of iter_ndjson() to async iterables
+    async for item in items:
+        yield json.dumps(item, cls=encoder) + '\n'
+
+
+def get_stream_format(request):
+    # ?stream=1 -> 'json' (JSON array); ?stream=ndjson -> 'ndjson'
+    # None when the response should not be streamed
+    stream = request.GET.get('stream', '')
+
+    if stream == 'ndjson':
+        return 'ndjson'
+    if stream in ('1', 'json', 'true'):
+        return 'json'
+    return None
+
+
+def make_streaming_json_response(items, stream_format='json',
+                                 encoder=DjangoJSONEncoder):
+    # StreamingHttpResponse with the items as a JSON array or NDJSON.
+    # items should be a generator, so the memory used does not depend
+    # on the number of items.
+    # Async generators are streamed by the async views (ASGI)
+    is_async = hasattr(items, '__aiter__')
+
+    if stream_format == 'ndjson':
+        iter_items = aiter_ndjson if is_async else iter_ndjson
+        return StreamingHttpResponse(
+            iter_items(items, encoder=encoder),
+            content_type='application/x-ndjson')
+
+    iter_items = aiter_json_array if is_async else iter_json_array
+    return StreamingHttpResponse(
+        iter_items(items, encoder=encoder),
+        content_type='application/json')
@@ -0,0 +1,82 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+
+from utils.databases import get_database_settings, get_replica_settings
+
+POSTGRES = 'django.db.backends.postgresql'
+
+
+class UtilsDatabasesTest(TestCase):
+
+    @patch.dict('os.environ', {'DATABASE_ENGINE': POSTGRES}, clear=True)
+    def test_database_settings_use_persistent_connections_by_default(self):
+        database = get_database_settings('DATABASE')
+
+        self.assertEqual(database['ENGINE'], POSTGRES)
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('OPTIONS', database)
+
+    @patch.dict('os.environ', {
+        'DATABASE_ENGINE': POSTGRES, 'DJANGO_ASGI': '1'}, clear=True)
+    def test_database_settings_disable_persistent_connections_on_asgi(self):
+        self.assertEqual(
+            get_database_settings('DATABASE')['CONN_MAX_AGE'], 0)
+
+        with patch.dict('os.environ', {'DATABASE_CONN_MAX_AGE': '30'}):
+            self.assertEqual(
+                get_database_settings('DATABASE')['CONN_MAX_AGE'], 30)
+
+    @patch.dict('os.environ', {
+        'DATABASE_CONN_MAX_AGE': '',
+        'DATABASE_CONN_HEALTH_CHECKS': '0',
+    }, clear=True)
+    def test_database_settings_read_connection_env_variables(self):
+        database = get_database_settings('DATABASE')
+
+        self.assertIsNone(database['CONN_MAX_AGE'])
+        self.assertFalse(database['CONN_HEALTH_CHECKS'])
+
+    @patch.dict('os.environ', {
+        'DATABASE_ENGINE': POSTGRES,
+        'DATABASE_POOL': '1',
+        'DATABASE_POOL_MAX_SIZE': '20',
+    }, clear=True)
+    @patch('utils.databases.django.VERSION', (5, 1, 0, 'final', 0))
+    def test_database_settings_pool_replaces_persistent_connections(self):
+        database = get_database_settings('DATABASE')
+
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(
+            database['OPTIONS']['pool'],
+            {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+    @patch.dict('os.environ', {
+        'DATABASE_ENGINE': POSTGRES, 'DATABASE_POOL': '1'}, clear=True)
+    @patch('utils.databases.django.VERSION', (4, 2, 0, 'final', 0))
+    def test_database_settings_pool_needs_django_support(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_database_settings('DATABASE')
+
+        with patch.dict('os.environ', {'DATABASE_POOL': '0'}):
+            database = get_database_settings('DATABASE')
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertNotIn('OPTIONS', database)
+
+    @patch.dict('os.environ', {}, clear=True)
+    def test_replica_settings_are_optional(self):
+        self.assertIsNone(get_replica_settings({'NAME': 'primary'}))
+
+    @patch.dict('os.environ', {'DATABASE_REPLICA_HOST': 'replica'},
+                clear=True)
+    def test_replica_settings_inherit_from_primary(self):
+        primary = {'ENGINE': POSTGRES, 'NAME': 'recipes', 'USER': 'user'}
+
+        replica = get_replica_settings(primary)
+
+        self.assertEqual(replica['HOST'], 'replica')
+        self.assertEqual(replica['NAME'], 'recipes')
+        self.assertEqual(replica['USER'], 'user')
+        self.assertEqual(replica['TEST'], {'MIRROR': 'default'})
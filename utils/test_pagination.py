@@ -1,12 +1,16 @@
 from unittest import TestCase
 from unittest.mock import patch
 
+from django.db import connection
 from django.http import HttpRequest
+from django.test.utils import CaptureQueriesContext
 import pytest  # type: ignore
 
 
+from recipes.models import Recipe
 from recipes.tests.test_recipe_base import RecipeMixin
-from utils.pagination import make_pagination_range, make_pagination
+from utils.pagination import (
+    encode_cursor, make_pagination_range, make_pagination)
 
 
 @pytest.mark.django_db
@@ -119,3 +123,120 @@ class PaginationTest(TestCase, RecipeMixin):
             pagination['current_page'], 1,
             msg='PAGINATION: Failed to get page 1 when out of range page '
             'was requested.')
+
+
+@pytest.mark.django_db
+class KeysetPaginationTest(TestCase, RecipeMixin):
+
+    def make_request(self, **query):
+        request = HttpRequest()
+        request.method = 'GET'
+        for key, value in query.items():
+            request.GET[key] = value
+        return request
+
+    def get_queryset(self):
+        return Recipe.objects.filter(is_published=True)
+
+    def test_keyset_pagination_first_page_is_ordered_by_descending_id(self):
+        recipes = self.make_recipes_in_batch(5)
+        page_obj, pagination = make_pagination(
+            self.make_request(), self.get_queryset(), per_page=2,
+            mode='keyset')
+
+        self.assertEqual(
+            [recipe.id for recipe in page_obj],
+            [recipes[4].id, recipes[3].id])
+        self.assertTrue(page_obj.has_next())
+        self.assertFalse(page_obj.has_previous())
+        self.assertTrue(pagination['is_keyset'])
+        self.assertEqual(pagination['current_page'], 1)
+
+    def test_keyset_pagination_walks_forward_and_backward(self):
+        recipes = self.make_recipes_in_batch(5)
+        _, first = make_pagination(
+            self.make_request(), self.get_queryset(), per_page=2,
+            mode='keyset')
+
+        second_page, second = make_pagination(
+            self.make_request(after=first['next_cursor']),
+            self.get_queryset(), per_page=2, mode='keyset')
+        self.assertEqual(
+            [recipe.id for recipe in second_page],
+            [recipes[2].id, recipes[1].id])
+        self.assertEqual(second['current_page'], 2)
+
+        third_page, third = make_pagination(
+            self.make_request(after=second['next_cursor']),
+            self.get_queryset(), per_page=2, mode='keyset')
+        self.assertEqual([recipe.id for recipe in third_page],
+                         [recipes[0].id])
+        self.assertFalse(third_page.has_next())
+        self.assertIsNone(third['next_cursor'])
+
+        back_page, back = make_pagination(
+            self.make_request(before=third['previous_cursor']),
+            self.get_queryset(), per_page=2, mode='keyset')
+        self.assertEqual(
+            [recipe.id for recipe in back_page],
+            [recipes[2].id, recipes[1].id])
+        self.assertEqual(back['current_page'], 2)
+
+    def test_keyset_pagination_invalid_cursor_returns_first_page(self):
+        recipes = self.make_recipes_in_batch(3)
+        page_obj, pagination = make_pagination(
+            self.make_request(after='not-a-cursor'), self.get_queryset(),
+            per_page=2, mode='keyset')
+
+        self.assertEqual(page_obj[0].id, recipes[2].id)
+        self.assertEqual(pagination['current_page'], 1)
+
+    def test_keyset_pagination_past_the_end_after_returns_first_page(self):
+        recipes = self.make_recipes_in_batch(3)
+        # No item has an id lower than the first one
+        page_obj, pagination = make_pagination(
+            self.make_request(after=encode_cursor(3, recipes[0].id)),
+            self.get_queryset(), per_page=2, mode='keyset')
+
+        self.assertEqual([recipe.id for recipe in page_obj],
+                         [recipes[2].id, recipes[1].id])
+        self.assertEqual(pagination['current_page'], 1)
+        self.assertIsNotNone(pagination['next_cursor'])
+        self.assertIsNone(pagination['previous_cursor'])
+
+    def test_keyset_pagination_past_the_end_before_returns_first_page(self):
+        recipes = self.make_recipes_in_batch(3)
+        page_obj, pagination = make_pagination(
+            self.make_request(before=encode_cursor(2, 10 ** 9)),
+            self.get_queryset(), per_page=2, mode='keyset')
+
+        self.assertEqual([recipe.id for recipe in page_obj],
+                         [recipes[2].id, recipes[1].id])
+        self.assertEqual(pagination['current_page'], 1)
+        self.assertIsNone(pagination['previous_cursor'])
+
+    def test_keyset_pagination_empty_queryset_has_no_cursors(self):
+        page_obj, pagination = make_pagination(
+            self.make_request(after=encode_cursor(3, 1)),
+            self.get_queryset(), per_page=2, mode='keyset')
+
+        self.assertEqual(len(page_obj), 0)
+        self.assertIsNone(pagination['next_cursor'])
+        self.assertIsNone(pagination['previous_cursor'])
+
+    def test_keyset_pagination_approximate_total(self):
+        self.make_recipes_in_batch(5)
+        _, pagination = make_pagination(
+            self.make_request(), self.get_queryset(), per_page=2,
+            mode='keyset', approximate_total=True)
+
+        self.assertEqual(pagination['approximate_total'], 5)
+        self.assertEqual(pagination['total_pages'], 3)
+
+    def test_keyset_pagination_does_not_count(self):
+        self.make_recipes_in_batch(5)
+        with CaptureQueriesContext(connection) as queries:
+            make_pagination(
+                self.make_request(), self.get_queryset(), per_page=2,
+                mode='keyset')
+        self.assertEqual(len(queries.captured_queries), 1)
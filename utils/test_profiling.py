@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from recipes.tests.test_recipe_base import RecipeTestBase
+from utils.profiling import (ProfilingMiddleware, StackSampler,
+                             make_profiling_token, make_speedscope,
+                             merge_profiles, profile_writer, read_collapsed,
+                             save_profile)
+
+
+class ProfilingTempDirMixin:
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        return super().setUp()
+
+    def read_json(self, name):
+        with open(os.path.join(self.directory, name)) as fp:
+            return json.load(fp)
+
+
+class UtilsProfilingTest(ProfilingTempDirMixin, SimpleTestCase):
+
+    def make_middleware(self, **options):
+        options = {
+            'PROFILING_ENABLED': True,
+            'PROFILING_SAMPLE_RATE': 0,
+            'PROFILING_HEADER': 'X-Profile',
+            'PROFILING_DIR': self.directory,
+            **options,
+        }
+        with override_settings(**options):
+            return ProfilingMiddleware(lambda request: HttpResponse())
+
+    def test_profiling_samples_the_thread_stack(self):
+        def busy_function():
+            sampler = StackSampler(threading.get_ident(), 0.001)
+            sampler.start()
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+            return sampler.stop()
+
+        stacks = busy_function()
+
+        self.assertTrue(stacks)
+        self.assertTrue(any('busy_function' in stack for stack in stacks))
+
+    def test_profiling_requires_a_valid_signed_header(self):
+        middleware = self.make_middleware()
+        factory = RequestFactory()
+
+        self.assertTrue(middleware.should_profile(
+            factory.get('/', HTTP_X_PROFILE=make_profiling_token())))
+        self.assertFalse(middleware.should_profile(
+            factory.get('/', HTTP_X_PROFILE='profile:forged')))
+        self.assertFalse(middleware.should_profile(factory.get('/')))
+
+    def test_profiling_sample_rate(self):
+        middleware = self.make_middleware(PROFILING_SAMPLE_RATE=1)
+        self.assertTrue(middleware.should_profile(RequestFactory().get('/')))
+
+    def test_profiling_middleware_is_not_used_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.make_middleware(PROFILING_HEADER='')
+        # Disabled by default, even with the header
+        with self.assertRaises(MiddlewareNotUsed):
+            self.make_middleware(PROFILING_ENABLED=False)
+
+    # TEST if the profiles of every process are merged per URL name
+    def test_profiling_aggregates_the_requests_of_a_url_name(self):
+        stats = {'total_ms': 2, 'sql_count': 1, 'sql_ms': 1,
+                 'template_ms': 0, 'serializer_ms': 0, 'samples': 3}
+
+        with patch('utils.profiling.os.getpid', return_value=101):
+            save_profile(self.directory, 'recipes.home',
+                         {'a;b': 2, 'a': 1}, stats)
+        with patch('utils.profiling.os.getpid', return_value=102):
+            save_profile(self.directory, 'recipes.home', {'a;b': 1}, stats)
+
+        self.assertEqual(
+            merge_profiles(self.directory, 1), ['recipes.home'])
+
+        self.assertEqual(
+            read_collapsed(os.path.join(
+                self.directory, 'recipes.home.collapsed')),
+            {'a;b': 3, 'a': 1})
+
+        totals = self.read_json('recipes.home.stats.json')
+        self.assertEqual(totals['requests'], 2)
+        self.assertEqual(totals['sql_count'], 2)
+
+        speedscope = self.read_json('recipes.home.speedscope.json')
+        self.assertEqual(speedscope['shared']['frames'],
+                         [{'name': 'a'}, {'name': 'b'}])
+        self.assertEqual(speedscope['profiles'][0]['endValue'], 4)
+
+    def test_profiling_speedscope_weights_are_milliseconds(self):
+        speedscope = make_speedscope('view', {'a;b': 3}, 2)
+        profile = speedscope['profiles'][0]
+
+        self.assertEqual(profile['samples'], [[0, 1]])
+        self.assertEqual(profile['weights'], [6])
+
+    # TEST if the async requests (ASGI) record the timings but do not
+    # sample the event loop thread
+    def test_profiling_async_requests_are_not_sampled(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        with override_settings(PROFILING_ENABLED=True,
+                               PROFILING_SAMPLE_RATE=1,
+                               PROFILING_DIR=self.directory):
+            middleware = ProfilingMiddleware(get_response)
+
+        with patch('utils.profiling.StackSampler') as sampler:
+            response = async_to_sync(middleware)(RequestFactory().get('/'))
+        profile_writer.flush()
+
+        sampler.assert_not_called()
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertEqual(merge_profiles(self.directory, 1), ['unresolved'])
+
+
+class UtilsProfilingRequestTest(ProfilingTempDirMixin, RecipeTestBase):
+
+    def test_profiling_records_sql_template_and_serializer(self):
+        self.make_recipe()
+
+        with override_settings(PROFILING_ENABLED=True,
+                               PROFILING_DIR=self.directory):
+            html = self.client.get(
+                reverse('recipes:home'),
+                HTTP_X_PROFILE=make_profiling_token())
+            api = self.client.get(
+                reverse('recipes:recipes_api_v1'),
+                HTTP_X_PROFILE=make_profiling_token())
+            not_profiled = self.client.get(reverse('recipes:home'))
+
+        self.assertIn('sql;dur=', html['Server-Timing'])
+        self.assertIn('Server-Timing', api)
+        self.assertNotIn('Server-Timing', not_profiled)
+
+        # The files are written by the writer thread
+        profile_writer.flush()
+        merge_profiles(self.directory, 1)
+
+        home = self.read_json('recipes.home.stats.json')
+        self.assertEqual(home['requests'], 1)
+        self.assertGreater(home['sql_count'], 0)
+        self.assertGreater(home['template_ms'], 0)
+
+        api_stats = self.read_json('recipes.recipes_api_v1.stats.json')
+        self.assertGreater(api_stats['serializer_ms'], 0)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.directory, 'recipes.recipes_api_v1.collapsed')))
@@ -0,0 +1,113 @@
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from recipes.covers import _run_in_worker
+from recipes.models import Recipe
+from utils.routers import (REPLICA_STICKINESS_COOKIE, ReplicaRouter,
+                           ReplicaRoutingMiddleware, use_primary,
+                           use_primary_database)
+
+
+@patch('utils.routers.get_replica_aliases', return_value=['replica'])
+class UtilsReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        return super().setUp()
+
+    def run_request(self, view, request=None):
+        # Runs the view inside the middleware and returns
+        # (database used by the view, response)
+        request = request or self.factory.get('/')
+        used = []
+
+        def get_response(request):
+            view()
+            used.append(self.router.db_for_read(Recipe))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return used[0], response
+
+    def test_router_reads_published_content_from_replica(self, _):
+        self.assertEqual(self.router.db_for_read(Recipe), 'replica')
+
+    def test_router_keeps_auth_and_sessions_on_primary(self, _):
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertIsNone(self.router.db_for_read(Session))
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    def test_router_uses_primary_without_replicas(self, aliases):
+        aliases.return_value = []
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_router_only_migrates_primary(self, _):
+        self.assertTrue(self.router.allow_migrate('default', 'recipes'))
+        self.assertFalse(self.router.allow_migrate('replica', 'recipes'))
+
+    def test_decorated_views_read_from_primary(self, _):
+        database, _ = self.run_request(use_primary_database(lambda: None))
+        self.assertEqual(database, 'default')
+
+    def test_write_pins_request_and_sets_sticky_cookie(self, _):
+        database, response = self.run_request(
+            lambda: self.router.db_for_write(Recipe))
+
+        self.assertEqual(database, 'default')
+        self.assertIn(REPLICA_STICKINESS_COOKIE, response.cookies)
+
+    def test_sticky_client_reads_from_primary(self, _):
+        request = self.factory.get('/')
+        request.COOKIES[REPLICA_STICKINESS_COOKIE] = str(time.time() + 5)
+
+        database, _ = self.run_request(lambda: None, request)
+        self.assertEqual(database, 'default')
+
+        request.COOKIES[REPLICA_STICKINESS_COOKIE] = str(time.time() - 5)
+        database, response = self.run_request(lambda: None, request)
+        self.assertEqual(database, 'replica')
+        self.assertNotIn(REPLICA_STICKINESS_COOKIE, response.cookies)
+
+    def test_use_primary_outside_a_request(self, _):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+        self.assertEqual(self.router.db_for_read(Recipe), 'replica')
+
+    # TEST if the cover worker threads (no request) read the job from
+    # the primary: it was written just before the dispatch
+    def test_cover_worker_reads_from_primary(self, _):
+        used = []
+
+        def process_cover_job(job_id):
+            used.append(self.router.db_for_read(Recipe))
+
+        with patch('recipes.covers.process_cover_job', process_cover_job):
+            worker = threading.Thread(target=_run_in_worker, args=(1,))
+            worker.start()
+            worker.join()
+
+        self.assertEqual(used, ['default'])
+
+    # TEST if the commands that write read from the primary
+    def test_commands_read_from_primary(self, _):
+        used = []
+
+        def process_pending_cover_jobs(**kwargs):
+            used.append(self.router.db_for_read(Recipe))
+            return 0
+
+        with patch(
+                'recipes.management.commands.process_cover_jobs.'
+                'process_pending_cover_jobs', process_pending_cover_jobs):
+            call_command('process_cover_jobs', stdout=StringIO())
+
+        self.assertEqual(used, ['default'])